@@ -1,15 +1,676 @@
+"""
+Google Calendar tool backed by a local mirror of each calendar.
 
+Events are fetched once with a full sync and then kept current through the
+Calendar API's incremental sync (`syncToken`): each refresh transfers only
+what changed since the last one.  Every mirrored calendar keeps its events in
+an interval index, so free/busy, conflict and free-slot questions are
+answered locally without a request.
 
+Recurring series are synced as one master event (`singleEvents=False`) and
+expanded locally (see `recurrence`); moved or cancelled occurrences arrive
+as exceptions that replace the generated ones.  Expanded occurrence windows
+are memoized in an LRU cache, so queries over months or years cost little
+more than queries over days.
 
+Times are ISO 8601 strings.  Values without an offset (and plain dates) are
+read in `time_zone`, which defaults to the primary calendar's time zone.
+"""
+import itertools
+import logging
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Hashable, Iterable, List, Optional
+from zoneinfo import ZoneInfo
+from pydantic import BaseModel, Field
+from .google_apis import create_service, execute
+from .interval_index import IntervalIndex, gaps, merge
+from .recurrence import Recurrence, validate
+from ..metrics import record_cache
 
+log = logging.getLogger(__name__)
 
-"""
-methods to create
--create one time event
--create reccurring events
--check schedule for next x days 
--share event/calendar
+DAY_MS = 86_400_000
+# occurrences are expanded and cached in windows of this size
+WINDOW_MS = 28 * DAY_MS
+# interval-index end for series without an end
+FOREVER = 1 << 62
+
+class CalendarEvent(BaseModel):
+    id: str = Field(..., description="The ID of the event.")
+    calendar_id: str = Field(..., description="The calendar the event belongs to.")
+    summary: str = Field(..., description="The title of the event.")
+    start: str = Field(..., description="Start time (ISO 8601).")
+    end: str = Field(..., description="End time (ISO 8601, exclusive).")
+    all_day: bool = Field(..., description="Indicates if this is an all-day event")
+    busy: bool = Field(..., description="Indicates if the event blocks time (not transparent or declined)")
+    location: Optional[str] = Field(None, description="The location of the event.")
+    html_link: Optional[str] = Field(None, description="Link to the event in Google Calendar.")
+    recurring_event_id: Optional[str] = Field(None, description="For an occurrence of a recurring event, the ID of its series.")
+    recurrence: Optional[List[str]] = Field(None, description="For a recurring event's series, its RRULE / EXDATE / RDATE lines.")
+
+class TimeSlot(BaseModel):
+    start: str = Field(..., description="Start time (ISO 8601).")
+    end: str = Field(..., description="End time (ISO 8601, exclusive).")
+
+
+def _to_datetime(ms: int, tz: ZoneInfo) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, tz)
+
+def _iso(ms: int, tz: ZoneInfo) -> str:
+    return _to_datetime(ms, tz).isoformat(timespec='seconds')
+
+def _ms(dt: datetime) -> int:
+    return int(dt.timestamp() * 1000)
+
+def parse_time(value, tz: ZoneInfo) -> int:
+    """Epoch ms of an ISO datetime/date string (naive values are in `tz`)."""
+    if isinstance(value, datetime):
+        dt = value
+    elif isinstance(value, date):
+        dt = datetime.combine(value, datetime.min.time())
+    else:
+        dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=tz)
+    return _ms(dt)
+
+def _event_time(when: dict, default_tz: ZoneInfo) -> tuple[int, bool]:
+    """Epoch ms and all-day flag of an event's `start` / `end` object."""
+    tz = ZoneInfo(when['timeZone']) if when.get('timeZone') else default_tz
+    if 'date' in when:
+        return parse_time(when['date'], tz), True
+    return parse_time(when['dateTime'], tz), False
+
+
+class WindowCache:
+    """Thread-safe LRU of expanded occurrence windows, shared by a tool's mirrors."""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            record_cache('calendar_windows', value is not None)
+            return value
+
+    def set(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CalendarMirror:
+    """Local copy of one calendar: single events and exceptions in an
+    interval index, recurring series in another, expanded on demand."""
+
+    def __init__(self, calendar_id: str, time_zone: str = 'UTC', windows: Optional[WindowCache] = None):
+        self.calendar_id = calendar_id
+        self.time_zone = ZoneInfo(time_zone)
+        self.sync_token: Optional[str] = None
+        self.synced_at: Optional[float] = None
+        # background syncs that failed in a row, and when the last one did
+        self.sync_failures = 0
+        self.sync_failed_at = 0.0
+        self.events: dict[str, dict] = {}
+        self.index = IntervalIndex()
+        self.series: dict[str, dict] = {}
+        self.series_index = IntervalIndex()
+        # series ID -> {exception event ID: its `originalStartTime`}; these
+        # occurrences are replaced (or cancelled) by the exception events.
+        # Kept raw: a bare date or local time is in the series' time zone,
+        # and the exception may arrive before its series does
+        self.exceptions: dict[str, dict[str, dict]] = {}
+        self.windows = windows if windows is not None else WindowCache()
+        # part of every window cache key, bumped when a series or its
+        # exceptions change, so stale windows are never hit again
+        self._versions = itertools.count()
+        # `lock` guards the state above and is only held for in-memory work;
+        # `sync_lock` serialises syncs, which hold it across the requests
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.events) + len(self.series)
+
+    def update(self, items: Iterable[dict], full: bool = False) -> None:
+        """Apply event resources from a sync; `full` replaces all events."""
+        with self.lock:
+            if full:
+                self.events.clear()
+                self.index.clear()
+                self.series.clear()
+                self.series_index.clear()
+                self.exceptions.clear()
+            for item in items:
+                self._apply(item)
+
+    def _apply(self, item: dict) -> None:
+        event_id = item['id']
+        self.events.pop(event_id, None)
+        self.index.discard(event_id)
+        if self.series.pop(event_id, None) is not None:
+            self.series_index.discard(event_id)
+        if item.get('recurringEventId') and item.get('originalStartTime'):
+            self._add_exception(item['recurringEventId'], event_id, item['originalStartTime'])
+        if item.get('status') == 'cancelled':
+            # a cancelled series takes its exceptions with it
+            self.exceptions.pop(event_id, None)
+            return
+
+        start, all_day = _event_time(item['start'], self.time_zone)
+        end, _ = _event_time(item['end'], self.time_zone)
+        end = max(end, start + 1)
+        declined = any(a.get('self') and a.get('responseStatus') == 'declined'
+                       for a in item.get('attendees', []))
+        event = {
+            'id': event_id,
+            'summary': item.get('summary', ''),
+            'start': start,
+            'end': end,
+            'all_day': all_day,
+            'busy': not (item.get('transparency') == 'transparent' or declined
+                         or item.get('eventType') == 'workingLocation'),
+            'location': item.get('location'),
+            'html_link': item.get('htmlLink'),
+            'recurring_event_id': item.get('recurringEventId'),
+        }
+        if item.get('recurrence'):
+            tz = ZoneInfo(item['start'].get('timeZone') or self.time_zone.key)
+            first = _to_datetime(start, tz)
+            try:
+                recurrence = Recurrence(item['recurrence'], first.date() if all_day else first, tz)
+            except ValueError as e:
+                log.warning("Can't expand recurring event %s (%s); keeping only its first occurrence", event_id, e)
+            else:
+                self._add_series(event, recurrence, tz)
+                return
+        self.events[event_id] = event
+        self.index.set(event_id, start, end)
+
+    def _add_series(self, event: dict, recurrence: Recurrence, tz: ZoneInfo) -> None:
+        if event['all_day']:
+            # all-day occurrences span whole local days, whatever DST does
+            event['days'] = max(1, round((event['end'] - event['start']) / DAY_MS))
+        event.update(recurrence=recurrence, tz=tz, length=event['end'] - event['start'],
+                     version=next(self._versions))
+        last = recurrence.last()
+        span_end = FOREVER if last is None else last + event['length'] + DAY_MS
+        self.series[event['id']] = event
+        self.series_index.set(event['id'], event['start'], span_end)
+
+    def _add_exception(self, series_id: str, event_id: str, original_start: dict) -> None:
+        self.exceptions.setdefault(series_id, {})[event_id] = original_start
+        if series_id in self.series:
+            self.series[series_id]['version'] = next(self._versions)
+
+    # ──────────────── QUERIES ────────────────────────────────────────
+    def between(self, start: int, end: int) -> list[dict]:
+        """Events and occurrences overlapping [start, end), ordered by start."""
+        with self.lock:
+            found = [self.events[k] for k in self.index.overlapping(start, end)]
+            for series_id in self.series_index.overlapping(start, end):
+                series = self.series[series_id]
+                found.extend(self._occurrence(series, s, e) for s, e in self._spans(series, start, end))
+        found.sort(key=lambda e: e['start'])
+        return found
+
+    def busy(self, start: int, end: int) -> list[tuple[int, int]]:
+        """Busy (opaque, not declined) intervals overlapping [start, end)."""
+        with self.lock:
+            events = (self.events[k] for k in self.index.overlapping(start, end))
+            spans = [(e['start'], e['end']) for e in events if e['busy']]
+            for series_id in self.series_index.overlapping(start, end):
+                if self.series[series_id]['busy']:
+                    spans.extend(self._spans(self.series[series_id], start, end))
+        return spans
+
+    def _spans(self, series: dict, start: int, end: int) -> Iterable[tuple[int, int]]:
+        """(start, end) of the series' occurrences overlapping [start, end)."""
+        # an occurrence overlapping the window started at most `length`
+        # (plus a DST hour for all-day ones) before it
+        first = (start - series['length'] - 3_600_000) // WINDOW_MS
+        for window in range(first, (end - 1) // WINDOW_MS + 1):
+            key = (self.calendar_id, series['id'], series['version'], window)
+            spans = self.windows.get(key)
+            if spans is None:
+                spans = self._expand(series, window * WINDOW_MS, (window + 1) * WINDOW_MS)
+                self.windows.set(key, spans)
+            for i in range(0, len(spans), 2):
+                if spans[i] < end and spans[i + 1] > start:
+                    yield spans[i], spans[i + 1]
+
+    def _expand(self, series: dict, lo: int, hi: int) -> array:
+        """(start, end) pairs, flattened, of the occurrences starting in [lo, hi)."""
+        replaced = {_event_time(original, series['tz'])[0]
+                    for original in self.exceptions.get(series['id'], {}).values()}
+        spans = array('q')
+        for start in series['recurrence'].occurrences(after=lo):
+            if start >= hi:
+                break
+            if start < lo or start in replaced:
+                continue
+            if series['all_day']:
+                day = _to_datetime(start, series['tz']).date() + timedelta(days=series['days'])
+                end = _ms(datetime.combine(day, datetime.min.time(), series['tz']))
+            else:
+                end = start + series['length']
+            spans.extend((start, end))
+        return spans
+
+    def _occurrence(self, series: dict, start: int, end: int) -> dict:
+        """An occurrence as an event, with Google's instance ID format."""
+        if series['all_day']:
+            stamp = _to_datetime(start, series['tz']).strftime('%Y%m%d')
+        else:
+            stamp = datetime.fromtimestamp(start / 1000, timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        return {**series, 'id': f"{series['id']}_{stamp}", 'start': start, 'end': end,
+                'recurring_event_id': series['id']}
+
+
+class CalendarTool:
+    API_NAME = 'calendar'
+    API_VERSION = 'v3'
+    SCOPES = ['https://www.googleapis.com/auth/calendar']
+    # how old a mirror may get before a query triggers a background sync
+    SYNC_MAX_AGE = 60.0
+    # background syncs that fail wait SYNC_MAX_AGE * 2**failures, up to this
+    SYNC_MAX_BACKOFF = 3600.0
+    # expanded 28-day occurrence windows kept across all mirrors
+    WINDOW_CACHE_SIZE = 8192
+
+    def __init__(self, client_secret_file: str, account: Optional[str] = None, service=None) -> None:
+        self.client_secret_file = client_secret_file
+        self.account = account
+        if service is None:
+            self._init_service()
+        else:
+            self.service = service
+        self._mirrors: dict[str, CalendarMirror] = {}
+        self._mirrors_lock = threading.Lock()
+        self._windows = WindowCache(self.WINDOW_CACHE_SIZE)
+        self._calendars: Optional[dict[str, dict]] = None
+        self._primary: Optional[str] = None
+
+    def _init_service(self) -> None:
+        self.service = create_service(
+            self.client_secret_file,
+            self.API_NAME,
+            self.API_VERSION,
+            self.SCOPES,
+            prefix=f'_{self.account}' if self.account else ''
+        )
+
+    def _execute(self, request, endpoint: str):
+        return execute(request, 'calendar', endpoint)
+
+    def close(self) -> None:
+        """Closes the underlying HTTP connections."""
+        if self.service is not None:
+            self.service.close()
+
+    # ──────────────── CALENDARS ──────────────────────────────────────
+    def list_calendars(self, refresh: bool = False) -> List[dict]:
+        """Lists the calendars in the user's calendar list.
+
+        Args:
+            refresh: Refetch the list instead of using the cached copy.
+
+        Returns:
+            A list of {id, summary, time_zone, primary, access_role}.
+        """
+        if self._calendars is None or refresh:
+            calendars, page_token = {}, None
+            while True:
+                response = self._execute(self.service.calendarList().list(pageToken=page_token), 'calendarList.list')
+                for c in response.get('items', []):
+                    calendars[c['id']] = c
+                    if c.get('primary'):
+                        self._primary = c['id']
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+            self._calendars = calendars
+        return [{'id': c['id'], 'summary': c.get('summaryOverride') or c.get('summary', ''),
+                 'time_zone': c.get('timeZone'), 'primary': bool(c.get('primary')),
+                 'access_role': c.get('accessRole')}
+                for c in self._calendars.values()]
+
+    def _resolve(self, calendar_id: str) -> str:
+        if calendar_id == 'primary':
+            self.list_calendars()
+            return self._primary or calendar_id
+        return calendar_id
+
+    def _time_zone(self, time_zone: Optional[str] = None, calendar_id: str = 'primary') -> ZoneInfo:
+        if time_zone:
+            return ZoneInfo(time_zone)
+        self.list_calendars()
+        entry = self._calendars.get(self._resolve(calendar_id), {})
+        return ZoneInfo(entry.get('timeZone') or 'UTC')
+
+    def _mirror(self, calendar_id: str) -> CalendarMirror:
+        calendar_id = self._resolve(calendar_id)
+        mirror = self._mirrors.get(calendar_id)
+        if mirror is None:
+            # may list the calendars; keep that request out of the lock
+            time_zone = self._time_zone(calendar_id=calendar_id).key
+            with self._mirrors_lock:
+                mirror = self._mirrors.setdefault(
+                    calendar_id, CalendarMirror(calendar_id, time_zone, self._windows))
+        return mirror
+
+    # ──────────────── SYNC ───────────────────────────────────────────
+    def sync(self, calendar_ids: Optional[Iterable[str]] = None) -> dict:
+        """Brings the local mirrors up to date.
+
+        The first sync of a calendar lists all its events; later ones send
+        the stored sync token and only receive what changed.
+
+        Args:
+            calendar_ids: Calendars to sync (all mirrored ones, or the primary calendar, if None).
+
+        Returns:
+            A dictionary mapping each calendar ID to {changed, events, full}.
+        """
+        if calendar_ids is None:
+            calendar_ids = list(self._mirrors) or ['primary']
+        return {m.calendar_id: self._sync(m) for m in map(self._mirror, calendar_ids)}
+
+    def _sync(self, mirror: CalendarMirror) -> dict:
+        from googleapiclient.errors import HttpError
+
+        with mirror.sync_lock:
+            token = mirror.sync_token
+            try:
+                items, next_token = self._fetch_changes(mirror.calendar_id, token)
+            except HttpError as e:
+                if e.resp.status != 410 or token is None:
+                    raise
+                # sync token expired: start over with a full sync
+                log.info("Sync token for %s expired, doing a full sync", mirror.calendar_id)
+                token = None
+                items, next_token = self._fetch_changes(mirror.calendar_id, None)
+            # queries keep seeing the previous state until the whole sync is in
+            mirror.update(items, full=token is None)
+            mirror.sync_token = next_token
+            mirror.synced_at = time.monotonic()
+            mirror.sync_failures = 0
+            return {'changed': len(items), 'events': len(mirror), 'full': token is None}
+
+    def _fetch_changes(self, calendar_id: str, sync_token: Optional[str]) -> tuple[list[dict], Optional[str]]:
+        """All events changed since `sync_token` (every event if None), and the next token."""
+        # series come as one master event each and are expanded locally
+        params = {'calendarId': calendar_id, 'singleEvents': False,
+                  'showDeleted': True, 'maxResults': 2500}
+        if sync_token:
+            params['syncToken'] = sync_token
+        items, page_token = [], None
+        while True:
+            response = self._execute(self.service.events().list(pageToken=page_token, **params), 'events.list')
+            items.extend(response.get('items', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return items, response.get('nextSyncToken')
+
+    def _ensure_synced(self, calendar_ids: Iterable[str], max_age: Optional[float] = None) -> list[CalendarMirror]:
+        """Mirrors for `calendar_ids`; synced now if never synced, in the background if stale."""
+        max_age = self.SYNC_MAX_AGE if max_age is None else max_age
+        mirrors = [self._mirror(c) for c in calendar_ids]
+        for mirror in mirrors:
+            if mirror.synced_at is None:
+                self._sync(mirror)
+            elif (time.monotonic() - mirror.synced_at > max_age and not mirror.sync_lock.locked()
+                  and not self._backing_off(mirror)):
+                threading.Thread(target=self._sync_in_background, args=(mirror,), daemon=True).start()
+        return mirrors
+
+    def _sync_in_background(self, mirror: CalendarMirror) -> None:
+        # queries keep answering from the stale mirror in the meantime
+        try:
+            self._sync(mirror)
+        except Exception as e:
+            mirror.sync_failures += 1
+            mirror.sync_failed_at = time.monotonic()
+            log.warning("Background sync of %s failed (%d in a row): %s",
+                        mirror.calendar_id, mirror.sync_failures, e)
+
+    def _backing_off(self, mirror: CalendarMirror) -> bool:
+        if not mirror.sync_failures:
+            return False
+        delay = min(self.SYNC_MAX_AGE * 2 ** mirror.sync_failures, self.SYNC_MAX_BACKOFF)
+        return time.monotonic() - mirror.sync_failed_at < delay
+
+    # ──────────────── QUERIES (local) ────────────────────────────────
+    def _window(self, start, end, tz: ZoneInfo, default_days: int = 1) -> tuple[int, int]:
+        start_ms = parse_time(start, tz) if start else int(time.time() * 1000)
+        end_ms = parse_time(end, tz) if end else start_ms + default_days * DAY_MS
+        if end_ms <= start_ms:
+            raise ValueError('end must be after start')
+        return start_ms, end_ms
+
+    def _event(self, mirror: CalendarMirror, e: dict, tz: ZoneInfo) -> CalendarEvent:
+        series = 'recurrence' in e and not e['recurring_event_id']
+        return CalendarEvent(id=e['id'], calendar_id=mirror.calendar_id, summary=e['summary'],
+                             start=_iso(e['start'], tz), end=_iso(e['end'], tz),
+                             all_day=e['all_day'], busy=e['busy'],
+                             location=e['location'], html_link=e['html_link'],
+                             recurring_event_id=e['recurring_event_id'],
+                             recurrence=e['recurrence'].lines if series else None)
+
+    def events(self, start: Optional[str] = None, end: Optional[str] = None,
+               calendar_ids: Optional[List[str]] = None, time_zone: Optional[str] = None) -> List[CalendarEvent]:
+        """Lists the events overlapping a time window, from the local mirror.
+
+        Args:
+            start: Window start (default now).
+            end: Window end, exclusive (default one day after start).
+            calendar_ids: Calendars to include (default the primary calendar).
+            time_zone: IANA time zone for naive inputs and the returned times.
+
+        Returns:
+            The events ordered by start time.
+        """
+        tz = self._time_zone(time_zone)
+        start_ms, end_ms = self._window(start, end, tz)
+        found = [(e['start'], m, e) for m in self._ensure_synced(calendar_ids or ['primary'])
+                 for e in m.between(start_ms, end_ms)]
+        found.sort(key=lambda t: t[0])
+        return [self._event(m, e, tz) for _, m, e in found]
+
+    def free_busy(self, start: Optional[str] = None, end: Optional[str] = None,
+                  calendar_ids: Optional[List[str]] = None, time_zone: Optional[str] = None) -> dict:
+        """Busy intervals in a time window, per calendar and merged.
+
+        Args:
+            start: Window start (default now).
+            end: Window end, exclusive (default one day after start).
+            calendar_ids: Calendars to include (default the primary calendar).
+            time_zone: IANA time zone for naive inputs and the returned times.
+
+        Returns:
+            {"busy": merged intervals, "free": the gaps between them,
+             "calendars": {calendar_id: busy intervals}}.
+        """
+        tz = self._time_zone(time_zone)
+        start_ms, end_ms = self._window(start, end, tz)
+        per_calendar, everything = {}, []
+        for m in self._ensure_synced(calendar_ids or ['primary']):
+            busy = merge((max(s, start_ms), min(e, end_ms)) for s, e in m.busy(start_ms, end_ms))
+            per_calendar[m.calendar_id] = busy
+            everything.extend(busy)
+        merged = merge(everything)
+
+        def out(intervals):
+            return [{'start': _iso(s, tz), 'end': _iso(e, tz)} for s, e in intervals]
+
+        return {'busy': out(merged), 'free': out(gaps(merged, start_ms, end_ms)),
+                'calendars': {cid: out(b) for cid, b in per_calendar.items()}}
+
+    def conflicts(self, start: str, end: str, calendar_ids: Optional[List[str]] = None,
+                  time_zone: Optional[str] = None) -> List[CalendarEvent]:
+        """Lists the busy events that overlap a proposed time.
+
+        Args:
+            start: Proposed start.
+            end: Proposed end, exclusive.
+            calendar_ids: Calendars to check (default the primary calendar).
+            time_zone: IANA time zone for naive inputs and the returned times.
+
+        Returns:
+            The conflicting events; empty if the time is free.
+        """
+        return [e for e in self.events(start, end, calendar_ids, time_zone) if e.busy]
+
+    def free_slots(self, duration_minutes: int, after: Optional[str] = None, count: int = 5,
+                   calendar_ids: Optional[List[str]] = None, days: int = 14,
+                   day_start: Optional[str] = '09:00', day_end: Optional[str] = '17:00',
+                   include_weekends: bool = False, granularity_minutes: int = 15,
+                   time_zone: Optional[str] = None) -> List[TimeSlot]:
+        """Finds the next free slots that are free in every given calendar.
+
+        Args:
+            duration_minutes: Length of each slot.
+            after: Earliest start (default now).
+            count: How many slots to return.
+            calendar_ids: Calendars that must all be free (default the primary calendar).
+            days: How far ahead to look.
+            day_start: Start of the working day ("HH:MM"), None for midnight.
+            day_end: End of the working day ("HH:MM"), None for midnight.
+            include_weekends: Also offer Saturdays and Sundays.
+            granularity_minutes: Slots start on multiples of this many minutes.
+            time_zone: IANA time zone for working hours, naive inputs and the returned times.
+
+        Returns:
+            Up to `count` slots in chronological order.
+        """
+        if duration_minutes <= 0 or granularity_minutes <= 0:
+            raise ValueError('duration_minutes and granularity_minutes must be positive')
+        tz = self._time_zone(time_zone)
+        start_ms, end_ms = self._window(after, None, tz, default_days=days)
+        busy = merge(iv for m in self._ensure_synced(calendar_ids or ['primary'])
+                     for iv in m.busy(start_ms, end_ms))
+        length, step = duration_minutes * 60_000, granularity_minutes * 60_000
+        open_at = datetime.strptime(day_start or '00:00', '%H:%M').time()
+        close_at = datetime.strptime(day_end, '%H:%M').time() if day_end else None
+
+        slots = []
+        day = _to_datetime(start_ms, tz).date()
+        while len(slots) < count and _ms(datetime.combine(day, open_at, tz)) < end_ms:
+            if include_weekends or day.weekday() < 5:
+                midnight = _ms(datetime.combine(day, datetime.min.time(), tz))
+                opens = _ms(datetime.combine(day, open_at, tz))
+                closes = _ms(datetime.combine(day + timedelta(days=1) if close_at is None else day,
+                                              close_at or datetime.min.time(), tz))
+                for free_start, free_end in gaps(busy, max(opens, start_ms), min(closes, end_ms)):
+                    t = midnight - (midnight - free_start) // step * step
+                    while t + length <= free_end and len(slots) < count:
+                        slots.append(TimeSlot(start=_iso(t, tz), end=_iso(t + length, tz)))
+                        # next slot starts on the grid too, not right at this one's end
+                        t += -(-length // step) * step
+            day += timedelta(days=1)
+        return slots
+
+    # ──────────────── WRITES ─────────────────────────────────────────
+    def create_event(self, summary: str, start: str, end: str, calendar_id: str = 'primary',
+                     description: Optional[str] = None, location: Optional[str] = None,
+                     attendees: Optional[List[str]] = None, time_zone: Optional[str] = None,
+                     recurrence: Optional[List[str]] = None) -> CalendarEvent:
+        """Creates an event, or a recurring series if `recurrence` is given.
+
+        Plain dates for both `start` and `end` make an all-day event.  A
+        recurrence is validated locally before anything is sent.  The new
+        event is added to the local mirror straight away.
+
+        Args:
+            summary: The title of the event.
+            start: Start time (or date) of the (first) event.
+            end: End time (or date), exclusive, of the (first) event.
+            calendar_id: The calendar to add the event to.
+            description: Optional event description.
+            location: Optional event location.
+            attendees: Optional attendee email addresses.
+            time_zone: IANA time zone for naive inputs (default the calendar's).
+            recurrence: Optional RRULE / EXDATE / RDATE lines.
+
+        Returns:
+            The created event; for a series, its first occurrence and recurrence lines.
+
+        Raises:
+            ValueError: If the times or the recurrence are invalid.
+        """
+        tz = self._time_zone(time_zone, calendar_id)
+        all_day = len(start) == 10 and len(end) == 10
+        if parse_time(end, tz) <= parse_time(start, tz):
+            raise ValueError('end must be after start')
+        if all_day:
+            body = {'start': {'date': start}, 'end': {'date': end}}
+        else:
+            body = {'start': {'dateTime': _iso(parse_time(start, tz), tz), 'timeZone': tz.key},
+                    'end': {'dateTime': _iso(parse_time(end, tz), tz), 'timeZone': tz.key}}
+        if recurrence:
+            first = date.fromisoformat(start) if all_day else _to_datetime(parse_time(start, tz), tz)
+            body['recurrence'] = validate(recurrence, first, tz).lines
+            if all_day:
+                body['start']['timeZone'] = body['end']['timeZone'] = tz.key
+        body['summary'] = summary
+        if description:
+            body['description'] = description
+        if location:
+            body['location'] = location
+        if attendees:
+            body['attendees'] = [{'email': a} for a in attendees]
+
+        mirror = self._mirror(calendar_id)
+        created = self._execute(self.service.events().insert(calendarId=mirror.calendar_id, body=body), 'events.insert')
+        # write-through; the next incremental sync re-applies it harmlessly
+        mirror.update([created])
+        return self._event(mirror, mirror.series.get(created['id']) or mirror.events[created['id']], tz)
+
+    def create_recurring_event(self, summary: str, start: str, end: str, rrule: str,
+                               exdates: Optional[List[str]] = None, calendar_id: str = 'primary',
+                               description: Optional[str] = None, location: Optional[str] = None,
+                               attendees: Optional[List[str]] = None,
+                               time_zone: Optional[str] = None) -> CalendarEvent:
+        """Creates a recurring series from an RRULE and optional skipped dates.
 
+        Args:
+            summary: The title of the events.
+            start: Start time (or date) of the first occurrence.
+            end: End time (or date), exclusive, of the first occurrence.
+            rrule: The rule, e.g. "FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10".
+            exdates: Start times (or dates) of occurrences to leave out.
+            calendar_id: The calendar to add the series to.
+            description: Optional event description.
+            location: Optional event location.
+            attendees: Optional attendee email addresses.
+            time_zone: IANA time zone of the series (default the calendar's).
 
+        Returns:
+            The created series.
 
-"""
\ No newline at end of file
+        Raises:
+            ValueError: If the rule, the start or an excluded date is invalid.
+        """
+        tz = self._time_zone(time_zone, calendar_id)
+        lines = [rrule if rrule.upper().startswith('RRULE:') else f'RRULE:{rrule}']
+        if exdates and len(start) == 10:
+            lines.append('EXDATE;VALUE=DATE:' + ','.join(date.fromisoformat(d).strftime('%Y%m%d') for d in exdates))
+        elif exdates:
+            lines.append(f'EXDATE;TZID={tz.key}:' + ','.join(
+                _to_datetime(parse_time(d, tz), tz).strftime('%Y%m%dT%H%M%S') for d in exdates))
+        return self.create_event(summary, start, end, calendar_id, description, location,
+                                 attendees, tz.key, recurrence=lines)
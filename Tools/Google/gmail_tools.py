@@ -1,12 +1,16 @@
 import os 
 import base64
-from typing import Literal, Optional, List
+import logging
+from typing import Iterator, Literal, Optional, List
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
 from pydantic import BaseModel, Field
-from .google_apis import create_service
+from .google_apis import create_service, execute
+
+# errors are logged (stderr), never printed: stdout is the MCP stdio transport
+log = logging.getLogger(__name__)
 
 class EmailMessage(BaseModel):
     msg_id: str = Field(..., description="The ID of the email message.")
@@ -40,18 +44,42 @@ class GmailTool:
     API_VERSION = 'v1'
     SCOPES = ['https://mail.google.com/']
 
-    def __init__(self, client_secret_file: str) -> None:
+    def __init__(self, client_secret_file: str, account: Optional[str] = None, service=None) -> None:
         self.client_secret_file = client_secret_file
-        self._init_service()
+        self.account = account
+        if service is None:
+            self._init_service()
+        else:
+            # a ready-made service, e.g. one pointed at benchmarks/fake_api.py
+            self.service = service
 
     def _init_service(self) -> None:
+        # each account gets its own token file under 'token files/'
         self.service = create_service(
             self.client_secret_file,
             self.API_NAME,
             self.API_VERSION,
-            self.SCOPES
+            self.SCOPES,
+            prefix=f'_{self.account}' if self.account else ''
         )
 
+    def _execute(self, request, endpoint: str):
+        """Executes a Google API request, recording its latency and payload sizes.
+
+        Args:
+            request: The googleapiclient HttpRequest to execute.
+            endpoint: The metrics label for the call, e.g. 'messages.get'.
+
+        Returns:
+            The parsed response.
+        """
+        return execute(request, 'gmail', endpoint)
+
+    def close(self) -> None:
+        """Closes the underlying HTTP connections."""
+        if self.service is not None:
+            self.service.close()
+
     def send_email(self, to: str, subject: str, message_text: str, files: List[str] = None) -> dict:
         """Sends an email to the specified recipient.
 
@@ -80,7 +108,7 @@ class GmailTool:
 
         raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
         create_message = {'raw': raw_message}
-        sent_message = self.service.users().messages().send(userId='me', body=create_message).execute()
+        sent_message = self._execute(self.service.users().messages().send(userId='me', body=create_message), 'messages.send')
         return sent_message
 
     def search_emails(self, query: str, max_results: int = 10) -> EmailMessages:
@@ -94,7 +122,7 @@ class GmailTool:
             A list of email messages matching the query.
         """
         try:
-            response = self.service.users().messages().list(userId='me', q=query, maxResults=max_results).execute()
+            response = self._execute(self.service.users().messages().list(userId='me', q=query, maxResults=max_results), 'messages.list')
             messages = response.get('messages', [])
             email_messages = []
             for msg in messages:
@@ -106,9 +134,35 @@ class GmailTool:
                 next_page_token=response.get('nextPageToken')
             )
         except Exception as e:
-            print(f"An error occurred: {e}")
+            log.error("An error occurred: %s", e)
             return EmailMessages(count=0, messages=[], next_page_token=None)
 
+    def iter_emails(self, query: str, max_results: Optional[int] = None) -> Iterator[EmailMessage]:
+        """Yields the emails matching the given query, newest first.
+
+        Message ids are listed a page at a time and each message is fetched
+        only when it is reached, so nothing past the consumer's position is
+        requested or held.
+
+        Args:
+            query: The query to search for.
+            max_results: Stop after this many emails (all matches if None).
+
+        Yields:
+            EmailMessage objects.
+        """
+        page_token, seen = None, 0
+        while max_results is None or seen < max_results:
+            page_size = 100 if max_results is None else min(100, max_results - seen)
+            response = self._execute(self.service.users().messages().list(
+                userId='me', q=query, maxResults=page_size, pageToken=page_token), 'messages.list')
+            for msg in response.get('messages', []):
+                seen += 1
+                yield self.get_email(msg['id'])
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+
     def get_email(self, msg_id: str) -> EmailMessage:
         """Gets the details of a specific email message.
 
@@ -118,14 +172,15 @@ class GmailTool:
         Returns:
             An EmailMessage object containing the email's details.
         """
-        msg = self.service.users().messages().get(userId='me', id=msg_id, format='full').execute()
+        msg = self._execute(self.service.users().messages().get(userId='me', id=msg_id, format='full'), 'messages.get')
         payload = msg.get('payload', {})
         headers = payload.get('headers', [])
         
-        subject = next((h['value'] for h in headers if h['name'] == 'subject'), '')
-        sender = next((h['value'] for h in headers if h['name'] == 'from'), '')
-        recipients = next((h['value'] for h in headers if h['name'] == 'to'), '')
-        date = next((h['value'] for h in headers if h['name'] == 'date'), '')
+        # header names are case-insensitive; Gmail sends 'Subject', 'From', ...
+        subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), '')
+        sender = next((h['value'] for h in headers if h['name'].lower() == 'from'), '')
+        recipients = next((h['value'] for h in headers if h['name'].lower() == 'to'), '')
+        date = next((h['value'] for h in headers if h['name'].lower() == 'date'), '')
         
         body, has_attachments = self._get_body_content(payload)
         
@@ -138,7 +193,7 @@ class GmailTool:
             snippet=msg.get('snippet', ''),
             has_attachments=has_attachments,
             date=date,
-            star='starred' in msg.get('labelIds', []),
+            star='STARRED' in msg.get('labelIds', []),
             label=msg.get('labelIds', [])
         )
 
@@ -171,10 +226,10 @@ class GmailTool:
             msg_id: The ID of the email message to delete.
         """
         try:
-            self.service.users().messages().trash(userId='me', id=msg_id).execute()
-            print(f"Message with id: {msg_id} trashed successfully.")
+            self._execute(self.service.users().messages().trash(userId='me', id=msg_id), 'messages.trash')
+            log.info("Message with id: %s trashed successfully.", msg_id)
         except Exception as e:
-            print(f"An error occurred: {e}")
+            log.error("An error occurred: %s", e)
 
     def list_labels(self) -> Labels:
         """Lists all the labels in the user's mailbox.
@@ -183,9 +238,9 @@ class GmailTool:
             A list of labels.
         """
         try:
-            response = self.service.users().labels().list(userId='me').execute()
+            response = self._execute(self.service.users().labels().list(userId='me'), 'labels.list')
             labels = response.get('labels', [])
             return Labels(labels=labels)
         except Exception as e:
-            print(f"An error occurred: {e}")
+            log.error("An error occurred: %s", e)
             return Labels(labels=[])
@@ -1,8 +1,41 @@
 import os
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
+import time
+from ..metrics import record_upstream, record_upstream_bytes
+
+def execute(request, api_name, endpoint):
+    """
+    Execute a googleapiclient request, recording its latency and payload
+    sizes in the upstream metrics.
+
+    Args:
+        request: The HttpRequest to execute
+        api_name: metrics service label, e.g. 'gmail'
+        endpoint: metrics endpoint label, e.g. 'messages.get'
+
+    Returns:
+        The parsed response
+    """
+    postproc = request.postproc
+
+    def measured(resp, content):
+        record_upstream_bytes(api_name, len(request.body or ''), len(content or b''))
+        return postproc(resp, content)
+
+    request.postproc = measured
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        return request.execute()
+    except Exception:
+        status = 'error'
+        raise
+    finally:
+        record_upstream(api_name, endpoint, time.perf_counter() - start, status)
+
+def token_path(api_name, api_version, prefix=''):
+    """Path of the cached OAuth token `create_service` reads and writes."""
+    return os.path.join(os.getcwd(), 'token files', f'token_{api_name}_{api_version}{prefix}.json')
+
 
 def create_service(client_secret_file, api_name, api_version, *scopes, prefix =''):
     """
@@ -18,6 +51,13 @@ def create_service(client_secret_file, api_name, api_version, *scopes, prefix ='
     Returns:
         Google API service instance or None if failed
     """
+    # imported here so loading the tool modules doesn't pull in the Google
+    # client stack until a service is actually needed
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+    from google.oauth2.credentials import Credentials
+    from google.auth.transport.requests import Request
+
     CLIENT_SECRET_FILE = client_secret_file
     API_NAME = api_name
     API_VERSION = api_version
@@ -26,7 +66,7 @@ def create_service(client_secret_file, api_name, api_version, *scopes, prefix ='
     creds = None
     dir = os.getcwd()
     token_dir = 'token files'
-    token_file = f'token_{API_NAME}_{API_VERSION}{prefix}.json'
+    token_file = os.path.basename(token_path(API_NAME, API_VERSION, prefix))
 
     if not os.path.exists(os.path.join(dir,token_dir)):
         os.mkdir(os.path.join(dir,token_dir))
@@ -0,0 +1,113 @@
+"""
+Static interval index over half-open [start, end) integer intervals.
+
+Intervals are kept in arrays sorted by start and searched as an implicit
+balanced binary tree: node `mid` of the range [lo, hi) stores the largest end
+in that range, so an overlap query skips every subtree that ends before the
+window and stops at the first start past it — O(log n + k) per query.
+
+The index is rebuilt (O(n log n)) on the first query after a change, which
+suits calendars: many reads, occasional small syncs.
+"""
+from array import array
+from typing import Hashable, Iterable
+
+
+class IntervalIndex:
+
+    def __init__(self):
+        self._items: dict[Hashable, tuple[int, int]] = {}
+        self._dirty = True
+        self._keys: list = []
+        self._starts = array("q")
+        self._ends = array("q")
+        self._max_end = array("q")
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key) -> bool:
+        return key in self._items
+
+    def set(self, key: Hashable, start: int, end: int) -> None:
+        """Add or move interval `key`."""
+        if self._items.get(key) != (start, end):
+            self._items[key] = (start, end)
+            self._dirty = True
+
+    def discard(self, key: Hashable) -> None:
+        if self._items.pop(key, None) is not None:
+            self._dirty = True
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._dirty = True
+
+    # ──────────────── QUERIES ────────────────────────────────────────
+    def overlapping(self, start: int, end: int) -> list:
+        """Keys of the intervals overlapping [start, end), ordered by start."""
+        self._build()
+        out: list[int] = []
+        self._search(0, len(self._keys), start, end, out)
+        out.sort()
+        return [self._keys[i] for i in out]
+
+    def _search(self, lo: int, hi: int, start: int, end: int, out: list) -> None:
+        starts, ends, max_end = self._starts, self._ends, self._max_end
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if max_end[mid] <= start:
+                return                          # whole subtree ends before the window
+            self._search(lo, mid, start, end, out)
+            if starts[mid] >= end:
+                return                          # mid and everything right start after it
+            if ends[mid] > start:
+                out.append(mid)
+            lo = mid + 1
+
+    def _build(self) -> None:
+        if not self._dirty:
+            return
+        ordered = sorted(self._items.items(), key=lambda kv: kv[1])
+        self._keys = [k for k, _ in ordered]
+        self._starts = array("q", (s for _, (s, _e) in ordered))
+        self._ends = array("q", (e for _, (_s, e) in ordered))
+        self._max_end = array("q", self._ends)
+        self._fill_max(0, len(ordered))
+        self._dirty = False
+
+    def _fill_max(self, lo: int, hi: int) -> int:
+        if lo >= hi:
+            return -(1 << 62)
+        mid = (lo + hi) // 2
+        best = max(self._ends[mid], self._fill_max(lo, mid), self._fill_max(mid + 1, hi))
+        self._max_end[mid] = best
+        return best
+
+
+def merge(intervals: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Union of [start, end) intervals as a sorted list of disjoint intervals."""
+    merged: list[list[int]] = []
+    for s, e in sorted(intervals):
+        if merged and s <= merged[-1][1]:
+            if e > merged[-1][1]:
+                merged[-1][1] = e
+        else:
+            merged.append([s, e])
+    return [(s, e) for s, e in merged]
+
+
+def gaps(busy: list[tuple[int, int]], start: int, end: int) -> list[tuple[int, int]]:
+    """The parts of [start, end) not covered by the sorted, disjoint `busy`."""
+    free, cursor = [], start
+    for s, e in busy:
+        if e <= cursor:
+            continue
+        if s >= end:
+            break
+        if s > cursor:
+            free.append((cursor, s))
+        cursor = max(cursor, e)
+    if cursor < end:
+        free.append((cursor, end))
+    return free
@@ -0,0 +1,385 @@
+"""
+Local expansion of RFC 5545 recurrences, the subset Google Calendar uses.
+
+A recurring series is stored once, as its master event plus the master's
+`recurrence` lines:
+
+    RRULE:FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20271231T235959Z
+    EXDATE;TZID=Europe/Berlin:20261021T090000
+    RDATE;VALUE=DATE:20261224
+
+and its occurrences are generated lazily and in order on the series' wall
+clock, so a 09:00 meeting stays at 09:00 across DST changes.  Supported rule
+parts: FREQ (DAILY, WEEKLY, MONTHLY, YEARLY), INTERVAL, COUNT, UNTIL, BYDAY
+(with ordinals such as 2TU or -1FR in monthly / yearly rules), BYMONTHDAY,
+BYMONTH, BYSETPOS and WKST.  Anything else raises ValueError, which is also
+how a new series is validated before it is sent (see `validate`).
+"""
+import calendar
+import heapq
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterator, Optional, Union
+from zoneinfo import ZoneInfo
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+RULE_PARTS = {'FREQ', 'INTERVAL', 'COUNT', 'UNTIL', 'BYDAY', 'BYMONTHDAY', 'BYMONTH', 'BYSETPOS', 'WKST'}
+
+# unbounded series are not expanded past this year
+MAX_YEAR = 2200
+# a rule with no occurrence in this many consecutive periods never has one
+# (a daily rule for February 29th has runs of about 1460 empty days)
+MAX_EMPTY_PERIODS = 3000
+
+When = Union[date, datetime]
+
+
+def _ms(dt: datetime) -> int:
+    return int(dt.timestamp() * 1000)
+
+def parse_value(value: str, tz: Optional[ZoneInfo] = None) -> When:
+    """A DATE (20261021) or DATE-TIME (20261021T090000, ...Z for UTC) value."""
+    try:
+        if 'T' not in value:
+            return datetime.strptime(value, '%Y%m%d').date()
+        dt = datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+    except ValueError:
+        raise ValueError(f'Invalid date or time {value!r}, expected YYYYMMDD or YYYYMMDDTHHMMSS[Z]') from None
+    if value.endswith('Z'):
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.replace(tzinfo=tz) if tz else dt
+
+def _ints(parts: dict, key: str, low: int, high: int) -> list[int]:
+    values = []
+    for v in parts[key].split(',') if key in parts else []:
+        try:
+            n = int(v)
+        except ValueError:
+            raise ValueError(f'{key} values must be integers, got {v!r}') from None
+        if not low <= abs(n) <= high or (low > 0 and n < 0 and key == 'BYMONTH'):
+            raise ValueError(f'{key} value {n} is out of range')
+        values.append(n)
+    return values
+
+def _weekday(value: str) -> tuple[int, int]:
+    """(ordinal or 0, weekday) of a BYDAY value such as MO, 2TU or -1FR."""
+    ordinal, day = value[:-2], value[-2:]
+    if day not in WEEKDAYS or (ordinal and not ordinal.lstrip('+-').isdigit()):
+        raise ValueError(f'Invalid BYDAY value {value!r}')
+    n = int(ordinal or 0)
+    if ordinal and not 1 <= abs(n) <= 53:
+        raise ValueError(f'BYDAY ordinal {n} is out of range')
+    return n, WEEKDAYS.index(day)
+
+def _pick(ordered: list, positions) -> list:
+    """Elements at 1-based (negative: from the end) positions."""
+    out = set()
+    for p in positions:
+        if p > 0 and p <= len(ordered):
+            out.add(ordered[p - 1])
+        elif p < 0 and -p <= len(ordered):
+            out.add(ordered[p])
+    return sorted(out)
+
+
+class Rule:
+    """One parsed RRULE; `dates` generates the dates it produces."""
+
+    def __init__(self, text: str):
+        self.text = text if text.upper().startswith('RRULE:') else f'RRULE:{text}'
+        parts = {}
+        for part in self.text[6:].split(';'):
+            key, sep, value = part.partition('=')
+            key = key.strip().upper()
+            if not sep or not value.strip():
+                raise ValueError(f'Malformed RRULE part {part!r}')
+            if key in parts:
+                raise ValueError(f'{key} is given twice')
+            parts[key] = value.strip().upper()
+        unsupported = sorted(set(parts) - RULE_PARTS)
+        if unsupported:
+            raise ValueError(f'Unsupported RRULE part(s): {", ".join(unsupported)}')
+        self.freq = parts.get('FREQ')
+        if self.freq not in FREQUENCIES:
+            raise ValueError(f'FREQ must be one of {", ".join(FREQUENCIES)}')
+        self.interval = (_ints(parts, 'INTERVAL', 1, 1000) or [1])[0]
+        if self.interval < 1:
+            raise ValueError('INTERVAL must be positive')
+        self.count = (_ints(parts, 'COUNT', 1, 100_000) or [None])[0]
+        if self.count is not None and self.count < 1:
+            raise ValueError('COUNT must be positive')
+        if self.count and 'UNTIL' in parts:
+            raise ValueError('COUNT and UNTIL cannot both be given')
+        self.until = parse_value(parts['UNTIL']) if 'UNTIL' in parts else None
+        self.byday = [_weekday(v) for v in parts['BYDAY'].split(',')] if 'BYDAY' in parts else []
+        self.bymonthday = _ints(parts, 'BYMONTHDAY', 1, 31)
+        self.bymonth = _ints(parts, 'BYMONTH', 1, 12)
+        self.bysetpos = _ints(parts, 'BYSETPOS', 1, 366)
+        if parts.get('WKST', 'MO') not in WEEKDAYS:
+            raise ValueError(f'Invalid WKST {parts["WKST"]!r}')
+        self.wkst = WEEKDAYS.index(parts.get('WKST', 'MO'))
+        if any(n for n, _ in self.byday) and self.freq not in ('MONTHLY', 'YEARLY'):
+            raise ValueError('BYDAY ordinals (like 2TU) need FREQ=MONTHLY or FREQ=YEARLY')
+        if self.bymonthday and self.freq == 'WEEKLY':
+            raise ValueError('BYMONTHDAY cannot be used with FREQ=WEEKLY')
+        if self.bysetpos and not (self.byday or self.bymonthday or self.bymonth):
+            raise ValueError('BYSETPOS needs BYDAY, BYMONTHDAY or BYMONTH')
+
+    def __repr__(self) -> str:
+        return self.text
+
+    # ──────────────── PERIODS ────────────────────────────────────────
+    def _period_start(self, d: date) -> date:
+        if self.freq == 'DAILY':
+            return d
+        if self.freq == 'WEEKLY':
+            return d - timedelta(days=(d.weekday() - self.wkst) % 7)
+        if self.freq == 'MONTHLY':
+            return d.replace(day=1)
+        return date(d.year, 1, 1)
+
+    def _advance(self, period: date, steps: int) -> date:
+        """The period `steps` intervals after `period`."""
+        n = steps * self.interval
+        if self.freq == 'DAILY':
+            return period + timedelta(days=n)
+        if self.freq == 'WEEKLY':
+            return period + timedelta(weeks=n)
+        if self.freq == 'MONTHLY':
+            months = period.year * 12 + period.month - 1 + n
+            return date(months // 12, months % 12 + 1, 1)
+        return date(period.year + n, 1, 1)
+
+    def _periods_between(self, a: date, b: date) -> int:
+        """Whole intervals from period `a` to period `b`."""
+        if self.freq == 'DAILY':
+            units = (b - a).days
+        elif self.freq == 'WEEKLY':
+            units = (b - a).days // 7
+        elif self.freq == 'MONTHLY':
+            units = (b.year - a.year) * 12 + b.month - a.month
+        else:
+            units = b.year - a.year
+        return units // self.interval
+
+    # ──────────────── CANDIDATES ─────────────────────────────────────
+    def _month_days(self, year: int, month: int, first: date) -> list[date]:
+        """Days of one month matching BYMONTHDAY / BYDAY (month-relative ordinals)."""
+        n = calendar.monthrange(year, month)[1]
+        by_monthday = {d if d > 0 else n + d + 1 for d in self.bymonthday}
+        by_monthday = {d for d in by_monthday if 1 <= d <= n}
+        if self.byday:
+            days = set()
+            for ordinal, weekday in self.byday:
+                offset = (weekday - date(year, month, 1).weekday()) % 7
+                matching = list(range(1 + offset, n + 1, 7))
+                days.update(_pick(matching, [ordinal]) if ordinal else matching)
+            if self.bymonthday:
+                days &= by_monthday
+        elif self.bymonthday:
+            days = by_monthday
+        else:
+            days = {first.day} if first.day <= n else set()
+        return [date(year, month, d) for d in sorted(days)]
+
+    def _candidates(self, period: date, first: date) -> list[date]:
+        if self.freq == 'DAILY':
+            d = period
+            if ((self.bymonth and d.month not in self.bymonth)
+                    or (self.byday and d.weekday() not in {w for _, w in self.byday})
+                    or (self.bymonthday and d not in self._month_days(d.year, d.month, first))):
+                return []
+            return [d]
+        if self.freq == 'WEEKLY':
+            weekdays = sorted({w for _, w in self.byday}) if self.byday else [first.weekday()]
+            days = sorted(period + timedelta(days=(w - self.wkst) % 7) for w in weekdays)
+            days = [d for d in days if not self.bymonth or d.month in self.bymonth]
+        elif self.freq == 'MONTHLY':
+            if self.bymonth and period.month not in self.bymonth:
+                return []
+            days = self._month_days(period.year, period.month, first)
+        elif self.byday and not self.bymonth and not self.bymonthday:
+            # yearly with BYDAY alone: ordinals count through the whole year
+            days = []
+            for ordinal, weekday in self.byday:
+                jan1 = date(period.year, 1, 1)
+                start = jan1 + timedelta(days=(weekday - jan1.weekday()) % 7)
+                matching = [start + timedelta(weeks=k) for k in range(53)
+                            if (start + timedelta(weeks=k)).year == period.year]
+                days.extend(_pick(matching, [ordinal]) if ordinal else matching)
+            days = sorted(set(days))
+        else:
+            if self.bymonth:
+                months = self.bymonth
+            elif self.bymonthday:
+                months = range(1, 13)
+            else:
+                months = [first.month]
+            days = [d for m in sorted(set(months)) for d in self._month_days(period.year, m, first)]
+        return _pick(days, self.bysetpos) if self.bysetpos else days
+
+    def dates(self, first: date, after: Optional[date] = None) -> Iterator[date]:
+        """Dates the rule produces from `first` on, honouring COUNT but not UNTIL.
+
+        With `after` (and no COUNT, which has to be counted from the start)
+        the generator skips straight to the period before it; dates before
+        `after` may still be produced.
+        """
+        period = self._period_start(first)
+        if after is not None and self.count is None and after > first:
+            period = self._advance(period, max(0, self._periods_between(period, self._period_start(after)) - 1))
+        produced = empty = 0
+        while period.year <= MAX_YEAR:
+            found = False
+            for d in self._candidates(period, first):
+                if d < first:
+                    continue
+                found = True
+                yield d
+                produced += 1
+                if self.count is not None and produced >= self.count:
+                    return
+            empty = 0 if found else empty + 1
+            if empty > MAX_EMPTY_PERIODS:
+                return
+            try:
+                period = self._advance(period, 1)
+            except (ValueError, OverflowError):
+                return
+
+
+class Recurrence:
+    """A series' recurrence lines bound to its first occurrence.
+
+    Args:
+        lines: The master event's `recurrence` lines (RRULE / EXDATE / RDATE).
+        start: Start of the first occurrence; a date for all-day series.
+        tz: The series' time zone, for floating times and all-day dates.
+    """
+
+    def __init__(self, lines: list[str], start: When, tz: ZoneInfo):
+        self.lines = list(lines)
+        self.tz = tz
+        self.all_day = not isinstance(start, datetime)
+        self.start = start if self.all_day else start.astimezone(tz)
+        self.rules: list[Rule] = []
+        self.exdates: set[int] = set()
+        self.rdates: list[int] = []
+        for line in self.lines:
+            name, sep, value = line.strip().partition(':')
+            key, *params = name.upper().split(';')
+            if not sep:
+                raise ValueError(f'Malformed recurrence line {line!r}')
+            if key == 'RRULE':
+                self.rules.append(Rule(value))
+            elif key in ('EXDATE', 'RDATE'):
+                zone = tz
+                for param in params:
+                    if param.startswith('TZID='):
+                        try:
+                            zone = ZoneInfo(name.split('TZID=', 1)[1].split(';', 1)[0])
+                        except (KeyError, ValueError):
+                            raise ValueError(f'Unknown time zone in {line!r}') from None
+                target = self.exdates.add if key == 'EXDATE' else self.rdates.append
+                for v in value.split(','):
+                    target(self.to_ms(parse_value(v.strip(), zone)))
+            else:
+                raise ValueError(f'Unsupported recurrence line {line!r}')
+        self.rdates.sort()
+        self.start_ms = self.to_ms(self.start)
+
+    def to_ms(self, when: When) -> int:
+        """Epoch ms of a date (midnight in the series' zone) or time (floating: in the zone)."""
+        if not isinstance(when, datetime):
+            return _ms(datetime.combine(when, time(), self.tz))
+        return _ms(when if when.tzinfo else when.replace(tzinfo=self.tz))
+
+    def _until_ms(self, rule: Rule) -> Optional[int]:
+        """Exclusive bound UNTIL puts on occurrence starts."""
+        if rule.until is None:
+            return None
+        if isinstance(rule.until, datetime):
+            return self.to_ms(rule.until) + 1
+        return self.to_ms(rule.until + timedelta(days=1))
+
+    def _rule_starts(self, rule: Rule, after: Optional[int]) -> Iterator[int]:
+        until = self._until_ms(rule)
+        wall = None if self.all_day else self.start.timetz().replace(tzinfo=None)
+        first = self.start if self.all_day else self.start.date()
+        after_date = None if after is None else datetime.fromtimestamp(after / 1000, self.tz).date() - timedelta(days=1)
+        for d in rule.dates(first, after_date):
+            ms = self.to_ms(d if wall is None else datetime.combine(d, wall, self.tz))
+            if until is not None and ms >= until:
+                return
+            yield ms
+
+    def occurrences(self, after: Optional[int] = None) -> Iterator[int]:
+        """Start times (epoch ms) of the occurrences, in order, without EXDATEs.
+
+        The first occurrence is always `start`; with `after`, expansion
+        starts near that time instead of at the beginning of the series.
+        """
+        streams = [self._rule_starts(rule, after) for rule in self.rules]
+        streams.append(iter([self.start_ms] + self.rdates))
+        last = None
+        for ms in heapq.merge(*streams):
+            if ms != last and ms not in self.exdates:
+                yield ms
+            last = ms
+
+    def last(self) -> Optional[int]:
+        """Start of the final occurrence, or None for a series without end."""
+        if any(rule.count is None and rule.until is None for rule in self.rules):
+            return None
+        last = None
+        for last in self.occurrences():
+            pass
+        return last
+
+
+def validate(lines: list[str], start: When, tz: ZoneInfo) -> Recurrence:
+    """Checks a recurrence for a new series the way the Calendar API would.
+
+    Args:
+        lines: The recurrence lines to send.
+        start: Start of the first occurrence; a date for all-day series.
+        tz: The series' time zone.
+
+    Returns:
+        The parsed Recurrence.
+
+    Raises:
+        ValueError: If a line is malformed or unsupported, an UNTIL has the
+            wrong form, the start is not the first occurrence of a rule, or
+            an EXDATE is not an occurrence.
+    """
+    if not lines:
+        raise ValueError('A recurrence needs at least one RRULE line')
+    recurrence = Recurrence(lines, start, tz)
+    if not recurrence.rules:
+        raise ValueError('A recurrence needs at least one RRULE line')
+    for rule in recurrence.rules:
+        if rule.until is not None:
+            if recurrence.all_day and isinstance(rule.until, datetime):
+                raise ValueError(f'{rule}: UNTIL must be a date (YYYYMMDD) for an all-day series')
+            if not recurrence.all_day and (not isinstance(rule.until, datetime)
+                                           or rule.until.tzinfo is not timezone.utc):
+                raise ValueError(f'{rule}: UNTIL must be a UTC time (YYYYMMDDTHHMMSSZ) for a timed series')
+        first = next(recurrence._rule_starts(rule, None), None)
+        if first is None:
+            raise ValueError(f'{rule} has no occurrence on or after the start')
+        if first != recurrence.start_ms:
+            shown = datetime.fromtimestamp(first / 1000, tz)
+            shown = shown.date() if recurrence.all_day else shown
+            raise ValueError(f'The start is not an occurrence of {rule}; '
+                             f'its first occurrence would be {shown.isoformat()}')
+    if recurrence.exdates:
+        last, produced = max(recurrence.exdates), {recurrence.start_ms}
+        for ms in heapq.merge(*(recurrence._rule_starts(rule, None) for rule in recurrence.rules)):
+            if ms > last:
+                break
+            produced.add(ms)
+        for ms in sorted(recurrence.exdates - produced):
+            raise ValueError(f'EXDATE {datetime.fromtimestamp(ms / 1000, tz).isoformat()} '
+                             f'is not an occurrence of the series')
+    return recurrence
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable, Optional
+from .recommender import spotify_id
+from ..metrics import record_cache
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU mapping whose entries expire after `ttl` seconds.
+    Lookups are counted in the cache metrics under `name`.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 86_400.0,
+                 name: str = "ttl"):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] < time.monotonic():
+                del self._data[key]
+                entry = _MISSING
+            if entry is _MISSING:
+                record_cache(self.name, False)
+                return default
+            self._data.move_to_end(key)
+            record_cache(self.name, True)
+            return entry[1]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def set(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class MetadataEnricher:
+    """
+    Resolves artist / album / track ids through Spotify's bulk endpoints.
+
+    Ids are de-duplicated, served from a TTL cache when possible, and the
+    rest fetched in batches of the API maximum per endpoint.  Unknown
+    ids are cached as None so they are not asked for again.
+    """
+
+    BATCH = {"artists": 50, "albums": 20, "tracks": 50}
+
+    def __init__(self, fetch: dict[str, Callable[[list[str]], list]],
+                 ttl: float = 86_400.0, maxsize: int = 50_000):
+        # fetch: kind -> fn(ids) returning objects in the same order
+        self._fetch = fetch
+        self._caches = {kind: TTLCache(maxsize, ttl, name=f"spotify_{kind}")
+                        for kind in self.BATCH}
+
+    def lookup(self, kind: str, ids: Iterable[str]) -> dict[str, Optional[dict]]:
+        """Return {id: object-or-None} for the unique, non-empty `ids`."""
+        cache = self._caches[kind]
+        found, missing = {}, []
+        for i in dict.fromkeys(i for i in ids if i):
+            obj = cache.get(i, _MISSING)
+            if obj is _MISSING:
+                missing.append(i)
+            else:
+                found[i] = obj
+        size = self.BATCH[kind]
+        for n in range(0, len(missing), size):
+            chunk = missing[n:n + size]
+            for i, obj in zip(chunk, self._fetch[kind](chunk)):
+                cache.set(i, obj)
+                found[i] = obj
+        return found
+
+    def enrich(self, tracks: Iterable[dict | str]) -> list[dict]:
+        """
+        Annotate tracks with their artists' and albums' details.
+
+        Accepts track objects, saved-track / playlist items (with a "track"
+        key) or track ids/URIs.  Tracks that cannot be resolved are dropped.
+        """
+        items = [t.get("track") if isinstance(t, dict) and "track" in t else t
+                 for t in tracks]
+        ids = [spotify_id(i) for i in items if isinstance(i, str)]
+        fetched = self.lookup("tracks", ids) if ids else {}
+        resolved = [fetched.get(spotify_id(i)) if isinstance(i, str) else i
+                    for i in items]
+        resolved = [t for t in resolved if t and t.get("id")]
+
+        artists = self.lookup("artists", (a.get("id") for t in resolved
+                                          for a in t.get("artists") or []))
+        albums = self.lookup("albums", ((t.get("album") or {}).get("id")
+                                        for t in resolved))
+
+        out = []
+        for t in resolved:
+            track_artists = []
+            for a in t.get("artists") or []:
+                full = artists.get(a.get("id")) or {}
+                track_artists.append({
+                    "id": a.get("id"),
+                    "name": a.get("name", ""),
+                    "genres": full.get("genres", []),
+                    "popularity": full.get("popularity"),
+                    "followers": (full.get("followers") or {}).get("total"),
+                })
+            album = albums.get((t.get("album") or {}).get("id")) or t.get("album") or {}
+            out.append({
+                "id": t["id"],
+                "uri": t.get("uri"),
+                "name": t.get("name", ""),
+                "popularity": t.get("popularity"),
+                "duration_ms": t.get("duration_ms"),
+                "artists": track_artists,
+                "album": {
+                    "id": album.get("id"),
+                    "name": album.get("name", ""),
+                    "release_date": album.get("release_date"),
+                    "label": album.get("label"),
+                    "genres": album.get("genres", []),
+                },
+                "genres": sorted({g for a in track_artists for g in a["genres"]}),
+            })
+        return out
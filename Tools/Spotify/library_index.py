@@ -0,0 +1,142 @@
+import heapq
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Hashable, Iterable, Optional
+
+from .recommender import slim_track
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize(text: str) -> str:
+    """Casefold, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def trigrams(text: str) -> set[str]:
+    """Character trigrams of each word, padded so short words still match."""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class LibraryIndex:
+    """
+    In-memory trigram index over track name, artists and album.
+
+    Tracks are grouped by source ("saved", "playlist:<id>") with a version,
+    mirroring `CoOccurrenceRecommender` baskets, so a library refresh only
+    re-indexes sources that changed.  A track stays indexed while any
+    source still contains it.
+
+    A query scores each candidate by the fraction of the query's trigrams it
+    contains, which tolerates typos and word order; ties go to the shorter
+    (more specific) track text.
+    """
+
+    def __init__(self, min_score: float = 0.4):
+        self.min_score = min_score
+        self._lock = threading.RLock()
+        self._postings: dict[str, set[str]] = defaultdict(set)
+        self._docs: dict[str, tuple[dict, frozenset]] = {}
+        self._doc_sources: dict[str, set] = defaultdict(set)
+        self._sources: dict[Hashable, tuple[str, set[str]]] = {}
+
+    # ──────────────── SOURCES ────────────────────────────────────────
+    def source_version(self, source_id: Hashable) -> Optional[str]:
+        entry = self._sources.get(source_id)
+        return entry[0] if entry else None
+
+    def source_ids(self) -> list:
+        return list(self._sources)
+
+    def set_source(self, source_id: Hashable, version: str,
+                   tracks: Iterable[dict]) -> bool:
+        """Replace a source's tracks; a no-op when already at `version`."""
+        if self.source_version(source_id) == version:
+            return False
+        with self._lock:
+            self.remove_source(source_id)
+            self._sources[source_id] = (version, set())
+            self.add(source_id, tracks)
+        return True
+
+    def add(self, source_id: Hashable, tracks: Iterable[dict]) -> None:
+        """Add tracks to a source without changing its version."""
+        with self._lock:
+            _, ids = self._sources.setdefault(source_id, ("", set()))
+            for t in tracks:
+                if not t or not t.get("id"):
+                    continue
+                ids.add(t["id"])
+                self._doc_sources[t["id"]].add(source_id)
+                if t["id"] not in self._docs:
+                    self._index(slim_track(t))
+
+    def discard(self, source_id: Hashable, track_ids: Iterable[str]) -> None:
+        """Remove tracks from a source without changing its version."""
+        with self._lock:
+            entry = self._sources.get(source_id)
+            if entry:
+                for track_id in track_ids:
+                    if track_id in entry[1]:
+                        entry[1].discard(track_id)
+                        self._release(track_id, source_id)
+
+    def remove_source(self, source_id: Hashable) -> None:
+        with self._lock:
+            entry = self._sources.pop(source_id, None)
+            for track_id in entry[1] if entry else ():
+                self._release(track_id, source_id)
+
+    def _release(self, track_id: str, source_id: Hashable) -> None:
+        sources = self._doc_sources[track_id]
+        sources.discard(source_id)
+        if not sources:
+            del self._doc_sources[track_id]
+            _, grams = self._docs.pop(track_id)
+            for g in grams:
+                posting = self._postings[g]
+                posting.discard(track_id)
+                if not posting:
+                    del self._postings[g]
+
+    def _index(self, track: dict) -> None:
+        text = " ".join([track["name"], *(a["name"] for a in track["artists"]),
+                         track["album"]["name"]])
+        grams = frozenset(trigrams(text))
+        self._docs[track["id"]] = (track, grams)
+        for g in grams:
+            self._postings[g].add(track["id"])
+
+    # ──────────────── QUERIES ────────────────────────────────────────
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        """Best matching library tracks, each with `score` and `sources`."""
+        q = trigrams(query)
+        if not q:
+            return []
+        with self._lock:
+            hits = Counter()
+            for g in q:
+                posting = self._postings.get(g)
+                if posting:
+                    hits.update(posting)
+            cutoff = self.min_score * len(q)
+            best = heapq.nsmallest(
+                limit,
+                ((-n, len(self._docs[d][1]), d) for d, n in hits.items()
+                 if n >= cutoff),
+            )
+            return [{**self._docs[d][0],
+                     "score": round(-neg / len(q), 3),
+                     "sources": sorted(map(str, self._doc_sources[d]))}
+                    for neg, _, d in best]
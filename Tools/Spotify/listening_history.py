@@ -0,0 +1,340 @@
+import json
+import logging
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+from zoneinfo import ZoneInfo
+
+try:
+    import fcntl
+except ImportError:         # Windows: no cross-process locking
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+# column name -> array typecode; one file per column under the archive dir
+COLUMNS = {
+    "played_at": "q",   # epoch milliseconds (UTC), ascending
+    "track": "I",       # index into the track dictionary
+    "artist": "I",      # index into the artist dictionary (primary artist)
+    "how": "B",         # UTC hour-of-week, weekday * 24 + hour (Mon = 0)
+}
+
+_QUARTER_MS = 15 * 60_000
+
+
+def _to_ms(value: str | datetime | None) -> Optional[int]:
+    """Parse an ISO date/datetime (or datetime) into epoch ms; naive is UTC."""
+    if value is None:
+        return None
+    dt = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+class ListeningHistory:
+    """
+    Append-only, column-oriented archive of the user's plays.
+
+    Each column is a flat binary file loaded straight into an `array`, so a
+    date range is two bisects over `played_at` and aggregations are counts
+    over array slices – no per-row Python work.  Track/artist names live in
+    small JSON-lines dictionaries next to the columns.
+
+    Several processes (server workers) may share one archive: appends hold
+    an exclusive lock on `.lock` in the archive directory (POSIX only) and
+    first read whatever the others appended, and queries pick up new rows
+    as the column files grow.
+    """
+
+    def __init__(self, path: str | os.PathLike = ".spotify_history"):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._cols = {name: array(code) for name, code in COLUMNS.items()}
+        self._tracks: list[dict] = []
+        self._artists: list[dict] = []
+        self._track_idx: dict[str, int] = {}
+        self._artist_idx: dict[str, int] = {}
+        # bytes of each dictionary file already read
+        self._read_upto = {"tracks.jsonl": 0, "artists.jsonl": 0}
+        self._load()
+
+    # ──────────────── STORAGE ────────────────────────────────────────
+    def _col_file(self, name: str) -> Path:
+        return self.path / f"{name}.bin"
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the archive against other threads and other processes."""
+        with self._lock, open(self.path / ".lock", "a") as fh:
+            if fcntl:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _rows_in(self, name: str) -> int:
+        f = self._col_file(name)
+        return f.stat().st_size // self._cols[name].itemsize if f.exists() else 0
+
+    def _rows_on_disk(self) -> int:
+        return min(self._rows_in(name) for name in COLUMNS)
+
+    def _load(self) -> None:
+        with self._exclusive():
+            self._catch_up()
+
+    def _catch_up(self) -> None:
+        """
+        Read the names and rows appended to the files since we last looked,
+        by this or another process.  Caller holds `_exclusive()`.
+        """
+        for fname, rows, idx in (("tracks.jsonl", self._tracks, self._track_idx),
+                                 ("artists.jsonl", self._artists, self._artist_idx)):
+            f = self.path / fname
+            if not f.exists():
+                continue
+            with open(f, "r+b") as fh:
+                fh.seek(self._read_upto[fname])
+                data = fh.read()
+                whole = data[:data.rfind(b"\n") + 1]
+                if len(whole) < len(data):
+                    # with the lock held, a torn line is a crashed append's
+                    fh.truncate(self._read_upto[fname] + len(whole))
+            self._read_upto[fname] += len(whole)
+            data = whole
+            for line in data.splitlines():
+                if line.strip():
+                    row = json.loads(line)
+                    idx[row["id"]] = len(rows)
+                    rows.append(row)
+
+        n = self._rows_on_disk()
+        for name, col in self._cols.items():
+            # likewise a column longer than the others
+            if self._rows_in(name) > n:
+                with open(self._col_file(name), "r+b") as fh:
+                    fh.truncate(n * col.itemsize)
+            if n > len(col):
+                with open(self._col_file(name), "rb") as fh:
+                    fh.seek(len(col) * col.itemsize)
+                    col.frombytes(fh.read((n - len(col)) * col.itemsize))
+
+    def _refresh(self) -> None:
+        """Pick up rows other processes have archived since our last look."""
+        if self._rows_on_disk() > len(self):
+            with self._exclusive():
+                self._catch_up()
+
+    def _intern(self, rows: list, idx: dict, fname: str, row: dict) -> int:
+        # caller holds _exclusive() and has caught up, so the file is ours
+        i = idx.get(row["id"])
+        if i is None:
+            i = idx[row["id"]] = len(rows)
+            rows.append(row)
+            line = (json.dumps(row) + "\n").encode("utf-8")
+            with open(self.path / fname, "ab") as fh:
+                fh.write(line)
+            self._read_upto[fname] += len(line)
+        return i
+
+    def __len__(self) -> int:
+        return len(self._cols["played_at"])
+
+    @property
+    def last_played_ms(self) -> Optional[int]:
+        col = self._cols["played_at"]
+        return col[-1] if col else None
+
+    def append(self, items: list[dict]) -> int:
+        """
+        Append play-history items (as returned by `recently_played`), skipping
+        anything not newer than the last archived play – including plays
+        another process archived meanwhile.  Returns rows added.
+        """
+        new = {name: array(code) for name, code in COLUMNS.items()}
+        with self._exclusive():
+            self._catch_up()
+            last = self.last_played_ms or -1
+            for item in sorted(items, key=lambda it: it["played_at"]):
+                ms = _to_ms(item["played_at"])
+                if ms <= last:
+                    continue
+                track = item["track"]
+                artist = (track.get("artists") or [{"id": "", "name": ""}])[0]
+                a = self._intern(self._artists, self._artist_idx, "artists.jsonl",
+                                 {"id": artist["id"], "name": artist["name"]})
+                t = self._intern(self._tracks, self._track_idx, "tracks.jsonl",
+                                 {"id": track["id"], "name": track["name"],
+                                  "artist": a})
+                dt = datetime.fromtimestamp(ms / 1000, timezone.utc)
+                new["played_at"].append(ms)
+                new["track"].append(t)
+                new["artist"].append(a)
+                new["how"].append(dt.weekday() * 24 + dt.hour)
+                last = ms
+            if not new["played_at"]:
+                return 0
+            for name, col in new.items():
+                with open(self._col_file(name), "ab") as fh:
+                    col.tofile(fh)
+                self._cols[name].extend(col)
+            return len(new["played_at"])
+
+    def collect(self, fetch: Callable[..., dict]) -> int:
+        """
+        Page forward through `fetch(limit=50, after=<ms>)` (Spotify's
+        recently-played endpoint) from the last archived play.
+        """
+        added = 0
+        while True:
+            self._refresh()
+            after = self.last_played_ms
+            page = fetch(limit=50, after=after) if after else fetch(limit=50)
+            items = page.get("items") or []
+            n = self.append(items)
+            added += n
+            # without a cursor Spotify only ever returns the latest 50
+            if not after or n == 0 or len(items) < 50:
+                return added
+
+    # ──────────────── QUERIES ────────────────────────────────────────
+    def _range(self, start, end) -> tuple[int, int]:
+        col = self._cols["played_at"]
+        start_ms, end_ms = _to_ms(start), _to_ms(end)
+        lo = 0 if start_ms is None else bisect_left(col, start_ms)
+        hi = len(col) if end_ms is None else bisect_left(col, end_ms)
+        return lo, hi
+
+    def _top(self, column: str, rows: list[dict], start, end, limit: int):
+        self._refresh()
+        with self._lock:
+            lo, hi = self._range(start, end)
+            counts = Counter(self._cols[column][lo:hi]).most_common(limit)
+        return [{**rows[i], "plays": n} for i, n in counts]
+
+    def top_tracks(self, start=None, end=None, limit: int = 20) -> list[dict]:
+        """Most played tracks with `start <= played_at < end`."""
+        top = self._top("track", self._tracks, start, end, limit)
+        for row in top:
+            row["artist"] = self._artists[row["artist"]]["name"]
+        return top
+
+    def top_artists(self, start=None, end=None, limit: int = 20) -> list[dict]:
+        """Most played (primary) artists with `start <= played_at < end`."""
+        return self._top("artist", self._artists, start, end, limit)
+
+    def play_count(self, start=None, end=None, track_id: Optional[str] = None,
+                   artist_id: Optional[str] = None) -> int:
+        """Number of plays in range, optionally of one track or artist."""
+        self._refresh()
+        with self._lock:
+            lo, hi = self._range(start, end)
+            if track_id:
+                if track_id not in self._track_idx:
+                    return 0
+                return self._cols["track"][lo:hi].count(self._track_idx[track_id])
+            if artist_id:
+                if artist_id not in self._artist_idx:
+                    return 0
+                return self._cols["artist"][lo:hi].count(self._artist_idx[artist_id])
+            return hi - lo
+
+    def sessions(self, gap_minutes: float = 30.0,
+                 since: Optional[int] = None) -> list[tuple[int, list[dict]]]:
+        """
+        Split the archive into listening sessions wherever two consecutive
+        plays are more than `gap_minutes` apart.  Returns (start_ms, tracks)
+        pairs, tracks as {"id", "name", "artists": [{"id", "name"}]}.  With
+        `since` (epoch ms) only the sessions with a play at or after it are
+        returned, in full.
+        """
+        gap = gap_minutes * 60_000
+        out: list[tuple[int, list[dict]]] = []
+        self._refresh()
+        with self._lock:
+            played, tracks = self._cols["played_at"], self._cols["track"]
+            lo = 0 if since is None else bisect_left(played, since)
+            # back up to the start of the session that play belongs to
+            while 0 < lo < len(played) and played[lo] - played[lo - 1] <= gap:
+                lo -= 1
+            prev = None
+            for i in range(lo, len(played)):
+                ms = played[i]
+                if prev is None or ms - prev > gap:
+                    out.append((ms, []))
+                row = self._tracks[tracks[i]]
+                out[-1][1].append({"id": row["id"], "name": row["name"],
+                                   "artists": [self._artists[row["artist"]]]})
+                prev = ms
+        return out
+
+    def heatmap(self, start=None, end=None, tz: str = "UTC") -> dict:
+        """
+        Plays by weekday and hour: {"weekday": [7], "hour": [24],
+        "grid": [7][24]} with Monday first, in the IANA time zone `tz`
+        (e.g. "Europe/Berlin"; DST and half-hour offsets included).
+        """
+        zone = ZoneInfo(tz)
+        self._refresh()
+        with self._lock:
+            lo, hi = self._range(start, end)
+            if tz == "UTC":
+                counts = Counter(self._cols["how"][lo:hi])
+            else:
+                # every zone's offset is a whole number of quarter hours, so
+                # each distinct quarter hour converts once, not each play
+                quarters = Counter(ms // _QUARTER_MS for ms in self._cols["played_at"][lo:hi])
+        if tz != "UTC":
+            counts = Counter()
+            for q, n in quarters.items():
+                dt = datetime.fromtimestamp(q * _QUARTER_MS / 1000, zone)
+                counts[dt.weekday() * 24 + dt.hour] += n
+        grid = [[0] * 24 for _ in range(7)]
+        for how, n in counts.items():
+            grid[how // 24][how % 24] += n
+        return {"weekday": [sum(row) for row in grid],
+                "hour": [sum(col) for col in zip(*grid)],
+                "grid": grid}
+
+class HistoryCollector:
+    """Background thread that periodically archives new plays."""
+
+    def __init__(self, history: ListeningHistory, fetch: Callable[..., dict],
+                 interval: float = 900.0):
+        self.history = history
+        self.fetch = fetch
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="spotify-history",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                n = self.history.collect(self.fetch)
+                if n:
+                    log.info("Archived %d new plays", n)
+            except Exception as e:
+                log.warning("History collection failed: %s", e)
+            self._stop.wait(self.interval)
@@ -0,0 +1,240 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional
+from ..metrics import record_cache
+
+log = logging.getLogger(__name__)
+
+
+class PlaybackState:
+    """
+    Cached view of the user's Spotify Connect devices and current playback,
+    kept fresh by a background poller.
+
+    The poller runs every `fast_interval` seconds for `fast_window` seconds
+    after a control command (or while someone is waiting for a change) and
+    backs off to `idle_interval` otherwise.  Once nobody has read the state
+    for `idle_timeout` seconds it stops, so an idle account makes no API
+    calls; the next read restarts it.  Every observed change bumps
+    `version`, which `wait_for_change` blocks on.
+    """
+
+    # a playing track drifting further than this from where we expect it
+    # to be counts as a seek
+    SEEK_TOLERANCE_MS = 2500
+
+    def __init__(self, fetch_devices: Callable[[], list],
+                 fetch_playback: Callable[[], Optional[dict]],
+                 fast_interval: float = 0.5, idle_interval: float = 15.0,
+                 fast_window: float = 5.0, devices_ttl: float = 30.0,
+                 idle_timeout: float = 300.0):
+        self._fetch_devices = fetch_devices
+        self._fetch_playback = fetch_playback
+        self.fast_interval = fast_interval
+        self.idle_interval = idle_interval
+        self.fast_window = fast_window
+        self.devices_ttl = devices_ttl
+        self.idle_timeout = idle_timeout
+
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._devices: list = []
+        self._devices_at = 0.0
+        self._playback: Optional[dict] = None
+        self._playback_at = 0.0
+        self._version = 0
+        self._boost_until = 0.0
+        self._waiters = 0
+        self._used_at = 0.0
+
+    # ──────────────── READS ──────────────────────────────────────────
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def devices(self, max_age: Optional[float] = None) -> list:
+        """Cached device list, refetched when older than `max_age` (default TTL)."""
+        max_age = self.devices_ttl if max_age is None else max_age
+        stale = time.monotonic() - self._devices_at > max_age
+        record_cache("spotify_devices", not stale)
+        if stale:
+            self._refresh_devices()
+        return self._devices
+
+    def current(self, max_age: Optional[float] = None) -> dict:
+        """
+        Return {"version", "age_ms", "playback"} from the cache.  Fetches
+        synchronously if nothing has been seen yet, the poller was idle or
+        the cached value is older than `max_age` seconds.
+        """
+        restarted = self._ensure_poller()
+        age = time.monotonic() - self._playback_at
+        stale = (restarted or not self._playback_at
+                 or (max_age is not None and age > max_age))
+        record_cache("spotify_playback", not stale)
+        if stale:
+            self._refresh_playback()
+            age = 0.0
+        return {"version": self._version,
+                "age_ms": int(age * 1000),
+                "playback": self._playback}
+
+    def wait_for_change(self, since_version: Optional[int] = None,
+                        timeout: float = 10.0) -> dict:
+        """
+        Block until the state version moves past `since_version` (default:
+        the version at call time) or `timeout` seconds elapse.
+        """
+        self._ensure_poller()
+        with self._cond:
+            if since_version is None:
+                since_version = self._version
+            self._waiters += 1
+        self._wake.set()
+        try:
+            with self._cond:
+                changed = self._cond.wait_for(
+                    lambda: self._version > since_version, timeout)
+        finally:
+            with self._cond:
+                self._waiters -= 1
+        return {"changed": changed,
+                "version": self._version,
+                "playback": self._playback}
+
+    # ──────────────── COMMANDS ───────────────────────────────────────
+    def notify_command(self) -> None:
+        """Switch the poller to fast mode so a command's effect shows up quickly."""
+        self._boost_until = time.monotonic() + self.fast_window
+        self._ensure_poller()
+        self._wake.set()
+
+    def resolve_device(self, device: Optional[str]) -> Optional[str]:
+        """
+        Map a device id or (case-insensitive, possibly partial) name to a
+        device id using the cached device list.  The list is refetched once
+        if nothing matches; anything still unmatched is passed through as an
+        id for Spotify to accept or reject.
+        """
+        if not device:
+            return None
+        for refresh in (False, True):
+            devices = self.devices(max_age=0 if refresh else None)
+            match = self._match_device(devices, device)
+            if match:
+                return match
+        return device
+
+    @staticmethod
+    def _match_device(devices: list, device: str) -> Optional[str]:
+        wanted = device.casefold()
+        for d in devices:
+            if d["id"] == device or d["name"].casefold() == wanted:
+                return d["id"]
+        partial = [d for d in devices if wanted in d["name"].casefold()]
+        if len(partial) > 1:
+            names = ", ".join(d["name"] for d in partial)
+            raise ValueError(f"Device {device!r} is ambiguous (matches: {names})")
+        return partial[0]["id"] if partial else None
+
+    # ──────────────── POLLING ────────────────────────────────────────
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def _ensure_poller(self) -> bool:
+        """Note a reader and start the poller if needed; True if it was started."""
+        self._used_at = time.monotonic()
+        if self._thread is None or not self._thread.is_alive():
+            with self._cond:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stop.clear()
+                    self._thread = threading.Thread(
+                        target=self._poll_loop, name="spotify-playback-poller",
+                        daemon=True)
+                    self._thread.start()
+                    return True
+        return False
+
+    def _idle(self) -> bool:
+        now = time.monotonic()
+        return (not self._waiters and now >= self._boost_until
+                and now - self._used_at > self.idle_timeout)
+
+    def _interval(self) -> float:
+        if self._waiters or time.monotonic() < self._boost_until:
+            return self.fast_interval
+        return self.idle_interval
+
+    def _poll_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self._interval())
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            with self._cond:
+                # _ensure_poller checks _thread under the same lock
+                if self._idle():
+                    self._thread = None
+                    return
+            try:
+                self._refresh_playback()
+                if time.monotonic() - self._devices_at > self.devices_ttl:
+                    self._refresh_devices()
+            except Exception as e:
+                log.warning("Playback poll failed: %s", e)
+
+    def _refresh_devices(self) -> None:
+        devices = self._fetch_devices() or []
+        with self._cond:
+            old, self._devices = self._devices, devices
+            first, self._devices_at = not self._devices_at, time.monotonic()
+            # the first fetch is a cache fill, not a change anyone waits for
+            if not first and self._device_key(old) != self._device_key(devices):
+                self._bump()
+
+    def _refresh_playback(self) -> None:
+        playback = self._fetch_playback()
+        now = time.monotonic()
+        with self._cond:
+            old, old_at = self._playback, self._playback_at
+            self._playback, self._playback_at = playback, now
+            # as with devices, the first fetch only fills the cache
+            if old_at and self._playback_changed(old, playback, (now - old_at) * 1000):
+                self._bump()
+
+    def _bump(self) -> None:
+        # caller holds self._cond
+        self._version += 1
+        self._cond.notify_all()
+
+    @staticmethod
+    def _device_key(devices: list) -> tuple:
+        return tuple((d.get("id"), d.get("is_active"), d.get("volume_percent"))
+                     for d in devices)
+
+    @classmethod
+    def _playback_key(cls, pb: Optional[dict]) -> tuple:
+        if not pb:
+            return ()
+        item = pb.get("item") or {}
+        device = pb.get("device") or {}
+        return (item.get("id"), pb.get("is_playing"), device.get("id"),
+                device.get("volume_percent"), pb.get("shuffle_state"),
+                pb.get("repeat_state"))
+
+    @classmethod
+    def _playback_changed(cls, old: Optional[dict], new: Optional[dict],
+                          elapsed_ms: float) -> bool:
+        if cls._playback_key(old) != cls._playback_key(new):
+            return True
+        if not new:
+            return False
+        expected = (old.get("progress_ms") or 0)
+        if new.get("is_playing"):
+            expected += elapsed_ms
+        return abs((new.get("progress_ms") or 0) - expected) > cls.SEEK_TOLERANCE_MS
@@ -0,0 +1,146 @@
+import heapq
+import math
+import threading
+from collections import defaultdict
+from typing import Hashable, Iterable, Optional, Sequence
+
+
+def spotify_id(value: str) -> str:
+    """Accept a bare id, a `spotify:track:…` URI or an open.spotify.com URL."""
+    return value.rsplit("/", 1)[-1].split("?", 1)[0].rsplit(":", 1)[-1]
+
+
+def slim_track(track: dict) -> dict:
+    """The fields of a track object worth keeping in local indexes."""
+    return {
+        "id": track["id"],
+        "uri": track.get("uri") or f"spotify:track:{track['id']}",
+        "name": track.get("name", ""),
+        "artists": [{"id": a.get("id"), "name": a.get("name", "")}
+                    for a in track.get("artists") or []],
+        "album": {"id": (track.get("album") or {}).get("id"),
+                  "name": (track.get("album") or {}).get("name", "")},
+    }
+
+
+class CoOccurrenceRecommender:
+    """
+    Item-item recommender over the user's own library.
+
+    Every playlist, the saved-tracks list and each listening session is a
+    "basket" – an ordered list of tracks.  Tracks within `window` positions
+    of each other in a basket co-occur; the counts form a sparse symmetric
+    matrix (dict of dicts).  Baskets carry a version (playlist snapshot id,
+    etc.) so an unchanged basket is never recounted, and a changed one is
+    subtracted and re-added.
+
+    Scoring is cosine similarity summed over the seeds:
+    score(j) = Σ_s C[s][j] / sqrt(deg(s) · deg(j)).  It walks only the seeds'
+    rows of the sparse matrix in plain Python rather than using a vectorised
+    (numpy/scipy) matrix product, which keeps the server free of a numeric
+    dependency; a personal library's rows are short enough for that.
+    """
+
+    def __init__(self, window: int = 25):
+        self.window = window
+        self._lock = threading.RLock()
+        self._cooc: dict[str, dict[str, int]] = defaultdict(dict)
+        self._deg: dict[str, int] = defaultdict(int)
+        self._baskets: dict[Hashable, tuple[str, list[str]]] = {}
+        self._tracks: dict[str, dict] = {}
+        self._by_artist: dict[str, set[str]] = defaultdict(set)
+
+    # ──────────────── BASKETS ────────────────────────────────────────
+    def basket_version(self, basket_id: Hashable) -> Optional[str]:
+        entry = self._baskets.get(basket_id)
+        return entry[0] if entry else None
+
+    def basket_ids(self) -> list:
+        return list(self._baskets)
+
+    def update_basket(self, basket_id: Hashable, version: str,
+                      tracks: Iterable[dict]) -> bool:
+        """
+        Set the contents of a basket.  A no-op (returning False) when the
+        basket is already at `version`.
+        """
+        if self.basket_version(basket_id) == version:
+            return False
+        items = []
+        for t in tracks:
+            if t and t.get("id"):
+                items.append(t["id"])
+                self._remember(t)
+        with self._lock:
+            self._remove(basket_id)
+            self._baskets[basket_id] = (version, items)
+            self._count(items, +1)
+        return True
+
+    def remove_basket(self, basket_id: Hashable) -> None:
+        with self._lock:
+            self._remove(basket_id)
+
+    def _remove(self, basket_id: Hashable) -> None:
+        entry = self._baskets.pop(basket_id, None)
+        if entry:
+            self._count(entry[1], -1)
+
+    def _remember(self, track: dict) -> None:
+        if track["id"] not in self._tracks:
+            t = self._tracks[track["id"]] = slim_track(track)
+            for a in t["artists"]:
+                if a["id"]:
+                    self._by_artist[a["id"]].add(t["id"])
+
+    def _count(self, items: list[str], sign: int) -> None:
+        cooc, deg, w = self._cooc, self._deg, self.window
+        for i, a in enumerate(items):
+            deg[a] += sign
+            row = cooc[a]
+            for b in items[max(0, i - w):i]:
+                if a == b:
+                    continue
+                n = row.get(b, 0) + sign
+                other = cooc[b]
+                if n:
+                    row[b] = other[a] = n
+                else:
+                    row.pop(b, None)
+                    other.pop(a, None)
+
+    # ──────────────── QUERIES ────────────────────────────────────────
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    def recommend(self, seed_tracks: Sequence[str] = (),
+                  seed_artists: Sequence[str] = (), limit: int = 20,
+                  exclude: Iterable[str] = ()) -> list[dict]:
+        """
+        Tracks most similar to the seeds, as slim track dicts with a `score`.
+        Artist seeds stand in for every library track by that artist.
+        Seeds unknown to the model are ignored.
+        """
+        seeds = {spotify_id(s) for s in seed_tracks}
+        with self._lock:
+            weights = dict.fromkeys(seeds, 1.0)
+            for artist in seed_artists:
+                tracks = self._by_artist.get(spotify_id(artist), ())
+                for t in tracks:
+                    weights[t] = weights.get(t, 0.0) + 1.0 / len(tracks)
+
+            scores: dict[str, float] = defaultdict(float)
+            deg = self._deg
+            for s, w in weights.items():
+                if not deg.get(s):
+                    continue
+                w /= math.sqrt(deg[s])
+                for j, n in self._cooc.get(s, {}).items():
+                    scores[j] += n * w
+            skip = seeds | weights.keys() | {spotify_id(e) for e in exclude}
+            best = heapq.nlargest(
+                limit,
+                ((sc / math.sqrt(deg[j]), j) for j, sc in scores.items()
+                 if j not in skip),
+            )
+            return [{**self._tracks[j], "score": round(sc, 6)} for sc, j in best]
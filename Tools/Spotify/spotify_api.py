@@ -1,9 +1,12 @@
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
 import os
 import logging
 from pathlib import Path
-from dotenv import load_dotenv
+
+# spotipy / dotenv are imported inside authenticate() so importing the tool
+# modules (and starting an MCP server) stays cheap until Spotify is used.
+# Never print here: stdout is the MCP stdio transport.
+log = logging.getLogger(__name__)
+
 SCOPES = (
     "user-read-private user-read-email "
     "playlist-read-private playlist-read-collaborative "
@@ -15,7 +18,7 @@ SCOPES = (
     # "app-remote-control"  # add if you’ll ship mobile SDK remotes
 )
 
-def authenticate():
+def authenticate(cache_path: str = ".cache"):
     """
     Authenticates with the Spotify API using the Authorization Code Flow.
 
@@ -25,11 +28,16 @@ def authenticate():
     - SPOTIPY_REDIRECT_URI
 
     On the first run, this will open a browser window for user authorization.
-    Subsequent runs will use the cached refresh token stored in '.cache'.
+    Subsequent runs will use the cached refresh token stored in `cache_path`
+    (one file per account). No request is made here; the token is fetched or
+    refreshed on the first API call.
     
     Returns:
         spotipy.Spotify: An authenticated Spotipy client instance.
     """
+    import spotipy
+    from spotipy.oauth2 import SpotifyOAuth, SpotifyOauthError
+    from dotenv import load_dotenv
 
     load_dotenv()
     CLIENT_ID = os.environ.get("SPOTIPY_CLIENT_ID")
@@ -37,7 +45,7 @@ def authenticate():
     REDIRECT_URI = os.environ.get("SPOTIPY_REDIRECT_URI")
 
     if not all([CLIENT_ID,CLIENT_SECRET,REDIRECT_URI]):
-        print("Error: Make sure env vars are set properly")
+        log.error("Make sure SPOTIPY_CLIENT_ID / SPOTIPY_CLIENT_SECRET / SPOTIPY_REDIRECT_URI are set")
         return None
     
     try:
@@ -47,20 +55,16 @@ def authenticate():
             client_secret=CLIENT_SECRET,
             redirect_uri=REDIRECT_URI,
             scope =SCOPES,
-            cache_path=".cache"
+            cache_path=cache_path
         )
-        sp = spotipy.Spotify(auth_manager=auth_manager)
-        user_info = sp.current_user()
-        print(f"Logged in as: {user_info['display_name']} ({user_info['email']})")
-        
-        return sp
+        return spotipy.Spotify(auth_manager=auth_manager)
     except SpotifyOauthError as e:
-        Path(".cache").unlink(missing_ok = True)
+        Path(cache_path).unlink(missing_ok = True)
         log.error("OAuth error: %s", e)
         raise
     except Exception as e:
-        print(f"Error during authentication: {e}")
-        print("Please double-check your credentials and redirect URI in the Spotify Developer Dashboard.")
+        log.error("Error during authentication: %s. Please double-check your credentials "
+                  "and redirect URI in the Spotify Developer Dashboard.", e)
         return None
 
 
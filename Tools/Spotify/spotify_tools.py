@@ -1,25 +1,109 @@
+import logging
+import threading
+import time
+from itertools import islice
 from .spotify_api import authenticate
-from typing import Iterable, Sequence, Optional
-from spotipy import Spotify, SpotifyException
+from .playback_state import PlaybackState
+from .listening_history import ListeningHistory, HistoryCollector
+from .recommender import CoOccurrenceRecommender, spotify_id
+from .library_index import LibraryIndex
+from .enrichment import MetadataEnricher
+from ..metrics import record_upstream, record_upstream_bytes
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Sequence, Optional
+
+if TYPE_CHECKING:
+    from spotipy import Spotify
+
+log = logging.getLogger(__name__)
 
 
 class SpotifyTools:
 
-    def __init__(self):
-        self._sp :Spotify =  authenticate()
+    def __init__(self, history_dir: str = ".spotify_history", cache_path: str = ".cache",
+                 connect: Optional[Callable[[], "Spotify"]] = None):
+        # `connect` builds the Spotipy client (default: OAuth via `cache_path`);
+        # benchmarks pass one pointed at benchmarks/fake_api.py
+        self.cache_path = cache_path
+        self._authenticate = connect or (lambda: authenticate(self.cache_path))
+        self._http_retries = threading.local()
+        self._sp :"Spotify" =  self._connect()
+        self.history_dir = history_dir
+        self._history: Optional[ListeningHistory] = None
+        self._history_lock = threading.Lock()
+        self._history_collector: Optional[HistoryCollector] = None
+        self.recommender = CoOccurrenceRecommender()
+        self.library_index = LibraryIndex()
+        self.enricher = MetadataEnricher({
+            "artists": lambda ids: self._call(self._sp.artists, ids)["artists"],
+            "albums": lambda ids: self._call(self._sp.albums, ids)["albums"],
+            "tracks": lambda ids: self._call(self._sp.tracks, ids)["tracks"],
+        })
+        self._library_lock = threading.Lock()
+        self._library_synced_at: Optional[float] = None
+        # last archived play already counted into the history baskets
+        self._history_mark: Optional[int] = None
+        self._playback = PlaybackState(
+            fetch_devices=lambda: self._call(self._sp.devices)["devices"],
+            fetch_playback=lambda: self._call(self._sp.current_playback),
+        )
+
+    @classmethod
+    def for_account(cls, account: str) -> "SpotifyTools":
+        """Client whose token cache and local archives are private to `account`."""
+        if account == "default":
+            return cls()
+        return cls(history_dir=f".spotify_history_{account}",
+                   cache_path=f".cache-{account}")
+
+    def close(self) -> None:
+        """Stop background pollers/collectors (used when a pool evicts us)."""
+        self._playback.stop()
+        if self._history_collector:
+            self._history_collector.stop()
+
+    def _connect(self) -> "Spotify":
+        """Authenticate and hook the HTTP session so payload sizes and
+        transport-level (429/5xx) retries show up in the metrics."""
+        sp = self._authenticate()
+        session = getattr(sp, "_session", None)
+        if session is not None:
+            def on_response(r, *args, **kwargs):
+                record_upstream_bytes("spotify", len(r.request.body or b""), len(r.content))
+                retries = getattr(getattr(r.raw, "retries", None), "history", ())
+                self._http_retries.n = getattr(self._http_retries, "n", 0) + len(retries)
+            session.hooks["response"].append(on_response)
+        return sp
 
     def _call(self, fn, *a, **kw):
         """
         Execute a Spotipy SDK function with one automatic retry if the
         access token is expired or lacks scope (401/403).
+        Every call is recorded in the upstream metrics.
         """
+        from spotipy import SpotifyException
+        endpoint = getattr(fn, "__name__", "call")
+        self._http_retries.n = 0
+        retries, status = 0, "ok"
+        start = time.perf_counter()
         try:
             return fn(*a, **kw)
         except SpotifyException as ex:
             if ex.http_status in (401, 403):
-                self._sp = authenticate()      # refresh token → new client
-                return fn(*a, **kw)
+                retries = 1
+                self._sp = self._connect()      # refresh token → new client
+                try:
+                    return getattr(self._sp, endpoint)(*a, **kw)
+                except Exception:
+                    status = "error"
+                    raise
+            status = "error"
+            raise
+        except Exception:
+            status = "error"
             raise
+        finally:
+            retries += getattr(self._http_retries, "n", 0)
+            record_upstream("spotify", endpoint, time.perf_counter() - start, status, retries)
     
     def list_playlists(self, limit: int = 50, include_public: bool = True,
                        include_private: bool = True, include_collab: bool = True):
@@ -30,14 +114,19 @@ class SpotifyTools:
             limit: Max playlists to return (Spotify page size ≤ 50).
             include_public/private/collab: Toggle visibility types.
         """
+        return list(islice(self.iter_playlists(limit, include_public, include_private,
+                                               include_collab), limit))
+
+    def iter_playlists(self, limit: int | None = None, include_public: bool = True,
+                       include_private: bool = True, include_collab: bool = True) -> Iterator[dict]:
+        """`list_playlists` as a generator, fetching a page at a time."""
         if not any((include_public, include_private, include_collab)):
             raise ValueError("Nothing to include – set at least one flag True.")
 
-        playlists = []
-        offset = 0
-        while len(playlists) < limit:
+        found = offset = 0
+        while limit is None or found < limit:
             batch = self._call(self._sp.current_user_playlists,
-                               limit=min(50, limit - len(playlists)),
+                               limit=50 if limit is None else min(50, limit - found),
                                offset=offset)["items"]
             if not batch:
                 break
@@ -45,14 +134,32 @@ class SpotifyTools:
                 if ((p["public"] and include_public) or
                     (not p["public"] and include_private) or
                     (p["collaborative"] and include_collab)):
-                    playlists.append(p)
+                    found += 1
+                    yield p
             offset += len(batch)
-        return playlists
     
 
     def get_playlist(self, playlist_id: str):
         """Fetch full playlist object (tracks, owner, etc.)."""
         return self._call(self._sp.playlist, playlist_id)
+
+    def playlist_tracks(self, playlist_id: str, limit: int | None = None):
+        """Return a playlist's track items, paging past the first 100."""
+        return list(self.iter_playlist_tracks(playlist_id, limit))
+
+    def iter_playlist_tracks(self, playlist_id: str, limit: int | None = None) -> Iterator[dict]:
+        """`playlist_tracks` as a generator, fetching 100 items at a time."""
+        offset = 0
+        while limit is None or offset < limit:
+            page = self._call(self._sp.playlist_items, playlist_id,
+                              limit=100 if limit is None else min(100, limit - offset),
+                              offset=offset, additional_types=("track",))
+            if not page["items"]:
+                break
+            yield from page["items"]
+            offset += len(page["items"])
+            if not page.get("next"):
+                break
     
     def create_playlist(self, name: str, public: bool = False,
                         description: str = "", collaborative: bool = False):
@@ -69,6 +176,7 @@ class SpotifyTools:
         if not track_uris:
             raise ValueError("track_uris is empty")
         self._call(self._sp.playlist_add_items, playlist_id, list(track_uris))
+        self._index_tracks(f"playlist:{playlist_id}", track_uris)
 
     def replace_tracks(self, playlist_id: str, track_uris: Sequence[str]) -> None:
         """
@@ -76,6 +184,8 @@ class SpotifyTools:
         Spotify lets you send max 100 uris at once; we chunk automatically.
         """
         self._call(self._sp.playlist_replace_items, playlist_id, list(track_uris))
+        self.library_index.remove_source(f"playlist:{playlist_id}")
+        self._index_tracks(f"playlist:{playlist_id}", track_uris)
 
     def remove_tracks(self, playlist_id: str, track_uris: Sequence[str]) -> None:
         """Remove specific tracks from a playlist."""
@@ -83,25 +193,32 @@ class SpotifyTools:
             raise ValueError("track_uris is empty")
         self._call(self._sp.playlist_remove_all_occurrences_of_items,
                    playlist_id, list(track_uris))
+        self.library_index.discard(f"playlist:{playlist_id}",
+                                   map(spotify_id, track_uris))
 
 
     # ──────────────── LIBRARY / STATS ─────────────────────────────────
     def liked_tracks(self, limit: int = 50):
         """Return the user's 'Liked Songs' (saved tracks) up to `limit`."""
-        tracks, offset = [], 0
-        while len(tracks) < limit:
+        return list(self.iter_liked_tracks(limit))
+
+    def iter_liked_tracks(self, limit: int | None = None) -> Iterator[dict]:
+        """`liked_tracks` as a generator, fetching 50 items at a time."""
+        offset = 0
+        while limit is None or offset < limit:
             chunk = self._call(self._sp.current_user_saved_tracks,
-                               limit=min(50, limit - len(tracks)),
+                               limit=50 if limit is None else min(50, limit - offset),
                                offset=offset)["items"]
             if not chunk:
                 break
-            tracks.extend(chunk)
+            yield from chunk
             offset += len(chunk)
-        return tracks
 
     def save_tracks(self, track_uris: Iterable[str]) -> None:
         """Save tracks to 'Liked Songs'."""
-        self._call(self._sp.current_user_saved_tracks_add, list(track_uris))
+        track_uris = list(track_uris)
+        self._call(self._sp.current_user_saved_tracks_add, track_uris)
+        self._index_tracks("saved", track_uris)
 
     def top_tracks(self, limit: int = 20, time_range: str = "medium_term"):
         """Return top tracks over `short_term` | `medium_term` | `long_term`."""
@@ -114,35 +231,123 @@ class SpotifyTools:
                           limit=limit)["items"]
 
 
+    # ──────────────── METADATA ENRICHMENT ────────────────────────────
+    # Artist/album details are fetched through the bulk endpoints (50 artists
+    # / 20 albums per request), de-duplicated and cached for a day.
+    def enrich_tracks(self, tracks: Sequence[dict | str]):
+        """Annotate track objects, library items or track ids/URIs with artist genres and album details."""
+        return self.enricher.enrich(tracks)
+
+    def enrich_liked_tracks(self, limit: int = 50):
+        """`liked_tracks` with artist genres and album details attached."""
+        return self.enricher.enrich(self.liked_tracks(limit))
+
+    def enrich_playlist(self, playlist_id: str):
+        """A playlist's tracks with artist genres and album details attached."""
+        return self.enricher.enrich(self.playlist_tracks(playlist_id))
+
+    def iter_enriched(self, tracks: Iterable[dict | str], chunk: int = 50) -> Iterator[dict]:
+        """
+        Enrich a (lazy) stream of tracks `chunk` at a time.  Costs a few more
+        requests than enriching the whole list at once, but the first tracks
+        are ready without reading the rest.
+        """
+        tracks = iter(tracks)
+        while batch := list(islice(tracks, chunk)):
+            yield from self.enricher.enrich(batch)
+
+
+    # ──────────────── LISTENING HISTORY ARCHIVE ──────────────────────
+    # Dates are ISO strings (e.g. "2024-01-01" or "2024-01-01T18:00:00+02:00");
+    # naive values are UTC, ranges are start-inclusive / end-exclusive.
+    @property
+    def history(self) -> ListeningHistory:
+        """On-disk play archive, opened on first use."""
+        if self._history is None:
+            with self._history_lock:
+                if self._history is None:
+                    self._history = ListeningHistory(self.history_dir)
+        return self._history
+
+    def start_history_collector(self, interval: float = 900.0) -> None:
+        """Archive new plays in the background every `interval` seconds."""
+        if self._history_collector is None:
+            self._history_collector = HistoryCollector(
+                self.history,
+                lambda **kw: self._call(self._sp.current_user_recently_played, **kw),
+                interval)
+        self._history_collector.start()
+
+    def sync_history(self) -> int:
+        """Archive plays since the last sync now; returns how many were added."""
+        return self.history.collect(
+            lambda **kw: self._call(self._sp.current_user_recently_played, **kw))
+
+    def history_top_tracks(self, start: str | None = None, end: str | None = None,
+                           limit: int = 20):
+        return self.history.top_tracks(start, end, limit)
+
+    def history_top_artists(self, start: str | None = None, end: str | None = None,
+                            limit: int = 20):
+        return self.history.top_artists(start, end, limit)
+
+    def history_play_count(self, start: str | None = None, end: str | None = None,
+                           track_id: str | None = None, artist_id: str | None = None):
+        return self.history.play_count(start, end, track_id, artist_id)
+
+    def history_heatmap(self, start: str | None = None, end: str | None = None,
+                        tz: str = "UTC"):
+        return self.history.heatmap(start, end, tz)
+
+
     # ──────────────── PLAYBACK CONTROL ───────────────────────────────
-    def devices(self):
-        """Return available Spotify Connect devices."""
-        return self._call(self._sp.devices)["devices"]
+    # `device_id` on the control commands accepts a device id or name; names
+    # are resolved against the cached device list, not a fresh API call.
+    def devices(self, refresh: bool = False):
+        """Return available Spotify Connect devices (cached for a few seconds)."""
+        return self._playback.devices(max_age=0 if refresh else None)
+
+    def current_playback(self, max_age: float | None = None):
+        """
+        Return the cached playback state as {"version", "age_ms", "playback"}.
+        Pass `max_age` (seconds) to force a refetch of older state.
+        """
+        return self._playback.current(max_age)
+
+    def wait_for_state_change(self, since_version: int | None = None,
+                              timeout: float = 10.0):
+        """Block until playback/device state changes past `since_version`."""
+        return self._playback.wait_for_change(since_version, timeout)
+
+    def _command(self, fn, *a, device_id: Optional[str] = None, **kw):
+        device_id = self._playback.resolve_device(device_id)
+        self._call(fn, *a, device_id=device_id, **kw)
+        self._playback.notify_command()
 
     def play(self, uris: Optional[Sequence[str]] = None,
              device_id: Optional[str] = None, position_ms: int | None = None):
-        self._call(self._sp.start_playback,
-                   device_id=device_id,
-                   uris=list(uris) if uris else None,
-                   position_ms=position_ms)
+        self._command(self._sp.start_playback,
+                      device_id=device_id,
+                      uris=list(uris) if uris else None,
+                      position_ms=position_ms)
 
     def pause(self, device_id: Optional[str] = None):
-        self._call(self._sp.pause_playback, device_id=device_id)
+        self._command(self._sp.pause_playback, device_id=device_id)
 
     def next(self, device_id: Optional[str] = None):
-        self._call(self._sp.next_track, device_id=device_id)
+        self._command(self._sp.next_track, device_id=device_id)
 
     def previous(self, device_id: Optional[str] = None):
-        self._call(self._sp.previous_track, device_id=device_id)
+        self._command(self._sp.previous_track, device_id=device_id)
 
     def seek(self, position_ms: int, device_id: Optional[str] = None):
-        self._call(self._sp.seek_track, position_ms, device_id=device_id)
+        self._command(self._sp.seek_track, position_ms, device_id=device_id)
 
     def set_volume(self, volume_percent: int, device_id: Optional[str] = None):
         """Volume 0-100."""
         if not 0 <= volume_percent <= 100:
             raise ValueError("volume_percent must be 0-100")
-        self._call(self._sp.volume, volume_percent, device_id=device_id)
+        self._command(self._sp.volume, volume_percent, device_id=device_id)
 
 
     # ──────────────── SEARCH / DISCOVERY ─────────────────────────────
@@ -153,11 +358,126 @@ class SpotifyTools:
 
     def recommendations(self, seed_tracks: Sequence[str] | None = None,
                         seed_artists: Sequence[str] | None = None,
-                        limit: int = 20):
-        """Spotify recommendations endpoint – pass up to 5 track or artist seeds."""
-        return self._call(self._sp.recommendations,
-                          seed_tracks=list(seed_tracks or []),
-                          seed_artists=list(seed_artists or []),
-                          limit=limit)["tracks"]   
-    
-    
\ No newline at end of file
+                        limit: int = 20, local: bool | None = None):
+        """
+        Tracks similar to the seeds.
+
+        `local=True` uses only the local co-occurrence model and
+        `local=False` only Spotify's recommendations endpoint (max 5 seeds).
+        By default the endpoint is used when it can take the seeds, falling
+        back to the local model if it fails.
+        """
+        from requests import RequestException
+        from spotipy import SpotifyException
+
+        seed_tracks, seed_artists = list(seed_tracks or []), list(seed_artists or [])
+        few_seeds = len(seed_tracks) + len(seed_artists) <= 5
+        if local is False and not few_seeds:
+            raise ValueError("Spotify's recommendations take at most 5 seeds")
+        if not local and few_seeds:
+            try:
+                return self._call(self._sp.recommendations,
+                                  seed_tracks=seed_tracks,
+                                  seed_artists=seed_artists,
+                                  limit=limit)["tracks"]
+            except (SpotifyException, RequestException):
+                if local is False:
+                    raise
+        return self.local_recommendations(seed_tracks, seed_artists, limit)
+
+    def local_recommendations(self, seed_tracks: Sequence[str] = (),
+                              seed_artists: Sequence[str] = (), limit: int = 20):
+        """Recommend from the local co-occurrence model; any number of seeds."""
+        self._ensure_library()
+        return self.recommender.recommend(seed_tracks, seed_artists, limit)
+
+
+    # ──────────────── LOCAL LIBRARY MODEL ────────────────────────────
+    # Playlists, saved tracks and listening sessions are mirrored as
+    # versioned "baskets"; a refresh only refetches baskets whose version
+    # (playlist snapshot id, saved-tracks count/newest) moved.
+    def _library_baskets(self):
+        """Yield (basket_id, version, load) with `load()` fetching the tracks."""
+        for p in self.list_playlists(limit=10_000):
+            yield (f"playlist:{p['id']}", p["snapshot_id"],
+                   lambda pid=p["id"]: [i["track"] for i in self.playlist_tracks(pid)])
+        head = self._call(self._sp.current_user_saved_tracks, limit=1)
+        newest = head["items"][0]["added_at"] if head["items"] else ""
+        yield ("saved", f"{head['total']}:{newest}",
+               lambda: [i["track"] for i in self.liked_tracks(limit=head["total"])])
+
+    def refresh_library(self) -> dict:
+        """Bring the local library models (recommender, search index) up to date."""
+        with self._library_lock:
+            return self._refresh_library()
+
+    def _refresh_library(self) -> dict:
+        # caller holds self._library_lock
+        seen, changed = set(), 0
+        for basket_id, version, load in self._library_baskets():
+            seen.add(basket_id)
+            if (self.recommender.basket_version(basket_id) != version
+                    or self.library_index.source_version(basket_id) != version):
+                tracks = load()
+                self.recommender.update_basket(basket_id, version, tracks)
+                self.library_index.set_source(basket_id, version, tracks)
+                changed += 1
+        for basket_id in self.recommender.basket_ids():
+            if basket_id not in seen and not basket_id.startswith("history:"):
+                self.recommender.remove_basket(basket_id)
+        for basket_id in self.library_index.source_ids():
+            if basket_id not in seen:
+                self.library_index.remove_source(basket_id)
+        # sessions are keyed by their first play, so re-adding the last
+        # counted session (grown or not) plus the new ones is enough
+        for start, tracks in self.history.sessions(since=self._history_mark):
+            self.recommender.update_basket(f"history:{start}", str(len(tracks)), tracks)
+        self._history_mark = self.history.last_played_ms
+        self._library_synced_at = time.monotonic()
+        return {"baskets": len(seen), "changed": changed,
+                "tracks": len(self.recommender),
+                "indexed": len(self.library_index)}
+
+    def _refresh_library_in_background(self) -> None:
+        # a refresh already running (in any thread) makes this one redundant
+        if not self._library_lock.acquire(blocking=False):
+            return
+        try:
+            self._refresh_library()
+        except Exception as e:
+            log.warning("Library refresh failed: %s", e)
+        finally:
+            self._library_lock.release()
+
+    def _index_tracks(self, source: str, track_uris: Iterable[str]) -> None:
+        """
+        Reflect tracks we just added to the library in the search index.
+        The write has already succeeded, so a failed lookup only marks the
+        index stale for the next search to rebuild.
+        """
+        if self._library_synced_at is not None:
+            try:
+                found = self.enricher.lookup("tracks", map(spotify_id, track_uris))
+                self.library_index.add(source, found.values())
+            except Exception as e:
+                log.warning("Indexing new tracks failed: %s", e)
+                self._library_synced_at = 0.0
+
+    def search_library(self, query: str, limit: int = 10):
+        """
+        Typo-tolerant search over the user's saved and playlist tracks.
+        Answered from the local index; no API call once it is built.
+        """
+        self._ensure_library()
+        return self.library_index.search(query, limit)
+
+    def _ensure_library(self, max_age: float = 600.0) -> None:
+        """Build the models on first use; refresh stale ones in the background."""
+        if self._library_synced_at is None:
+            with self._library_lock:
+                if self._library_synced_at is None:
+                    self._refresh_library()
+        elif (time.monotonic() - self._library_synced_at > max_age
+              and not self._library_lock.locked()):
+            threading.Thread(target=self._refresh_library_in_background,
+                             daemon=True).start()
@@ -0,0 +1,213 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Generic, Iterator, Optional, TypeVar
+from .metrics import record_cache
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_ACCOUNT = "default"
+_ACCOUNT_RE = re.compile(r"^[A-Za-z0-9_.@+-]{1,64}$")
+
+
+class Leases:
+    """
+    Clients handed out by pools inside one `leasing()` block.  Until
+    `release()` they are not closed, even if their pool evicts them or lets
+    them go as idle meanwhile; the last lease to end closes them instead.
+    """
+
+    def __init__(self):
+        self._held: list[tuple["ClientPool", str, object]] = []
+        self._lock = threading.Lock()
+
+    def add(self, pool: "ClientPool", key: str, client) -> None:
+        with self._lock:
+            self._held.append((pool, key, client))
+
+    def release(self) -> None:
+        with self._lock:
+            held, self._held = self._held, []
+        for pool, key, client in held:
+            pool._release(key, client)
+
+
+_leasing = threading.local()
+
+
+@contextmanager
+def leasing() -> Iterator[Leases]:
+    """
+    Lease every client `ClientPool.get` returns on this thread within the
+    block.  The caller releases the leases, possibly later and from another
+    thread (a result cursor keeps its clients until it is closed).
+    """
+    outer = getattr(_leasing, "leases", None)
+    _leasing.leases = leases = Leases()
+    try:
+        yield leases
+    finally:
+        _leasing.leases = outer
+
+
+def account_key(account: Optional[str]) -> str:
+    """Normalise an account name; it ends up in token/cache file names."""
+    if not account:
+        return DEFAULT_ACCOUNT
+    if not _ACCOUNT_RE.match(account):
+        raise ValueError(f"Invalid account name {account!r}")
+    return account
+
+
+class ClientPool(Generic[T]):
+    """
+    Keyed pool of per-account API clients.
+
+    Clients are built lazily by `factory(account)` on first use.  At most
+    `max_clients` are kept alive – the least recently used is dropped to make
+    room – and clients unused for `idle_timeout` seconds are released by a
+    background reaper.  A dropped client is closed at once unless it is
+    leased (see `leasing`), else when its last lease is released.  Creating
+    one account's client (which may mean an OAuth round trip) never blocks
+    requests for other accounts.
+    """
+
+    def __init__(self, factory: Callable[[str], T], max_clients: int = 8,
+                 idle_timeout: float = 1800.0,
+                 close: Optional[Callable[[T], None]] = None,
+                 name: str = "clients"):
+        self.name = name
+        self.factory = factory
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self._close = close or (lambda c: getattr(c, "close", lambda: None)())
+        self._clients: OrderedDict[str, tuple[T, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._creating: dict[str, threading.Lock] = {}
+        self._reaper: Optional[threading.Thread] = None
+        # id(client) -> open leases, and dropped clients waiting on theirs
+        self._leases: dict[int, int] = {}
+        self._retired: dict[int, T] = {}
+
+    def get(self, account: Optional[str] = None) -> T:
+        """Return the client for `account`, creating it if needed."""
+        key = account_key(account)
+        leases = getattr(_leasing, "leases", None)
+        client = self._touch(key, leases)
+        record_cache(self.name, client is not None)
+        if client is not None:
+            return client
+
+        with self._lock:
+            creating = self._creating.setdefault(key, threading.Lock())
+        with creating:
+            client = self._touch(key, leases)
+            if client is None:
+                client = self.factory(key)
+                evicted = []
+                with self._lock:
+                    self._clients[key] = (client, time.monotonic())
+                    self._lease(key, client, leases)
+                    while len(self._clients) > self.max_clients:
+                        old_key, (old, _) = self._clients.popitem(last=False)
+                        log.info("Evicting client for account %s", old_key)
+                        evicted.append(self._retire(old))
+                for old in evicted:
+                    self._safe_close(old)
+        with self._lock:
+            self._creating.pop(key, None)
+        self._ensure_reaper()
+        return client
+
+    def _touch(self, key: str, leases: Optional[Leases] = None) -> Optional[T]:
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is None:
+                return None
+            self._clients[key] = (entry[0], time.monotonic())
+            self._clients.move_to_end(key)
+            self._lease(key, entry[0], leases)
+            return entry[0]
+
+    def _lease(self, key: str, client: T, leases: Optional[Leases]) -> None:
+        # caller holds self._lock
+        if leases is not None:
+            self._leases[id(client)] = self._leases.get(id(client), 0) + 1
+            leases.add(self, key, client)
+
+    def _retire(self, client: T) -> Optional[T]:
+        """Drop `client` (caller holds self._lock); returns it if it can be closed now."""
+        if self._leases.get(id(client)):
+            self._retired[id(client)] = client
+            return None
+        return client
+
+    def _release(self, key: str, client: T) -> None:
+        with self._lock:
+            n = self._leases.pop(id(client)) - 1
+            if n:
+                self._leases[id(client)] = n
+                return
+            closing = self._retired.pop(id(client), None)
+            entry = self._clients.get(key)
+            if entry is not None and entry[0] is client:
+                # idle time counts from the end of the last call
+                self._clients[key] = (client, time.monotonic())
+        if closing is not None:
+            self._safe_close(closing)
+
+    def in_use(self) -> int:
+        """Clients (live or already dropped) with open leases."""
+        with self._lock:
+            return len(self._leases)
+
+    def accounts(self) -> list[str]:
+        """Accounts with a live client, least recently used first."""
+        with self._lock:
+            return list(self._clients)
+
+    def release_idle(self) -> int:
+        """Close clients idle for longer than `idle_timeout`; returns how many."""
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            idle = [k for k, (c, used) in self._clients.items()
+                    if used < cutoff and not self._leases.get(id(c))]
+            released = [self._clients.pop(k)[0] for k in idle]
+        for client in released:
+            self._safe_close(client)
+        return len(released)
+
+    def close_all(self) -> None:
+        """Drop every client; leased ones close when their leases end."""
+        with self._lock:
+            clients = [self._retire(c) for c, _ in self._clients.values()]
+            self._clients.clear()
+        for client in clients:
+            if client is not None:
+                self._safe_close(client)
+
+    def _safe_close(self, client: T) -> None:
+        try:
+            self._close(client)
+        except Exception as e:
+            log.warning("Error closing client: %s", e)
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is not None or not self.idle_timeout:
+            return
+        with self._lock:
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap,
+                                                name="client-pool-reaper", daemon=True)
+                self._reaper.start()
+
+    def _reap(self) -> None:
+        interval = max(1.0, min(60.0, self.idle_timeout / 4))
+        while True:
+            time.sleep(interval)
+            self.release_idle()
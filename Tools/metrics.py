@@ -0,0 +1,269 @@
+"""
+Process-wide metrics: counters and latency histograms with labels.
+
+Recording is a lock plus a couple of dict/list updates, cheap enough to leave
+on.  `metrics.snapshot()` feeds the `server_stats` tool and
+`metrics.prometheus()` renders the Prometheus text format for `/metrics` or
+a node-exporter textfile (`start_textfile_writer`).
+
+Upstream API calls made while an MCP tool is running are attributed to that
+tool through a context variable, which gives "upstream calls per tool call".
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+log = logging.getLogger(__name__)
+
+# latency buckets, seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# upstream calls made by a single tool call
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+HELP = {
+    "mcp_tool_calls_total": "MCP tool calls by outcome.",
+    "mcp_tool_latency_seconds": "MCP tool call latency.",
+    "mcp_tool_upstream_calls": "Upstream API requests made per MCP tool call.",
+    "mcp_tool_bytes_in_total": "Bytes of JSON arguments received by MCP tools.",
+    "mcp_tool_bytes_out_total": "Bytes of JSON results returned by MCP tools.",
+    "upstream_requests_total": "Requests to the Gmail / Spotify APIs by outcome.",
+    "upstream_latency_seconds": "Latency of Gmail / Spotify API requests.",
+    "upstream_retries_total": "Retried Gmail / Spotify API requests.",
+    "upstream_bytes_in_total": "Response bytes received from upstream APIs.",
+    "upstream_bytes_out_total": "Request bytes sent to upstream APIs.",
+    "cache_hits_total": "Local cache hits.",
+    "cache_misses_total": "Local cache misses.",
+}
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None if empty)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[tuple, float] = {}
+        self._histograms: dict[tuple, Histogram] = {}
+        self.started = time.time()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return (name, tuple(sorted(labels.items())))
+
+    def incr(self, name: str, value: float = 1, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets=BUCKETS, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # ──────────────── EXPORT ─────────────────────────────────────────
+    def counters(self) -> dict[tuple, float]:
+        with self._lock:
+            return dict(self._counters)
+
+    def histograms(self) -> dict[tuple, Histogram]:
+        with self._lock:
+            return dict(self._histograms)
+
+    def snapshot(self) -> dict:
+        """
+        Summary grouped for humans / agents: per tool, per upstream endpoint
+        and per cache.
+        """
+        counters, hists = self.counters(), self.histograms()
+
+        def ms(v):
+            return None if v is None else (round(v * 1000, 1) if v != float("inf") else "inf")
+
+        tools: dict[str, dict] = {}
+        upstream: dict[str, dict] = {}
+        caches: dict[str, dict] = {}
+        for (name, labels), value in counters.items():
+            lab = dict(labels)
+            if name == "mcp_tool_calls_total":
+                t = tools.setdefault(lab["tool"], {"calls": 0, "errors": 0})
+                t["calls"] += value
+                if lab["status"] != "ok":
+                    t["errors"] += value
+            elif name in ("mcp_tool_bytes_in_total", "mcp_tool_bytes_out_total"):
+                key = "bytes_in" if name.endswith("in_total") else "bytes_out"
+                tools.setdefault(lab["tool"], {"calls": 0, "errors": 0})[key] = value
+            elif name.startswith("upstream_bytes"):
+                key = "bytes_in" if "_in_" in name else "bytes_out"
+                upstream.setdefault(lab["service"], {})[key] = value
+            elif name in ("upstream_requests_total", "upstream_retries_total"):
+                ep = upstream.setdefault(lab["service"], {}).setdefault(
+                    "endpoints", {}).setdefault(lab["endpoint"], {"calls": 0, "errors": 0, "retries": 0})
+                if name == "upstream_retries_total":
+                    ep["retries"] += value
+                else:
+                    ep["calls"] += value
+                    if lab["status"] != "ok":
+                        ep["errors"] += value
+            elif name in ("cache_hits_total", "cache_misses_total"):
+                c = caches.setdefault(lab["cache"], {"hits": 0, "misses": 0})
+                c["hits" if name == "cache_hits_total" else "misses"] += value
+
+        for (name, labels), h in hists.items():
+            lab = dict(labels)
+            if name == "mcp_tool_latency_seconds":
+                target = tools.setdefault(lab["tool"], {"calls": 0, "errors": 0})
+            elif name == "upstream_latency_seconds":
+                target = upstream.setdefault(lab["service"], {}).setdefault(
+                    "endpoints", {}).setdefault(lab["endpoint"], {"calls": 0, "errors": 0, "retries": 0})
+            elif name == "mcp_tool_upstream_calls":
+                tools.setdefault(lab["tool"], {"calls": 0, "errors": 0})[
+                    "upstream_calls_per_call"] = round(h.sum / h.count, 2) if h.count else 0
+                continue
+            else:
+                continue
+            target.update(mean_ms=ms(h.sum / h.count), p50_ms=ms(h.quantile(0.5)),
+                          p95_ms=ms(h.quantile(0.95)), p99_ms=ms(h.quantile(0.99)))
+
+        for c in caches.values():
+            total = c["hits"] + c["misses"]
+            c["hit_rate"] = round(c["hits"] / total, 3) if total else None
+        return {"uptime_s": round(time.time() - self.started, 1),
+                "tools": tools, "upstream": upstream, "caches": caches}
+
+    def prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        def fmt(labels, extra=()):
+            items = list(labels) + list(extra)
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+        lines, typed = [], set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(self.counters().items()):
+            header(name, "counter")
+            lines.append(f"{name}{fmt(labels)} {value:g}")
+        for (name, labels), h in sorted(self.histograms().items(), key=lambda kv: kv[0]):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(h.buckets, h.counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{fmt(labels, [('le', f'{bound:g}')])} {cumulative}")
+            lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {h.count}")
+            lines.append(f"{name}_sum{fmt(labels)} {h.sum:g}")
+            lines.append(f"{name}_count{fmt(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
+
+# upstream request counter of the MCP tool call running in this context
+_tool_upstream: ContextVar[Optional[list]] = ContextVar("tool_upstream", default=None)
+
+
+@contextmanager
+def tool_call(tool: str):
+    """Time one MCP tool call and count the upstream requests it makes."""
+    upstream = [0]
+    token = _tool_upstream.set(upstream)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException as e:
+        status = "cancelled" if type(e).__name__ in ("CancelledError", "Cancelled") else "error"
+        raise
+    finally:
+        _tool_upstream.reset(token)
+        metrics.incr("mcp_tool_calls_total", tool=tool, status=status)
+        metrics.observe("mcp_tool_latency_seconds", time.perf_counter() - start, tool=tool)
+        metrics.observe("mcp_tool_upstream_calls", upstream[0], COUNT_BUCKETS, tool=tool)
+
+
+def record_upstream(service: str, endpoint: str, seconds: float,
+                    status: str = "ok", retries: int = 0) -> None:
+    """Record one logical upstream API call (after any retries)."""
+    metrics.incr("upstream_requests_total", service=service, endpoint=endpoint, status=status)
+    metrics.observe("upstream_latency_seconds", seconds, service=service, endpoint=endpoint)
+    if retries:
+        metrics.incr("upstream_retries_total", retries, service=service, endpoint=endpoint)
+    upstream = _tool_upstream.get()
+    if upstream is not None:
+        upstream[0] += 1 + retries
+
+
+def record_upstream_bytes(service: str, sent: int, received: int) -> None:
+    if sent:
+        metrics.incr("upstream_bytes_out_total", sent, service=service)
+    if received:
+        metrics.incr("upstream_bytes_in_total", received, service=service)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    metrics.incr("cache_hits_total" if hit else "cache_misses_total", cache=cache)
+
+
+def start_textfile_writer(path: str, interval: float = 15.0) -> threading.Thread:
+    """Rewrite `path` with the Prometheus text every `interval` seconds."""
+    def run():
+        while True:
+            try:
+                tmp = f"{path}.tmp"
+                with open(tmp, "w") as fh:
+                    fh.write(metrics.prometheus())
+                os.replace(tmp, path)
+            except OSError as e:
+                log.warning("Could not write metrics to %s: %s", path, e)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="metrics-textfile", daemon=True)
+    thread.start()
+    return thread
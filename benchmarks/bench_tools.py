@@ -0,0 +1,267 @@
+"""
+Offline benchmark of every `GmailTool`, `CalendarTool` and `SpotifyTools` method.
+
+Starts `benchmarks.fake_api` in-process, points the clients at it and runs
+each method `--repeat` times, reporting the first call's latency (cold
+caches), median / p95 of the rest, upstream API requests per call (retries
+included), 429s served and errors.  Run from the repository root:
+
+    python -m benchmarks.bench_tools
+    python -m benchmarks.bench_tools --emails 100000 --tracks 50000 --latency-ms 30
+    python -m benchmarks.bench_tools --only spotify --rate-429 0.05
+    python -m benchmarks.bench_tools --only calendar --events-per-day 12
+
+    python -m benchmarks.bench_tools --save bench.json       # record a baseline
+    python -m benchmarks.bench_tools --compare bench.json    # exit 1 on regressions
+
+A method regresses when it makes more upstream requests per call than in the
+baseline, or its median latency grows by more than `--tolerance` and by at
+least 5 ms.  Request counts are only compared when no 429s were injected.
+"""
+import argparse
+import json
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from Tools.Google.calendar_tools import CalendarTool
+from Tools.Google.gmail_tools import GmailTool
+from Tools.Spotify.spotify_tools import SpotifyTools
+from Tools.metrics import metrics, tool_call
+
+from .fake_api import FakeAPIServer, calendar_service, gmail_service, spotify_client
+
+MIN_REGRESSION_MS = 5.0
+
+Case = tuple[str, Callable[[int], object]]
+
+
+def gmail_cases(api: FakeAPIServer) -> list[Case]:
+    g = GmailTool("unused", service=gmail_service(api.url))
+    ids = api.gmail._order[:1000]
+    return [
+        ("gmail.list_labels", lambda i: g.list_labels()),
+        ("gmail.search_emails", lambda i: g.search_emails("project", 10)),
+        ("gmail.search_emails[50]", lambda i: g.search_emails("is:unread", 50)),
+        ("gmail.get_email", lambda i: g.get_email(ids[i])),
+        ("gmail.send_email", lambda i: g.send_email("bench@example.com", f"Benchmark {i}",
+                                                    "Sent by benchmarks.bench_tools")),
+        ("gmail.delete_email", lambda i: g.delete_email(ids[-1 - i])),
+    ]
+
+
+def calendar_cases(api: FakeAPIServer) -> list[Case]:
+    c = CalendarTool("unused", service=calendar_service(api.url))
+    all_ids = [cal["id"] for cal in api.calendar.calendars]
+    work = all_ids[:2]
+    day, week, month, year = (time.strftime("%Y-%m-%d", time.localtime(time.time() + d * 86_400))
+                              for d in (0, 7, 30, 365))
+    monday = time.strftime("%Y-%m-%d", time.localtime(time.time() + (7 - time.localtime().tm_wday) * 86_400))
+
+    def changed_sync(i):
+        api.calendar.add_event(all_ids[1], f"Bench {i}", f"{day}T20:00:00Z", f"{day}T21:00:00Z")
+        return c.sync(all_ids)
+
+    return [
+        ("calendar.list_calendars", lambda i: c.list_calendars()),
+        ("calendar.sync[full]", lambda i: (api.calendar.expire_tokens(), c.sync(all_ids))),
+        ("calendar.sync[unchanged]", lambda i: c.sync(all_ids)),
+        ("calendar.sync[1 change]", changed_sync),
+        ("calendar.events[week]", lambda i: c.events(day, week, all_ids)),
+        ("calendar.free_busy[30d]", lambda i: c.free_busy(day, month, all_ids)),
+        ("calendar.free_busy[1y]", lambda i: c.free_busy(day, year, all_ids)),
+        ("calendar.conflicts", lambda i: c.conflicts(f"{day}T10:00", f"{day}T11:00", work)),
+        ("calendar.free_slots", lambda i: c.free_slots(60, day, 5, work)),
+        ("calendar.free_slots[10x90m]", lambda i: c.free_slots(90, day, 10, work, days=60)),
+        ("calendar.create_event", lambda i: c.create_event(f"Bench {i}", f"{day}T19:00", f"{day}T19:30")),
+        ("calendar.create_recurring_event", lambda i: c.create_recurring_event(
+            f"Bench series {i}", f"{monday}T18:00", f"{monday}T18:30", "FREQ=WEEKLY;BYDAY=MO,WE")),
+    ]
+
+
+def spotify_cases(api: FakeAPIServer, workdir: str) -> tuple[list[Case], SpotifyTools]:
+    s = SpotifyTools(history_dir=f"{workdir}/history", cache_path=f"{workdir}/.cache",
+                     connect=lambda: spotify_client(api.url))
+    fake = api.spotify
+    track_ids = [t["id"] for t in fake.tracks[:1000]]
+    uris = [f"spotify:track:{t}" for t in track_ids]
+    big = max(fake.playlists, key=lambda p: len(p["items"]))["id"]
+    scratch = s.create_playlist("bench scratch")["id"]
+    seeds = track_ids[:3]
+    state = {}
+
+    def change(i):
+        state.setdefault("version", s.current_playback()["version"])
+        s.next()
+        result = s.wait_for_state_change(state["version"], timeout=5)
+        state["version"] = result["version"]
+        return result
+
+    return [
+        # playlists
+        ("spotify.list_playlists", lambda i: s.list_playlists(limit=50)),
+        ("spotify.get_playlist", lambda i: s.get_playlist(big)),
+        ("spotify.playlist_tracks", lambda i: s.playlist_tracks(big)),
+        ("spotify.create_playlist", lambda i: s.create_playlist(f"bench {i}")),
+        ("spotify.add_tracks", lambda i: s.add_tracks(scratch, uris[i * 50:(i + 1) * 50])),
+        ("spotify.replace_tracks", lambda i: s.replace_tracks(scratch, uris[:100])),
+        ("spotify.remove_tracks", lambda i: s.remove_tracks(scratch, uris[i * 10:(i + 1) * 10])),
+        # library
+        ("spotify.liked_tracks[500]", lambda i: s.liked_tracks(limit=500)),
+        ("spotify.save_tracks", lambda i: s.save_tracks(track_ids[i * 20:(i + 1) * 20])),
+        ("spotify.top_tracks", lambda i: s.top_tracks()),
+        ("spotify.recently_played", lambda i: s.recently_played()),
+        ("spotify.enrich_tracks[200]", lambda i: s.enrich_tracks(track_ids[:200])),
+        ("spotify.enrich_liked_tracks[200]", lambda i: s.enrich_liked_tracks(limit=200)),
+        ("spotify.enrich_playlist", lambda i: s.enrich_playlist(big)),
+        # listening history
+        ("spotify.sync_history", lambda i: s.sync_history()),
+        ("spotify.history_top_tracks", lambda i: s.history_top_tracks()),
+        ("spotify.history_top_artists", lambda i: s.history_top_artists()),
+        ("spotify.history_play_count", lambda i: s.history_play_count()),
+        ("spotify.history_heatmap", lambda i: s.history_heatmap()),
+        # playback
+        ("spotify.devices", lambda i: s.devices()),
+        ("spotify.current_playback", lambda i: s.current_playback()),
+        ("spotify.play", lambda i: s.play(uris[i:i + 1], device_id="Living Room")),
+        ("spotify.pause", lambda i: s.pause()),
+        ("spotify.next", lambda i: s.next()),
+        ("spotify.previous", lambda i: s.previous()),
+        ("spotify.seek", lambda i: s.seek(30_000)),
+        ("spotify.set_volume", lambda i: s.set_volume(40 + i, device_id="living")),
+        ("spotify.wait_for_state_change", change),
+        # search / discovery
+        ("spotify.search_track", lambda i: s.search_track("ka", 10)),
+        ("spotify.recommendations", lambda i: s.recommendations(seeds, local=False)),
+        ("spotify.refresh_library", lambda i: s.refresh_library()),
+        ("spotify.local_recommendations", lambda i: s.local_recommendations(seeds)),
+        ("spotify.search_library", lambda i: s.search_library(fake.tracks[i]["name"][:8])),
+    ], s
+
+
+def run_case(api: FakeAPIServer, name: str, fn: Callable[[int], object], repeat: int) -> dict:
+    latencies, errors = [], []
+    throttled = sum(api.throttled.values())
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        try:
+            with tool_call(name):
+                fn(i)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        latencies.append((time.perf_counter() - t0) * 1000)
+    upstream = metrics.histograms()[("mcp_tool_upstream_calls", (("tool", name),))]
+    rest = sorted(latencies[1:] or latencies)
+    return {"calls": repeat,
+            "first_ms": round(latencies[0], 2),
+            "median_ms": round(statistics.median(rest), 2),
+            "p95_ms": round(rest[min(len(rest) - 1, int(0.95 * len(rest)))], 2),
+            "requests_per_call": round(upstream.sum / upstream.count, 2),
+            "throttled": sum(api.throttled.values()) - throttled,
+            "errors": len(errors),
+            "first_error": errors[0] if errors else None}
+
+
+def compare(results: dict, baseline: dict, tolerance: float, check_requests: bool) -> list[str]:
+    problems = []
+    for name, old in baseline["results"].items():
+        new = results.get(name)
+        if new is None:
+            continue
+        if check_requests and new["requests_per_call"] > old["requests_per_call"]:
+            problems.append(f"{name}: {new['requests_per_call']} requests/call "
+                            f"(baseline {old['requests_per_call']})")
+        if (new["median_ms"] > old["median_ms"] * (1 + tolerance)
+                and new["median_ms"] - old["median_ms"] >= MIN_REGRESSION_MS):
+            problems.append(f"{name}: median {new['median_ms']} ms "
+                            f"(baseline {old['median_ms']} ms)")
+        if new["errors"] > old["errors"]:
+            problems.append(f"{name}: {new['errors']} errors ({new['first_error']})")
+    return problems
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline GmailTool / CalendarTool / SpotifyTools benchmark")
+    parser.add_argument("--only", choices=("gmail", "calendar", "spotify"), default=None)
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="calls per method")
+    parser.add_argument("--emails", type=int, default=10_000)
+    parser.add_argument("--tracks", type=int, default=10_000)
+    parser.add_argument("--playlists", type=int, default=100)
+    parser.add_argument("--events-per-day", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="FILE", help="write results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="baseline JSON to check against")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed relative growth of median latency")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="show the tools' own error / retry logging")
+    opts = parser.parse_args(argv)
+    if not opts.verbose:
+        # injected 429s make the tools log every failure; the table counts them
+        logging.disable(logging.ERROR)
+
+    config = {k: getattr(opts, k) for k in
+              ("emails", "tracks", "playlists", "events_per_day", "latency_ms", "jitter_ms", "rate_429", "seed")}
+    t0 = time.perf_counter()
+    api = FakeAPIServer(emails=opts.emails, tracks=opts.tracks, playlists=opts.playlists,
+                        events_per_day=opts.events_per_day, latency_ms=opts.latency_ms, jitter_ms=opts.jitter_ms,
+                        rate_429=opts.rate_429, seed=opts.seed).start()
+    print(f"fake APIs ready in {time.perf_counter() - t0:.1f}s: {opts.emails} emails, "
+          f"{opts.tracks} tracks, {opts.playlists} playlists, "
+          f"{sum(map(len, api.calendar.events.values()))} events, {opts.latency_ms:g} ms latency, "
+          f"{opts.rate_429:.0%} 429s")
+
+    results, spotify = {}, None
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            cases = []
+            if opts.only in (None, "gmail"):
+                cases += gmail_cases(api)
+            if opts.only in (None, "calendar"):
+                cases += calendar_cases(api)
+            if opts.only in (None, "spotify"):
+                more, spotify = spotify_cases(api, workdir)
+                cases += more
+            metrics.reset()
+            print(f"\n{'method':34} {'first':>9} {'median':>9} {'p95':>9} {'req/call':>9} "
+                  f"{'429s':>5} {'errors':>6}")
+            for name, fn in cases:
+                r = results[name] = run_case(api, name, fn, opts.repeat)
+                print(f"{name:34} {r['first_ms']:9.1f} {r['median_ms']:9.1f} {r['p95_ms']:9.1f} "
+                      f"{r['requests_per_call']:9.2f} {r['throttled']:5} {r['errors']:6}")
+            if spotify:
+                spotify.close()
+    finally:
+        api.stop()
+
+    failed = [f"{n}: {r['first_error']}" for n, r in results.items() if r["errors"]]
+    for line in failed:
+        print(f"  error in {line}")
+
+    if opts.save:
+        with open(opts.save, "w") as fh:
+            json.dump({"config": config, "results": results}, fh, indent=2)
+        print(f"\nresults written to {opts.save}")
+
+    if opts.compare:
+        with open(opts.compare) as fh:
+            baseline = json.load(fh)
+        if baseline.get("config") != config:
+            print(f"\nwarning: baseline was recorded with {baseline.get('config')}")
+        check_requests = not opts.rate_429 and not baseline.get("config", {}).get("rate_429")
+        problems = compare(results, baseline, opts.tolerance, check_requests)
+        print(f"\n{len(problems)} regression(s) against {opts.compare}")
+        for p in problems:
+            print(f"  {p}")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,927 @@
+"""
+Local stand-ins for the Gmail, Calendar and Spotify Web APIs.
+
+One threaded HTTP server answers the Gmail v1 endpoints under `/gmail/v1/`,
+Calendar v3 under `/calendar/v3/` and the Spotify endpoints under `/v1/`
+from a synthetic, deterministic mailbox, calendar set and music library, so
+`GmailTool`, `CalendarTool` and `SpotifyTools` can be run and timed without
+accounts or network access:
+
+    with FakeAPIServer(emails=50_000, tracks=50_000, latency_ms=30) as api:
+        gmail = GmailTool("unused", service=gmail_service(api.url))
+        calendar = CalendarTool("unused", service=calendar_service(api.url))
+        spotify = SpotifyTools(connect=lambda: spotify_client(api.url))
+
+Every request can be delayed (`latency_ms` ± `jitter_ms`) and a fraction of
+them answered with 429 + Retry-After (`rate_429`).  List endpoints paginate
+with the real page-size caps.  `requests` counts what was served per route.
+
+    python -m benchmarks.fake_api --port 8765 --emails 100000 --latency-ms 40
+"""
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+WORDS = (
+    "quarterly report meeting invoice travel budget launch review draft "
+    "contract update schedule project design feedback team offsite hiring "
+    "release notes security audit customer renewal roadmap planning sprint "
+    "demo dinner flight hotel receipt payment reminder newsletter weekly "
+    "summary proposal deadline migration incident postmortem benchmark").split()
+NAMES = ("alex sam jordan taylor morgan casey riley jamie avery quinn "
+         "harper rowan emerson finley sawyer parker reese skyler").split()
+DOMAINS = ("example.com", "acme.io", "contoso.org", "initech.net", "globex.co")
+SYLLABLES = ("la mo ri ka ne so vu te zi po da lu mi ra en ko sa vi no ta "
+             "bel dor fin gal hal jun kir lor mar nor pel quin ros tal ven").split()
+GENRES = ("indie rock", "synthpop", "jazz", "hip hop", "ambient", "techno",
+          "folk", "soul", "metal", "classical", "house", "r&b", "k-pop", "dub")
+
+GMAIL_LABELS = ("INBOX", "SENT", "DRAFT", "TRASH", "SPAM", "STARRED", "UNREAD",
+                "IMPORTANT", "CATEGORY_PERSONAL", "CATEGORY_SOCIAL",
+                "CATEGORY_PROMOTIONS", "CATEGORY_UPDATES")
+USER_LABELS = ("Receipts", "Travel", "Work/Projects", "Work/Hiring", "Family")
+
+EPOCH_MS = 1_767_225_600_000          # 2026-01-01T00:00:00Z, newest message / play
+MAIL_GAP_MS = 7 * 60_000
+PLAY_GAP_MS = 3 * 60_000 + 30_000
+GOOGLE_STATUS = {404: "NOT_FOUND", 410: "GONE", 429: "RESOURCE_EXHAUSTED"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _iso(ms: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ms / 1000)) + f".{ms % 1000:03d}Z"
+
+
+def _b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+
+def _sid(prefix: str, n: int) -> str:
+    """A 22-character Spotify-style id."""
+    return f"{prefix}{n:0{22 - len(prefix)}d}"
+
+
+def _page(items: list, offset: int, limit: int, url: str) -> dict:
+    chunk = items[offset:offset + limit]
+    nxt = offset + limit if offset + limit < len(items) else None
+    return {"href": f"{url}?offset={offset}&limit={limit}", "items": chunk,
+            "limit": limit, "offset": offset, "total": len(items),
+            "next": None if nxt is None else f"{url}?offset={nxt}&limit={limit}",
+            "previous": f"{url}?offset={max(0, offset - limit)}&limit={limit}" if offset else None}
+
+
+# ──────────────── GMAIL ──────────────────────────────────────────────
+class FakeGmail:
+    """A mailbox of `size` synthetic messages, newest first."""
+
+    MAX_PAGE = 500
+
+    def __init__(self, size: int, seed: int = 0):
+        rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._seq = size
+        self._order: list[str] = []
+        self._messages: dict[str, dict] = {}
+        contacts = [f"{rng.choice(NAMES).title()} {rng.choice(NAMES).title()} "
+                    f"<{n}.{i}@{rng.choice(DOMAINS)}>"
+                    for i, n in enumerate(rng.choice(NAMES) for _ in range(500))]
+        for i in range(size):
+            labels = {"SENT"} if i % 9 == 4 else {"INBOX", rng.choice(GMAIL_LABELS[8:])}
+            if i % 3 == 0:
+                labels.add("UNREAD")
+            if i % 17 == 0:
+                labels.add("STARRED")
+            if i % 13 == 0:
+                labels.add(f"Label_{i % len(USER_LABELS)}")
+            msg_id = f"{size - i:016x}"
+            self._add(msg_id, EPOCH_MS - i * MAIL_GAP_MS,
+                      rng.choice(contacts), "Me <me@example.com>",
+                      " ".join(rng.choices(WORDS, k=rng.randint(3, 7))).capitalize(),
+                      None, labels, i % 11 == 0)
+            self._order.append(msg_id)
+        self._search_cache: dict[str, list[str]] = {}
+
+    def _add(self, msg_id, date_ms, sender, to, subject, body, labels, attachment):
+        self._messages[msg_id] = {
+            "id": msg_id, "threadId": msg_id, "date": date_ms, "from": sender,
+            "to": to, "subject": subject, "body": body, "labels": labels,
+            "attachment": attachment,
+            "text": f"{subject} {sender}".lower()}
+
+    def handle(self, method: str, parts: list[str], query: dict, body) -> tuple[int, object, str]:
+        if parts == ["labels"] and method == "GET":
+            return 200, {"labels": self._labels()}, "labels.list"
+        if parts == ["messages"] and method == "GET":
+            return 200, self._list(query), "messages.list"
+        if parts == ["messages", "send"] and method == "POST":
+            return 200, self._send(body or {}), "messages.send"
+        if len(parts) == 2 and parts[0] == "messages" and method == "GET":
+            return 200, self._get(parts[1], query.get("format", "full")), "messages.get"
+        if len(parts) == 3 and parts[::2] == ["messages", "trash"] and method == "POST":
+            return 200, self._trash(parts[1]), "messages.trash"
+        raise HTTPError(404, "Requested entity was not found.")
+
+    def _labels(self) -> list[dict]:
+        system = [{"id": l, "name": l, "type": "system"} for l in GMAIL_LABELS]
+        user = [{"id": f"Label_{i}", "name": n, "type": "user",
+                 "messageListVisibility": "show", "labelListVisibility": "labelShow"}
+                for i, n in enumerate(USER_LABELS)]
+        return system + user
+
+    def _matches(self, msg: dict, terms: list[str]) -> bool:
+        for term in terms:
+            key, _, value = term.partition(":")
+            if value and key == "from":
+                if value not in msg["from"].lower():
+                    return False
+            elif value and key in ("is", "in", "label"):
+                if value != "anywhere" and value not in self._label_names(msg):
+                    return False
+            elif value and key == "has":
+                if value == "attachment" and not msg["attachment"]:
+                    return False
+            elif term not in msg["text"]:
+                return False
+        return True
+
+    @staticmethod
+    def _label_names(msg: dict) -> set[str]:
+        return {USER_LABELS[int(l[6:])].lower() if l.startswith("Label_") else l.lower()
+                for l in msg["labels"]}
+
+    def _search(self, q: str, include_trash: bool) -> list[str]:
+        key = f"{include_trash}:{q}"
+        with self._lock:
+            hits = self._search_cache.get(key)
+            if hits is None:
+                terms = q.lower().split()
+                hits = [i for i in self._order
+                        if (include_trash or not self._messages[i]["labels"] & {"TRASH", "SPAM"})
+                        and self._matches(self._messages[i], terms)]
+                if len(self._search_cache) > 64:
+                    self._search_cache.clear()
+                self._search_cache[key] = hits
+        return hits
+
+    def _list(self, query: dict) -> dict:
+        size = min(int(query.get("maxResults", 100)), self.MAX_PAGE)
+        offset = int(query.get("pageToken") or 0)
+        hits = self._search(query.get("q", ""), query.get("includeSpamTrash") == "true")
+        page = [{"id": i, "threadId": self._messages[i]["threadId"]}
+                for i in hits[offset:offset + size]]
+        out = {"resultSizeEstimate": len(hits)}
+        if page:
+            out["messages"] = page
+        if offset + size < len(hits):
+            out["nextPageToken"] = str(offset + size)
+        return out
+
+    def _body(self, msg: dict) -> str:
+        if msg["body"] is None:
+            rng = random.Random(msg["id"])
+            paragraphs = (" ".join(rng.choices(WORDS, k=rng.randint(20, 80))).capitalize() + "."
+                          for _ in range(rng.randint(1, 6)))
+            return "\n\n".join(paragraphs)
+        return msg["body"]
+
+    def _get(self, msg_id: str, fmt: str) -> dict:
+        msg = self._messages.get(msg_id)
+        if msg is None:
+            raise HTTPError(404, "Requested entity was not found.")
+        body = self._body(msg)
+        out = {"id": msg_id, "threadId": msg["threadId"], "labelIds": sorted(msg["labels"]),
+               "snippet": body[:100], "internalDate": str(msg["date"]),
+               "historyId": str(int(msg_id, 16)), "sizeEstimate": len(body) + 600}
+        if fmt == "minimal":
+            return out
+        headers = [{"name": "From", "value": msg["from"]},
+                   {"name": "To", "value": msg["to"]},
+                   {"name": "Subject", "value": msg["subject"]},
+                   {"name": "Date", "value": time.strftime(
+                       "%a, %d %b %Y %H:%M:%S +0000", time.gmtime(msg["date"] / 1000))}]
+        parts = [{"partId": "0", "mimeType": "text/plain", "filename": "",
+                  "body": {"size": len(body), "data": _b64(body)}}]
+        if msg["attachment"]:
+            parts.append({"partId": "1", "mimeType": "application/pdf",
+                          "filename": "attachment.pdf",
+                          "body": {"size": 48_213, "attachmentId": f"att-{msg_id}"}})
+        out["payload"] = {"partId": "", "mimeType": "multipart/mixed",
+                          "headers": headers, "parts": parts}
+        return out
+
+    def _send(self, body: dict) -> dict:
+        raw = base64.urlsafe_b64decode(body.get("raw", "") + "==").decode(errors="replace")
+        headers, _, text = raw.partition("\n\n")
+        fields = dict(line.split(": ", 1) for line in headers.splitlines() if ": " in line)
+        with self._lock:
+            self._seq += 1
+            msg_id = f"{self._seq:016x}"
+            self._add(msg_id, int(time.time() * 1000), "Me <me@example.com>",
+                      fields.get("to", ""), fields.get("subject", ""), text[:4096],
+                      {"SENT"}, "Content-Disposition: attachment" in raw)
+            self._order.insert(0, msg_id)
+            self._search_cache.clear()
+        return {"id": msg_id, "threadId": msg_id, "labelIds": ["SENT"]}
+
+    def _trash(self, msg_id: str) -> dict:
+        with self._lock:
+            msg = self._messages.get(msg_id)
+            if msg is None:
+                raise HTTPError(404, "Requested entity was not found.")
+            msg["labels"] = (msg["labels"] - {"INBOX"}) | {"TRASH"}
+            self._search_cache.clear()
+        return {"id": msg_id, "threadId": msg["threadId"], "labelIds": sorted(msg["labels"])}
+
+
+# ──────────────── SPOTIFY ────────────────────────────────────────────
+class FakeSpotify:
+    """
+    A library of `size` tracks (saved), `playlists` playlists drawn from it,
+    `plays` recently-played entries and three Connect devices.
+    """
+
+    def __init__(self, size: int, playlists: int = 100, plays: int = 5000, seed: int = 0):
+        rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.url = "https://api.spotify.com/v1"
+        n_artists, n_albums = max(10, size // 10), max(10, size // 8)
+
+        def name(k):
+            return " ".join("".join(rng.choices(SYLLABLES, k=rng.randint(2, 3))).capitalize()
+                            for _ in range(k))
+
+        self.artists = [{"id": _sid("ar", i), "name": name(rng.randint(1, 2)),
+                         "genres": rng.sample(GENRES, rng.randint(1, 3)),
+                         "popularity": rng.randint(5, 95),
+                         "followers": {"href": None, "total": rng.randint(100, 10**7)}}
+                        for i in range(n_artists)]
+        self.albums = [{"id": _sid("al", i), "name": name(rng.randint(1, 3)),
+                        "artist": rng.randrange(n_artists),
+                        "release_date": f"{rng.randint(1965, 2025)}-{rng.randint(1, 12):02d}-01",
+                        "label": f"{name(1)} Records", "popularity": rng.randint(5, 95),
+                        "total_tracks": 0}
+                       for i in range(n_albums)]
+        self.tracks = []
+        for i in range(size):
+            album = rng.randrange(n_albums)
+            artists = [self.albums[album]["artist"]]
+            if rng.random() < 0.2:
+                artists.append(rng.randrange(n_artists))
+            self.albums[album]["total_tracks"] += 1
+            self.tracks.append({"id": _sid("tr", i), "name": name(rng.randint(1, 4)),
+                                "album": album, "artists": artists,
+                                "duration_ms": rng.randint(120_000, 360_000),
+                                "popularity": rng.randint(0, 100)})
+        self._track_ix = {t["id"]: i for i, t in enumerate(self.tracks)}
+        self._names = [t["name"].lower() for t in self.tracks]
+
+        self.saved = [(i, _iso(EPOCH_MS - i * 3_600_000)) for i in range(size)]
+        self.playlists = []
+        for p in range(playlists):
+            items = rng.sample(range(size), min(size, rng.randint(20, 300)))
+            self.playlists.append({"id": _sid("pl", p), "name": f"{name(2)} mix",
+                                   "public": p % 3 != 0, "collaborative": p % 10 == 0,
+                                   "description": "", "version": 1, "items": items})
+        self._playlist_ix = {p["id"]: p for p in self.playlists}
+        self.plays = [rng.randrange(size) for _ in range(plays)]
+
+        self.devices = [{"id": f"device{i}", "name": n, "type": t, "is_active": i == 0,
+                         "is_private_session": False, "is_restricted": False,
+                         "volume_percent": 50, "supports_volume": True}
+                        for i, (n, t) in enumerate((("Living Room", "Speaker"),
+                                                    ("Work Laptop", "Computer"),
+                                                    ("Phone", "Smartphone")))]
+        self._player = {"track": 0, "is_playing": False, "progress_ms": 0,
+                        "at": time.monotonic(), "device": 0}
+
+    # objects ---------------------------------------------------------
+    def artist(self, i: int, full: bool = False) -> dict:
+        a = self.artists[i]
+        out = {"id": a["id"], "name": a["name"], "type": "artist",
+               "uri": f"spotify:artist:{a['id']}",
+               "href": f"{self.url}/artists/{a['id']}",
+               "external_urls": {"spotify": f"https://open.spotify.com/artist/{a['id']}"}}
+        if full:
+            out.update(genres=a["genres"], popularity=a["popularity"],
+                       followers=a["followers"], images=[])
+        return out
+
+    def album(self, i: int, full: bool = False) -> dict:
+        al = self.albums[i]
+        out = {"id": al["id"], "name": al["name"], "type": "album", "album_type": "album",
+               "uri": f"spotify:album:{al['id']}", "href": f"{self.url}/albums/{al['id']}",
+               "release_date": al["release_date"], "release_date_precision": "day",
+               "total_tracks": al["total_tracks"], "images": [],
+               "artists": [self.artist(al["artist"])]}
+        if full:
+            out.update(label=al["label"], popularity=al["popularity"], genres=[],
+                       tracks=_page([], 0, 50, f"{self.url}/albums/{al['id']}/tracks"))
+        return out
+
+    def track(self, i: int) -> dict:
+        t = self.tracks[i]
+        return {"id": t["id"], "name": t["name"], "type": "track",
+                "uri": f"spotify:track:{t['id']}", "href": f"{self.url}/tracks/{t['id']}",
+                "duration_ms": t["duration_ms"], "popularity": t["popularity"],
+                "explicit": False, "is_local": False, "track_number": 1, "disc_number": 1,
+                "album": self.album(t["album"]),
+                "artists": [self.artist(a) for a in t["artists"]]}
+
+    def playlist(self, p: dict, with_tracks: bool = True) -> dict:
+        out = {"id": p["id"], "name": p["name"], "public": p["public"],
+               "collaborative": p["collaborative"], "description": p["description"],
+               "snapshot_id": f"{p['id']}-{p['version']}", "type": "playlist",
+               "uri": f"spotify:playlist:{p['id']}", "images": [],
+               "owner": {"id": "fakeuser", "display_name": "Fake User"},
+               "tracks": {"href": f"{self.url}/playlists/{p['id']}/tracks",
+                          "total": len(p["items"])}}
+        if with_tracks:
+            out["tracks"] = self._playlist_items(p, 0, 100)
+        return out
+
+    def _playlist_items(self, p: dict, offset: int, limit: int) -> dict:
+        page = _page(p["items"], offset, limit, f"{self.url}/playlists/{p['id']}/tracks")
+        page["items"] = [{"added_at": _iso(EPOCH_MS), "is_local": False,
+                          "track": self.track(i)} for i in page["items"]]
+        return page
+
+    def _ix(self, value: str, index: dict) -> int:
+        key = value.rsplit(":", 1)[-1].rsplit("/", 1)[-1]
+        if key not in index:
+            raise HTTPError(404, "Not found.")
+        return index[key]
+
+    def _ids(self, query: dict, cap: int) -> list[str]:
+        ids = [i for i in query.get("ids", "").split(",") if i]
+        if len(ids) > cap:
+            raise HTTPError(400, "Too many ids requested")
+        return ids
+
+    def _play_time(self, k: int) -> int:
+        # play 0 is the newest
+        return EPOCH_MS - k * PLAY_GAP_MS
+
+    # routing ---------------------------------------------------------
+    def handle(self, method: str, parts: list[str], query: dict, body) -> tuple[int, object, str]:
+        limit = int(query.get("limit", 20))
+        offset = int(query.get("offset", 0))
+        route = "/".join(parts)
+        with self._lock:
+            if parts == ["me"]:
+                return 200, {"id": "fakeuser", "display_name": "Fake User",
+                             "uri": "spotify:user:fakeuser", "country": "US"}, "me"
+            if parts == ["me", "playlists"]:
+                page = _page(self.playlists, offset, min(limit, 50), f"{self.url}/me/playlists")
+                page["items"] = [self.playlist(p, False) for p in page["items"]]
+                return 200, page, "me/playlists"
+            if parts[:1] == ["users"] and parts[2:] == ["playlists"] and method == "POST":
+                p = {"id": _sid("pl", len(self.playlists)), "name": body.get("name", ""),
+                     "public": body.get("public", True),
+                     "collaborative": body.get("collaborative", False),
+                     "description": body.get("description", ""), "version": 1, "items": []}
+                self.playlists.append(p)
+                self._playlist_ix[p["id"]] = p
+                return 201, self.playlist(p), "users/{id}/playlists"
+            if parts[:1] == ["playlists"] and len(parts) == 2:
+                return 200, self.playlist(self._playlist(parts[1])), "playlists/{id}"
+            if parts[:1] == ["playlists"] and parts[2:] == ["tracks"]:
+                return self._playlist_tracks(method, self._playlist(parts[1]),
+                                             offset, min(limit, 100), body)
+            if parts == ["me", "tracks"]:
+                if method == "GET":
+                    page = _page(self.saved, offset, min(limit, 50), f"{self.url}/me/tracks")
+                    page["items"] = [{"added_at": at, "track": self.track(i)}
+                                     for i, at in page["items"]]
+                    return 200, page, "me/tracks"
+                ids = self._ids(query, 50)
+                now = _iso(int(time.time() * 1000))
+                known = {i for i, _ in self.saved}
+                new = [self._ix(i, self._track_ix) for i in ids]
+                self.saved[:0] = [(i, now) for i in new if i not in known]
+                return 200, None, "me/tracks"
+            if parts == ["me", "top", "tracks"]:
+                ranked = self.plays[:max(50, limit)]
+                page = _page(ranked, offset, min(limit, 50), f"{self.url}/me/top/tracks")
+                page["items"] = [self.track(i) for i in page["items"]]
+                return 200, page, "me/top/tracks"
+            if parts == ["me", "player", "recently-played"]:
+                return 200, self._recently_played(query, min(limit, 50)), route
+            if parts[:1] in (["artists"], ["albums"], ["tracks"]) and len(parts) == 1:
+                return 200, self._several(parts[0], query), parts[0]
+            if parts == ["search"]:
+                return 200, self._search(query.get("q", ""), offset, min(limit, 50)), "search"
+            if parts == ["recommendations"]:
+                return 200, self._recommend(query, min(limit, 100)), "recommendations"
+            if parts[:2] == ["me", "player"]:
+                return self._player_call(method, parts[2:], query, body)
+        raise HTTPError(404, "Service not found")
+
+    def _playlist(self, playlist_id: str) -> dict:
+        p = self._playlist_ix.get(playlist_id)
+        if p is None:
+            raise HTTPError(404, "Not found.")
+        return p
+
+    def _playlist_tracks(self, method, p, offset, limit, body):
+        route = "playlists/{id}/tracks"
+        if method == "GET":
+            return 200, self._playlist_items(p, offset, limit), route
+        # add sends a bare list of URIs, replace {"uris": [...]}, remove {"tracks": [{"uri"}]}
+        if isinstance(body, list):
+            uris = body
+        else:
+            uris = (body or {}).get("uris") or [t["uri"] for t in (body or {}).get("tracks", [])]
+        if len(uris) > 100:
+            raise HTTPError(400, "Too many tracks requested")
+        ix = [self._ix(u, self._track_ix) for u in uris]
+        if method == "POST":
+            p["items"].extend(ix)
+        elif method == "PUT":
+            p["items"] = ix
+        elif method == "DELETE":
+            drop = set(ix)
+            p["items"] = [i for i in p["items"] if i not in drop]
+        p["version"] += 1
+        return (201 if method == "POST" else 200), {"snapshot_id": f"{p['id']}-{p['version']}"}, route
+
+    def _recently_played(self, query: dict, limit: int) -> dict:
+        n = len(self.plays)
+        if "after" in query:
+            after = int(query["after"])
+            # plays 0..newer-1 are later than `after`; page forward from the oldest
+            newer = max(0, min(n, -(-(EPOCH_MS - after) // PLAY_GAP_MS)))
+            ks = range(max(0, newer - limit), newer)
+        else:
+            before = int(query.get("before", EPOCH_MS + 1))
+            first = max(0, -(-(EPOCH_MS - before + 1) // PLAY_GAP_MS))
+            ks = range(first, min(n, first + limit))
+        items = [{"played_at": _iso(self._play_time(k)), "track": self.track(self.plays[k]),
+                  "context": None} for k in ks]
+        cursors = ({"after": str(self._play_time(ks[0])), "before": str(self._play_time(ks[-1]))}
+                   if items else None)
+        return {"items": items, "limit": limit, "cursors": cursors,
+                "href": f"{self.url}/me/player/recently-played", "next": None}
+
+    def _several(self, kind: str, query: dict) -> dict:
+        cap = 20 if kind == "albums" else 50
+        out = []
+        for value in self._ids(query, cap):
+            if kind == "tracks":
+                i = self._track_ix.get(value)
+                out.append(None if i is None else self.track(i))
+            else:
+                prefix, table = ("ar", self.artists) if kind == "artists" else ("al", self.albums)
+                i = int(value[2:]) if value.startswith(prefix) and value[2:].isdigit() else -1
+                full = self.artist if kind == "artists" else self.album
+                out.append(full(i, True) if 0 <= i < len(table) else None)
+        return {kind: out}
+
+    def _search(self, q: str, offset: int, limit: int) -> dict:
+        terms = q.lower().split()
+        hits = [i for i, name in enumerate(self._names) if all(t in name for t in terms)]
+        page = _page(hits, offset, limit, f"{self.url}/search")
+        page["items"] = [self.track(i) for i in page["items"]]
+        return {"tracks": page}
+
+    def _recommend(self, query: dict, limit: int) -> dict:
+        seeds = [self._ix(t, self._track_ix) for t in query.get("seed_tracks", "").split(",") if t]
+        rng = random.Random(",".join(map(str, seeds)) + query.get("seed_artists", ""))
+        return {"seeds": [], "tracks": [self.track(rng.randrange(len(self.tracks)))
+                                        for _ in range(limit)]}
+
+    def _player_call(self, method, parts, query, body):
+        pl = self._player
+        now = time.monotonic()
+        if pl["is_playing"]:
+            pl["progress_ms"] += int((now - pl["at"]) * 1000)
+        pl["at"] = now
+        route = "/".join(["me", "player"] + parts)
+        if not parts and method == "GET":
+            t = self.tracks[pl["track"]]
+            pl["progress_ms"] %= t["duration_ms"]
+            return 200, {"device": self.devices[pl["device"]], "is_playing": pl["is_playing"],
+                         "progress_ms": pl["progress_ms"], "item": self.track(pl["track"]),
+                         "shuffle_state": False, "repeat_state": "off",
+                         "timestamp": int(time.time() * 1000),
+                         "currently_playing_type": "track"}, "me/player"
+        if parts == ["devices"]:
+            return 200, {"devices": self.devices}, route
+        if "device_id" in query:
+            ids = [d["id"] for d in self.devices]
+            if query["device_id"] not in ids:
+                raise HTTPError(404, "Device not found")
+            pl["device"] = ids.index(query["device_id"])
+        if parts == ["play"]:
+            uris = (body or {}).get("uris")
+            if uris:
+                pl["track"] = self._ix(uris[0], self._track_ix)
+                pl["progress_ms"] = 0
+            if (body or {}).get("position_ms") is not None:
+                pl["progress_ms"] = int(body["position_ms"])
+            pl["is_playing"] = True
+        elif parts == ["pause"]:
+            pl["is_playing"] = False
+        elif parts in (["next"], ["previous"]):
+            step = 1 if parts == ["next"] else -1
+            pl["track"] = (pl["track"] + step) % len(self.tracks)
+            pl["progress_ms"] = 0
+        elif parts == ["seek"]:
+            pl["progress_ms"] = int(query.get("position_ms", 0))
+        elif parts == ["volume"]:
+            self.devices[pl["device"]]["volume_percent"] = int(query.get("volume_percent", 50))
+        else:
+            raise HTTPError(404, "Service not found")
+        return 204, None, route
+
+
+# ──────────────── CALENDAR ───────────────────────────────────────────
+class FakeCalendar:
+    """
+    Three calendars (a busy primary, a team calendar in another time zone and
+    an all-day holiday calendar) with events from 30 days before `anchor_ms`
+    to 180 days after it, plus a few recurring series (`series`), one of
+    them without end.  Every change bumps a sequence number; a sync token
+    is `calendar:seq` and tokens older than `expire_tokens()` answer 410.
+
+    Series are always returned as their master event and exceptions, as
+    with `singleEvents=false`; the fake does not expand them.
+    """
+
+    MAX_PAGE = 2500
+
+    def __init__(self, per_day: int = 4, seed: int = 0, anchor_ms: int | None = None):
+        from zoneinfo import ZoneInfo
+
+        rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._ids = 0
+        anchor = (anchor_ms if anchor_ms is not None else int(time.time() * 1000)) // 86_400_000
+        self.calendars = [
+            {"id": "me@example.com", "summary": "me@example.com", "timeZone": "Europe/Berlin",
+             "accessRole": "owner", "primary": True},
+            {"id": "team@group.calendar.google.com", "summary": "Team", "timeZone": "America/New_York",
+             "accessRole": "writer"},
+            {"id": "holidays@group.v.calendar.google.com", "summary": "Holidays",
+             "timeZone": "Europe/Berlin", "accessRole": "reader"},
+        ]
+        self.events: dict[str, dict[str, dict]] = {c["id"]: {} for c in self.calendars}
+        self._valid_from: dict[str, int] = {c["id"]: 0 for c in self.calendars}
+
+        for cal, meetings in zip(self.calendars[:2], (per_day, max(1, per_day // 2))):
+            tz = ZoneInfo(cal["timeZone"])
+            for d in range(-30, 181):
+                day = datetime.fromtimestamp((anchor + d) * 86_400, tz).date()
+                if day.weekday() >= 5:
+                    continue
+                for _ in range(rng.randint(meetings // 2, meetings)):
+                    start = datetime.combine(day, dt_time(rng.randint(8, 17), rng.choice((0, 30))), tz)
+                    end = start + timedelta(minutes=rng.choice((30, 30, 60, 60, 90)))
+                    extra = {}
+                    if rng.random() < 0.05:
+                        extra["transparency"] = "transparent"
+                    if rng.random() < 0.05:
+                        extra["attendees"] = [{"email": "me@example.com", "self": True,
+                                               "responseStatus": "declined"}]
+                    self.add_event(cal["id"], " ".join(rng.choices(WORDS, k=2)).capitalize(),
+                                   start.isoformat(), end.isoformat(), **extra)
+        holidays = self.calendars[2]["id"]
+        for d in range(-30, 181, 19):
+            day = datetime.fromtimestamp((anchor + d) * 86_400).date()
+            self.add_event(holidays, "Public holiday", day.isoformat(),
+                           (day + timedelta(days=1)).isoformat(), transparency="transparent")
+
+        me, team = self.calendars[0]["id"], self.calendars[1]["id"]
+        berlin, new_york = ZoneInfo("Europe/Berlin"), ZoneInfo("America/New_York")
+        monday = datetime.fromtimestamp((anchor - 30) * 86_400).date()
+        monday -= timedelta(days=monday.weekday())
+
+        def at(day, hour, minute, tz):
+            return datetime.combine(day, dt_time(hour, minute), tz).isoformat()
+
+        def first(weekday, nth=1):
+            day = monday.replace(day=1) + timedelta(days=(weekday - monday.replace(day=1).weekday()) % 7)
+            return day + timedelta(weeks=nth - 1)
+
+        until = datetime.fromtimestamp((anchor + 120) * 86_400).strftime("%Y%m%dT000000Z")
+        self.series = {
+            "standup": self.add_event(
+                me, "Daily standup", at(monday, 9, 0, berlin), at(monday, 9, 15, berlin),
+                time_zone="Europe/Berlin", recurrence=["RRULE:FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR"])["id"],
+            "one_on_one": self.add_event(
+                me, "1:1", at(monday + timedelta(days=3), 14, 0, berlin),
+                at(monday + timedelta(days=3), 14, 30, berlin), time_zone="Europe/Berlin",
+                recurrence=["RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=TH"])["id"],
+            "review": self.add_event(
+                me, "Monthly review", at(first(0), 16, 0, berlin), at(first(0), 17, 0, berlin),
+                time_zone="Europe/Berlin", recurrence=["RRULE:FREQ=MONTHLY;BYDAY=1MO;COUNT=12"])["id"],
+            "planning": self.add_event(
+                team, "Sprint planning", at(monday, 10, 0, new_york), at(monday, 11, 0, new_york),
+                time_zone="America/New_York", recurrence=[f"RRULE:FREQ=WEEKLY;BYDAY=MO;UNTIL={until}"])["id"],
+        }
+
+    def _calendar(self, calendar_id: str) -> dict[str, dict]:
+        if calendar_id == "primary":
+            calendar_id = self.calendars[0]["id"]
+        if calendar_id not in self.events:
+            raise HTTPError(404, "Not Found")
+        return self.events[calendar_id]
+
+    def add_event(self, calendar_id: str, summary: str, start: str, end: str,
+                  time_zone: str | None = None, **extra) -> dict:
+        """Add an event directly (as if made in another client); dates make it all-day."""
+        when = "date" if len(start) == 10 else "dateTime"
+        zone = {"timeZone": time_zone} if time_zone else {}
+        return self._insert(calendar_id, {"summary": summary, "start": {when: start, **zone},
+                                          "end": {when: end, **zone}, **extra})
+
+    def override_instance(self, calendar_id: str, series_id: str, original_start: str, **changes) -> dict:
+        """Edit one occurrence of a series (given by its original start) into an
+        exception; `start` / `end` move it, `status="cancelled"` deletes it."""
+        master = self._calendar(calendar_id)[series_id]
+        when = "date" if len(original_start) == 10 else "dateTime"
+        zone = {"timeZone": master["start"]["timeZone"]} if "timeZone" in master["start"] else {}
+        if when == "date":
+            stamp = original_start.replace("-", "")
+            length = date.fromisoformat(master["end"]["date"]) - date.fromisoformat(master["start"]["date"])
+            end = (date.fromisoformat(original_start) + length).isoformat()
+        else:
+            start = datetime.fromisoformat(original_start)
+            stamp = start.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+            length = (datetime.fromisoformat(master["end"]["dateTime"])
+                      - datetime.fromisoformat(master["start"]["dateTime"]))
+            end = (start + length).isoformat()
+        event = {k: v for k, v in master.items() if k not in ("recurrence", "_seq")}
+        event.update(id=f"{series_id}_{stamp}", recurringEventId=series_id,
+                     originalStartTime={when: original_start, **zone},
+                     start={when: original_start, **zone}, end={when: end, **zone})
+        event.update(changes)
+        return self._store(calendar_id, event)
+
+    def _insert(self, calendar_id: str, event: dict) -> dict:
+        with self._lock:
+            self._ids += 1
+            event_id = f"ev{self._ids:08d}"
+        return self._store(calendar_id, {
+            "kind": "calendar#event", "id": event_id, "status": "confirmed",
+            "htmlLink": f"https://www.google.com/calendar/event?eid={event_id}", **event})
+
+    def update_event(self, calendar_id: str, event_id: str, **changes) -> dict:
+        return self._store(calendar_id, {**self._calendar(calendar_id)[event_id], **changes})
+
+    def cancel_event(self, calendar_id: str, event_id: str) -> dict:
+        return self.update_event(calendar_id, event_id, status="cancelled")
+
+    def expire_tokens(self, calendar_id: str | None = None) -> None:
+        """Make every sync token issued so far answer 410 Gone."""
+        with self._lock:
+            self._seq += 1
+            for cid in [calendar_id] if calendar_id else list(self._valid_from):
+                self._valid_from[cid] = self._seq
+
+    def _store(self, calendar_id: str, event: dict) -> dict:
+        events = self._calendar(calendar_id)
+        with self._lock:
+            self._seq += 1
+            event["_seq"] = self._seq
+            event["updated"] = _iso(EPOCH_MS + self._seq)
+            events[event["id"]] = event
+        return {k: v for k, v in event.items() if k != "_seq"}
+
+    def handle(self, method: str, parts: list[str], query: dict, body) -> tuple[int, object, str]:
+        if parts == ["users", "me", "calendarList"] and method == "GET":
+            return 200, {"kind": "calendar#calendarList",
+                         "items": [dict(c, kind="calendar#calendarListEntry") for c in self.calendars]
+                         }, "calendarList.list"
+        if len(parts) == 3 and parts[0] == "calendars" and parts[2] == "events":
+            if method == "GET":
+                return 200, self._list(parts[1], query), "events.list"
+            if method == "POST":
+                event = {k: v for k, v in (body or {}).items() if k not in ("id", "status")}
+                if not event.get("start") or not event.get("end"):
+                    raise HTTPError(400, "Missing end time.")
+                return 200, self._insert(parts[1], event), "events.insert"
+        raise HTTPError(404, "Not Found")
+
+    def _list(self, calendar_id: str, query: dict) -> dict:
+        events = self._calendar(calendar_id)
+        calendar_id = self.calendars[0]["id"] if calendar_id == "primary" else calendar_id
+        limit = min(int(query.get("maxResults", 250)), self.MAX_PAGE)
+        offset = int(query.get("pageToken", 0))
+        with self._lock:
+            seq = self._seq
+            if "syncToken" in query:
+                cid, _, since = query["syncToken"].partition(":")
+                if cid != calendar_id or int(since) < self._valid_from[calendar_id]:
+                    raise HTTPError(410, "Sync token is no longer valid, a full sync is required.")
+                items = [e for e in events.values() if e["_seq"] > int(since)]
+            else:
+                show_deleted = query.get("showDeleted") == "true"
+                items = [e for e in events.values() if show_deleted or e["status"] != "cancelled"]
+        items.sort(key=lambda e: e["_seq"])
+        page = [{k: v for k, v in e.items() if k != "_seq"} for e in items[offset:offset + limit]]
+        out = {"kind": "calendar#events", "items": page}
+        if offset + limit < len(items):
+            out["nextPageToken"] = str(offset + limit)
+        else:
+            out["nextSyncToken"] = f"{calendar_id}:{seq}"
+        return out
+
+
+# ──────────────── SERVER ─────────────────────────────────────────────
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes; without TCP_NODELAY each
+    # response stalls ~40 ms on Nagle + delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _dispatch(self):
+        self.server.dispatch(self)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _dispatch
+
+
+class FakeAPIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, *, emails: int = 10_000,
+                 tracks: int = 10_000, playlists: int = 100, plays: int = 5000,
+                 events_per_day: int = 4, latency_ms: float = 0.0, jitter_ms: float = 0.0, rate_429: float = 0.0,
+                 retry_after: int = 0, seed: int = 0):
+        super().__init__((host, port), _Handler)
+        self.gmail = FakeGmail(emails, seed)
+        self.spotify = FakeSpotify(tracks, playlists, plays, seed)
+        self.calendar = FakeCalendar(events_per_day, seed)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._count_lock = threading.Lock()
+        self.requests: Counter = Counter()
+        self.throttled: Counter = Counter()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAPIServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_counts(self) -> None:
+        with self._count_lock:
+            self.requests.clear()
+            self.throttled.clear()
+
+    def dispatch(self, h: BaseHTTPRequestHandler) -> None:
+        url = urlsplit(h.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        length = int(h.headers.get("Content-Length") or 0)
+        raw = h.rfile.read(length) if length else b""
+        parts = [unquote(p) for p in url.path.split("/") if p]
+
+        if parts[:4] == ["gmail", "v1", "users", "me"]:
+            service, api, rest = "gmail", self.gmail, parts[4:]
+        elif parts[:2] == ["calendar", "v3"]:
+            service, api, rest = "calendar", self.calendar, parts[2:]
+        elif parts[:1] == ["v1"]:
+            service, api, rest = "spotify", self.spotify, parts[1:]
+        else:
+            service, api, rest = "unknown", None, parts
+
+        with self._count_lock:
+            delay = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            throttle = self._rng.random() < self.rate_429
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        route = f"{service} {h.command} ?"
+        try:
+            if api is None:
+                raise HTTPError(404, "Not found")
+            if throttle:
+                raise HTTPError(429, "API rate limit exceeded")
+            body = json.loads(raw) if raw else None
+            status, payload, route = api.handle(h.command, rest, query, body)
+            route = f"{service} {h.command} {route}"
+        except HTTPError as e:
+            status = e.status
+            if service in ("gmail", "calendar"):
+                payload = {"error": {"code": e.status, "message": str(e),
+                                     "status": GOOGLE_STATUS.get(e.status, "INVALID_ARGUMENT")}}
+            else:
+                payload = {"error": {"status": e.status, "message": str(e)}}
+        except (ValueError, KeyError, TypeError) as e:
+            status, payload = 400, {"error": {"status": 400, "message": f"Bad request: {e}"}}
+        except Exception as e:
+            status, payload = 500, {"error": {"status": 500, "message": repr(e)}}
+
+        with self._count_lock:
+            self.requests[route] += 1
+            if status == 429:
+                self.throttled[route] += 1
+
+        data = b"" if payload is None else json.dumps(payload).encode()
+        h.send_response(status)
+        if status == 429:
+            h.send_header("Retry-After", str(self.retry_after))
+        if data:
+            h.send_header("Content-Type", "application/json; charset=UTF-8")
+        h.send_header("Content-Length", str(len(data)))
+        h.end_headers()
+        h.wfile.write(data)
+
+
+# ──────────────── CLIENTS ────────────────────────────────────────────
+def gmail_service(url: str):
+    """A googleapiclient Gmail service talking to the fake server at `url`."""
+    import httplib2
+    from googleapiclient.discovery import build
+
+    return build("gmail", "v1", http=httplib2.Http(timeout=30), static_discovery=True,
+                 client_options={"api_endpoint": url.rstrip("/") + "/"})
+
+
+def calendar_service(url: str):
+    """A googleapiclient Calendar service talking to the fake server at `url`."""
+    import httplib2
+    from googleapiclient.discovery import build
+
+    # api_endpoint replaces root URL and service path, unlike Gmail's paths
+    # Calendar's do not repeat "calendar/v3"
+    return build("calendar", "v3", http=httplib2.Http(timeout=30), static_discovery=True,
+                 client_options={"api_endpoint": url.rstrip("/") + "/calendar/v3/"})
+
+
+def spotify_client(url: str):
+    """A Spotipy client talking to the fake server at `url`."""
+    import spotipy
+
+    sp = spotipy.Spotify(auth="fake-token", requests_timeout=30)
+    sp.prefix = url.rstrip("/") + "/v1/"
+    return sp
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Fake Gmail / Calendar / Spotify API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--emails", type=int, default=10_000)
+    parser.add_argument("--tracks", type=int, default=10_000)
+    parser.add_argument("--playlists", type=int, default=100)
+    parser.add_argument("--plays", type=int, default=5000)
+    parser.add_argument("--events-per-day", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0,
+                        help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    opts = parser.parse_args(argv)
+
+    server = FakeAPIServer(opts.host, opts.port, emails=opts.emails, tracks=opts.tracks,
+                           playlists=opts.playlists, plays=opts.plays,
+                           events_per_day=opts.events_per_day,
+                           latency_ms=opts.latency_ms, jitter_ms=opts.jitter_ms,
+                           rate_429=opts.rate_429, retry_after=opts.retry_after, seed=opts.seed)
+    print(f"Fake APIs on {server.url}  (Gmail {server.url}/gmail/v1, "
+          f"Calendar {server.url}/calendar/v3, Spotify {server.url}/v1)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Load test for the streamable-HTTP transport.
+
+Opens `--clients` concurrent MCP sessions against a running server and has
+each issue `--requests` calls, then reports requests/sec and latency
+percentiles.  By default every call is `tools/list`, which measures the
+transport and server overhead without touching Gmail or Spotify; pass
+`--tool` (and `--args` as JSON) to load a real tool.
+
+    python main.py --transport streamable-http --port 8000 &
+    python -m benchmarks.http_load --url http://127.0.0.1:8000/mcp -c 20 -n 50
+
+`--spawn` starts `main.py` itself (with `--workers`) for the duration of the run.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+async def run_client(url: str, requests: int, tool: str | None, args: dict,
+                     latencies: list, errors: list) -> None:
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            for _ in range(requests):
+                t0 = time.perf_counter()
+                try:
+                    if tool:
+                        result = await session.call_tool(tool, args)
+                        if result.isError:
+                            errors.append(result.content[0].text if result.content else "error")
+                    else:
+                        await session.list_tools()
+                except Exception as e:
+                    errors.append(repr(e))
+                latencies.append(time.perf_counter() - t0)
+
+
+async def load(url: str, clients: int, requests: int, tool: str | None, args: dict) -> dict:
+    latencies: list[float] = []
+    errors: list[str] = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(run_client(url, requests, tool, args, latencies, errors)
+                           for _ in range(clients)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    return {"requests": len(latencies), "errors": len(errors),
+            "first_error": errors[0] if errors else None,
+            "elapsed_s": elapsed, "rps": len(latencies) / elapsed,
+            "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+            "mean_ms": statistics.fmean(latencies) * 1000}
+
+
+def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not come up")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="MCP streamable-HTTP load test")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/mcp")
+    parser.add_argument("-c", "--clients", type=int, default=10)
+    parser.add_argument("-n", "--requests", type=int, default=20,
+                        help="calls per client")
+    parser.add_argument("--tool", default=None)
+    parser.add_argument("--args", default="{}", help="tool arguments as JSON")
+    parser.add_argument("--spawn", action="store_true",
+                        help="start main.py on the URL's port for the run")
+    parser.add_argument("--workers", type=int, default=1)
+    opts = parser.parse_args(argv)
+
+    server = None
+    if opts.spawn:
+        port = httpx.URL(opts.url).port
+        server = subprocess.Popen(
+            [sys.executable, "main.py", "--transport", "streamable-http",
+             "--port", str(port), "--workers", str(opts.workers),
+             "--log-level", "warning"], cwd=ROOT)
+    try:
+        wait_until_up(opts.url)
+        stats = asyncio.run(load(opts.url, opts.clients, opts.requests,
+                                 opts.tool, json.loads(opts.args)))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print(f"{opts.clients} clients x {opts.requests} {opts.tool or 'tools/list'} calls")
+    print(f"  {stats['requests']} requests in {stats['elapsed_s']:.2f}s "
+          f"-> {stats['rps']:.1f} req/s, {stats['errors']} errors")
+    print(f"  latency ms  mean {stats['mean_ms']:.1f}  p50 {stats['p50_ms']:.1f}"
+          f"  p95 {stats['p95_ms']:.1f}  p99 {stats['p99_ms']:.1f}")
+    if stats["first_error"]:
+        print(f"  first error: {stats['first_error']}")
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Cold-start benchmark for the MCP servers.
+
+Spawns the server as a fresh subprocess over stdio, exactly as an MCP client
+would, and times how long it takes to answer `initialize` and `tools/list`.
+Run from the repository root:
+
+    python -m benchmarks.startup_bench                 # main.py, 5 runs
+    python -m benchmarks.startup_bench mcp_gmail.py -n 10 --max-ms 2000
+
+Exits non-zero when the median exceeds `--max-ms`, so it can gate CI.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+async def cold_start(script: str) -> dict:
+    """Start `script` once; return timings in ms and the number of tools."""
+    params = StdioServerParameters(command=sys.executable, args=[script], cwd=str(ROOT))
+    t0 = time.perf_counter()
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            t_init = time.perf_counter()
+            tools = await session.list_tools()
+            t_list = time.perf_counter()
+    return {"initialize_ms": (t_init - t0) * 1000,
+            "tools_list_ms": (t_list - t0) * 1000,
+            "tools": len(tools.tools)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="MCP server cold-start benchmark")
+    parser.add_argument("script", nargs="?", default="main.py")
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="fail if the median time to tools/list exceeds this")
+    args = parser.parse_args(argv)
+
+    runs = [asyncio.run(cold_start(args.script)) for _ in range(args.runs)]
+    print(f"{args.script}: {runs[0]['tools']} tools, {args.runs} cold starts")
+    for key in ("initialize_ms", "tools_list_ms"):
+        values = [r[key] for r in runs]
+        print(f"  {key:<14} min {min(values):7.0f}  median {statistics.median(values):7.0f}"
+              f"  max {max(values):7.0f}")
+
+    median = statistics.median(r["tools_list_ms"] for r in runs)
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"FAIL: median {median:.0f} ms > {args.max_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
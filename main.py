@@ -1,5 +1,136 @@
-def main():
-    print("Hello from mcp-server-demo!")
+"""
+Jarvis – one MCP server process hosting the Gmail, Calendar and Spotify tool sets.
+
+Backend clients are created per account on first tool use (see the pools in
+`mcp_gmail` / `mcp_calendar` / `mcp_spotify`) and the Google / Spotify client
+libraries are only imported then, so starting the server costs little more
+than importing the MCP SDK.
+
+    python main.py                                   # stdio, one client
+    python main.py --transport streamable-http --port 8000
+    python main.py --transport streamable-http --workers 4 --keep-alive 30
+
+In HTTP mode one long-running process serves every connected MCP client, so
+they all share the warm backend clients, OAuth tokens and local caches.  With
+`--workers N` uvicorn forks N such processes; sessions can then land on any
+worker, so the server runs stateless (each request is self-contained) and
+paged tools return their whole result at once instead of a cursor.  Each
+worker has its own clients and in-memory caches (playback state, calendar
+mirrors, library indexes, metrics), warmed separately; only the on-disk
+token caches and listening-history archive are shared, the archive's writes
+under a file lock.
+"""
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse
+import importlib
+import logging
+import os
+import sys
+from mcp.server.fastmcp import FastMCP
+from mcp_runtime import instrument_server
+from Tools.metrics import start_textfile_writer
+
+log = logging.getLogger("jarvis")
+
+# Modules whose `mcp` server's tools are mounted into the combined server.
+SERVICES = ("mcp_gmail", "mcp_calendar", "mcp_spotify")
+
+TRANSPORTS = ("stdio", "streamable-http", "sse")
+
+
+def build_server(name: str = "Jarvis", services=SERVICES, **settings) -> FastMCP:
+    """
+    Create a FastMCP server exposing the tools of every module in `services`.
+    `settings` are passed through to FastMCP (host, port, stateless_http, …).
+    """
+    tools = {}
+    for module_name in services:
+        module = importlib.import_module(module_name)
+        for tool in module.mcp._tool_manager.list_tools():
+            # first registration wins for tools several servers share
+            tools.setdefault(tool.name, tool)
+    mcp = FastMCP(name, tools=list(tools.values()), **settings)
+    instrument_server(mcp)
+    return mcp
+
+
+def http_app():
+    """
+    ASGI app for the HTTP transports; used as a uvicorn factory so each worker
+    process builds its own server.  Configured through JARVIS_TRANSPORT and
+    JARVIS_STATELESS, which `main` sets before starting uvicorn.
+    """
+    transport = os.environ.get("JARVIS_TRANSPORT", "streamable-http")
+    stateless = os.environ.get("JARVIS_STATELESS", "0") == "1"
+    mcp = build_server(stateless_http=stateless)
+    log.info("Worker %d ready in %.0f ms (%s%s)", os.getpid(),
+             (time.perf_counter() - _STARTED) * 1000, transport,
+             ", stateless" if stateless else "")
+    if transport == "sse":
+        return mcp.sse_app()
+    return mcp.streamable_http_app()
+
+
+def serve_http(transport: str, host: str, port: int, workers: int = 1,
+               keep_alive: int = 5, stateless: bool = False,
+               log_level: str = "info") -> None:
+    import uvicorn
+
+    if transport == "sse" and workers > 1:
+        raise SystemExit("--workers > 1 needs the streamable-http transport "
+                         "(SSE sessions are pinned to one process)")
+    os.environ["JARVIS_TRANSPORT"] = transport
+    os.environ["JARVIS_STATELESS"] = "1" if stateless or workers > 1 else "0"
+    if workers > 1:
+        # a cursor lives in one worker and the next call may land on another
+        os.environ["MCP_CURSORS"] = "0"
+    uvicorn.run("main:http_app", factory=True, host=host, port=port,
+                workers=workers, timeout_keep_alive=keep_alive,
+                log_level=log_level.lower())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--transport", choices=TRANSPORTS, default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="uvicorn worker processes (HTTP transports only); "
+                             "each keeps its own clients and caches")
+    parser.add_argument("--keep-alive", type=int, default=30,
+                        help="seconds to hold idle HTTP connections open")
+    parser.add_argument("--stateless", action="store_true",
+                        help="no per-client sessions (implied by --workers > 1)")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--metrics-file", default=None,
+                        help="also write Prometheus metrics to this file "
+                             "(node-exporter textfile collector)")
+    parser.add_argument("--metrics-interval", type=float, default=15.0,
+                        help="seconds between --metrics-file rewrites")
+    args = parser.parse_args(argv)
+
+    # logs go to stderr; stdout belongs to the stdio transport
+    logging.basicConfig(level=args.log_level.upper(), stream=sys.stderr,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if args.metrics_file:
+        if args.workers > 1:
+            # each worker has its own counters; scrape /metrics instead
+            parser.error("--metrics-file needs --workers 1")
+        start_textfile_writer(args.metrics_file, args.metrics_interval)
+
+    if args.transport != "stdio":
+        serve_http(args.transport, args.host, args.port, args.workers,
+                   args.keep_alive, args.stateless, args.log_level)
+        return
+
+    mcp = build_server()
+    log.info("Startup took %.0f ms (%d tools)",
+             (time.perf_counter() - _STARTED) * 1000, len(mcp._tool_manager.list_tools()))
+    mcp.run(transport="stdio")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,227 @@
+import os
+from typing import List, Optional
+from mcp.server.fastmcp import FastMCP
+from Tools.Google.calendar_tools import CalendarTool
+from Tools.client_pool import ClientPool, DEFAULT_ACCOUNT
+from Tools.Google.google_apis import token_path
+from mcp_runtime import instrument_server, paginate, run_blocking, set_tool_limit
+
+working_dir = os.path.dirname(__file__)
+
+def _create_client(account: str) -> CalendarTool:
+    # the OAuth consent flow needs a browser, so only the default account may
+    # run it from here; other accounts must already have a token file
+    if account != DEFAULT_ACCOUNT and not os.path.exists(
+            token_path(CalendarTool.API_NAME, CalendarTool.API_VERSION, f'_{account}')):
+        raise ValueError(f'no credentials for account {account!r}; authorize it once outside the server')
+    return CalendarTool(
+        os.path.join(working_dir, 'credentials.json'),
+        account=None if account == DEFAULT_ACCOUNT else account
+    )
+
+# One CalendarTool per account; each keeps a local mirror of its calendars,
+# so the pool's idle timeout is also how long a mirror stays warm.
+_pool = ClientPool(
+    _create_client,
+    max_clients=int(os.environ.get('MCP_MAX_CLIENTS', 8)),
+    idle_timeout=float(os.environ.get('MCP_CLIENT_IDLE_TIMEOUT', 1800)),
+    name='calendar_clients'
+)
+
+def calendar_client(account: Optional[str] = None) -> CalendarTool:
+    """Returns the CalendarTool for `account` (the default account if omitted)."""
+    return _pool.get(account)
+
+# Queries are answered from the local mirror (synced on first use, refreshed
+# in the background once older than a minute), so most calls make no request.
+# They still run in worker threads (see mcp_runtime) since a first query syncs.
+set_tool_limit('sync_calendars', 1)
+
+mcp = FastMCP(
+    'Calendar',
+    dependencies = [
+        'google-api-python-client',
+        'google-auth-httplib2',
+        'google-auth-oauthlib'
+    ]
+)
+
+
+
+@mcp.tool()
+async def list_calendars(account: Optional[str] = None) -> list[dict]:
+    """Lists the calendars in the user's calendar list.
+
+    Args:
+        account: Which connected Google account to use (default account if omitted).
+
+    Returns:
+        A list of calendars with their ID, name and time zone.
+    """
+    return await run_blocking('list_calendars', lambda: calendar_client(account).list_calendars())
+
+@mcp.tool()
+async def sync_calendars(calendar_ids: Optional[List[str]] = None, account: Optional[str] = None) -> dict:
+    """Fetches the changes to the locally mirrored calendars now.
+
+    Queries keep the mirror fresh on their own; use this after making
+    changes in another client.
+
+    Args:
+        calendar_ids: Calendars to sync (every mirrored calendar if omitted).
+        account: Which connected Google account to use (default account if omitted).
+
+    Returns:
+        Per calendar, the number of changed events, the event count and whether it was a full sync.
+    """
+    return await run_blocking('sync_calendars', lambda: calendar_client(account).sync(calendar_ids))
+
+@mcp.tool()
+async def list_events(start: Optional[str] = None, end: Optional[str] = None, calendar_ids: Optional[List[str]] = None,
+                      time_zone: Optional[str] = None, page_size: Optional[int] = None, account: Optional[str] = None) -> dict:
+    """Lists the events in a time window, recurring events as their occurrences.
+
+    Results come a page at a time; pass `next_cursor` to `next_page` for more.
+
+    Args:
+        start: Window start, ISO 8601 (now if omitted).
+        end: Window end, ISO 8601 (one day after start if omitted).
+        calendar_ids: Calendars to include (primary calendar if omitted).
+        time_zone: IANA time zone for times without an offset and for the results.
+        page_size: Events per page (server default if omitted).
+        account: Which connected Google account to use (default account if omitted).
+
+    Returns:
+        A page of events ordered by start: {"items", "count", "next_cursor"}.
+    """
+    return await paginate('list_events', lambda: (
+        e.model_dump() for e in calendar_client(account).events(start, end, calendar_ids, time_zone)), page_size)
+
+@mcp.tool()
+async def free_busy(start: Optional[str] = None, end: Optional[str] = None, calendar_ids: Optional[List[str]] = None,
+                    time_zone: Optional[str] = None, account: Optional[str] = None) -> dict:
+    """Shows when the given calendars are busy and free.
+
+    Args:
+        start: Window start, ISO 8601 (now if omitted).
+        end: Window end, ISO 8601 (one day after start if omitted).
+        calendar_ids: Calendars to include (primary calendar if omitted).
+        time_zone: IANA time zone for times without an offset and for the results.
+        account: Which connected Google account to use (default account if omitted).
+
+    Returns:
+        Merged busy intervals, the free gaps between them and busy intervals per calendar.
+    """
+    return await run_blocking('free_busy', lambda: calendar_client(account).free_busy(start, end, calendar_ids, time_zone))
+
+@mcp.tool()
+async def find_conflicts(start: str, end: str, calendar_ids: Optional[List[str]] = None,
+                         time_zone: Optional[str] = None, account: Optional[str] = None) -> list[dict]:
+    """Lists the events that clash with a proposed time.
+
+    Args:
+        start: Proposed start, ISO 8601.
+        end: Proposed end, ISO 8601.
+        calendar_ids: Calendars to check (primary calendar if omitted).
+        time_zone: IANA time zone for times without an offset and for the results.
+        account: Which connected Google account to use (default account if omitted).
+
+    Returns:
+        The busy events overlapping the proposed time; empty if it is free.
+    """
+    return await run_blocking('find_conflicts', lambda: [
+        e.model_dump() for e in calendar_client(account).conflicts(start, end, calendar_ids, time_zone)])
+
+@mcp.tool()
+async def find_free_slots(duration_minutes: int, after: Optional[str] = None, count: int = 5,
+                          calendar_ids: Optional[List[str]] = None, days: int = 14,
+                          day_start: Optional[str] = '09:00', day_end: Optional[str] = '17:00',
+                          include_weekends: bool = False, granularity_minutes: int = 15,
+                          time_zone: Optional[str] = None,
+                          account: Optional[str] = None) -> list[dict]:
+    """Finds the next times that are free in all the given calendars.
+
+    Args:
+        duration_minutes: Length of the meeting.
+        after: Earliest start, ISO 8601 (now if omitted).
+        count: How many slots to return.
+        calendar_ids: Calendars that must all be free (primary calendar if omitted).
+        days: How many days ahead to look.
+        day_start: Start of the working day, "HH:MM".
+        day_end: End of the working day, "HH:MM".
+        include_weekends: Also offer Saturdays and Sundays.
+        granularity_minutes: Slots start on multiples of this many minutes.
+        time_zone: IANA time zone for working hours and the results (primary calendar's if omitted).
+        account: Which connected Google account to use (default account if omitted).
+
+    Returns:
+        Up to `count` free slots in chronological order.
+    """
+    return await run_blocking('find_free_slots', lambda: [
+        s.model_dump() for s in calendar_client(account).free_slots(
+            duration_minutes, after, count, calendar_ids, days, day_start, day_end,
+            include_weekends, granularity_minutes, time_zone=time_zone)])
+
+@mcp.tool()
+async def create_event(summary: str, start: str, end: str, calendar_id: str = 'primary',
+                       description: Optional[str] = None, location: Optional[str] = None,
+                       attendees: Optional[List[str]] = None, time_zone: Optional[str] = None,
+                       account: Optional[str] = None) -> dict:
+    """Creates a calendar event.
+
+    Args:
+        summary: The title of the event.
+        start: Start, ISO 8601 (a plain date for an all-day event).
+        end: End, ISO 8601 (a plain date, exclusive, for an all-day event).
+        calendar_id: The calendar to add the event to.
+        description: Optional event description.
+        location: Optional event location.
+        attendees: Optional attendee email addresses.
+        time_zone: IANA time zone for times without an offset (the calendar's if omitted).
+        account: Which connected Google account to use (default account if omitted).
+
+    Returns:
+        The created event.
+    """
+    return await run_blocking('create_event', lambda: calendar_client(account).create_event(
+        summary, start, end, calendar_id, description, location, attendees, time_zone).model_dump())
+
+@mcp.tool()
+async def create_recurring_event(summary: str, start: str, end: str, rrule: str,
+                                 exdates: Optional[List[str]] = None, calendar_id: str = 'primary',
+                                 description: Optional[str] = None, location: Optional[str] = None,
+                                 attendees: Optional[List[str]] = None, time_zone: Optional[str] = None,
+                                 account: Optional[str] = None) -> dict:
+    """Creates a recurring calendar event.
+
+    The rule is checked before anything is sent: `start` must be its first
+    occurrence and every excluded date one of its occurrences.
+
+    Args:
+        summary: The title of the events.
+        start: Start of the first occurrence, ISO 8601 (a plain date for all-day events).
+        end: End of the first occurrence, ISO 8601.
+        rrule: RFC 5545 rule, e.g. "FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10" or
+            "FREQ=MONTHLY;BYDAY=-1FR;UNTIL=20271231T235959Z".
+        exdates: Start times (or dates) of occurrences to skip.
+        calendar_id: The calendar to add the series to.
+        description: Optional event description.
+        location: Optional event location.
+        attendees: Optional attendee email addresses.
+        time_zone: IANA time zone of the series (the calendar's if omitted).
+        account: Which connected Google account to use (default account if omitted).
+
+    Returns:
+        The created series with its recurrence lines.
+    """
+    return await run_blocking('create_recurring_event', lambda: calendar_client(account).create_recurring_event(
+        summary, start, end, rrule, exdates, calendar_id, description, location, attendees, time_zone).model_dump())
+
+
+
+instrument_server(mcp)
+
+
+if __name__ == "__main__":
+    # default transport == "stdio"
+    mcp.run(transport="stdio")
@@ -1,9 +1,39 @@
 import os
+from typing import Optional
 from mcp.server.fastmcp import FastMCP
 from Tools.Google.gmail_tools import GmailTool, EmailMessage, EmailMessages, Labels
+from Tools.client_pool import ClientPool, DEFAULT_ACCOUNT
+from Tools.Google.google_apis import token_path
+from mcp_runtime import instrument_server, paginate, run_blocking
 
 working_dir = os.path.dirname(__file__)
-gmail_tool = GmailTool(os.path.join(working_dir, 'credentials.json'))
+
+def _create_client(account: str) -> GmailTool:
+    # the OAuth consent flow needs a browser, so only the default account may
+    # run it from here; other accounts must already have a token file
+    if account != DEFAULT_ACCOUNT and not os.path.exists(
+            token_path(GmailTool.API_NAME, GmailTool.API_VERSION, f'_{account}')):
+        raise ValueError(f'no credentials for account {account!r}; authorize it once outside the server')
+    return GmailTool(
+        os.path.join(working_dir, 'credentials.json'),
+        account=None if account == DEFAULT_ACCOUNT else account
+    )
+
+# One GmailTool per account, each with its own token file; created on first
+# use, least recently used evicted past MCP_MAX_CLIENTS.
+_pool = ClientPool(
+    _create_client,
+    max_clients=int(os.environ.get('MCP_MAX_CLIENTS', 8)),
+    idle_timeout=float(os.environ.get('MCP_CLIENT_IDLE_TIMEOUT', 1800)),
+    name='gmail_clients'
+)
+
+def gmail_client(account: Optional[str] = None) -> GmailTool:
+    """Returns the GmailTool for `account` (the default account if omitted)."""
+    return _pool.get(account)
+
+# Tool handlers are async and run the blocking Gmail API calls in worker
+# threads (see mcp_runtime), so one slow call doesn't hold up the rest.
 
 mcp = FastMCP(
     'Gmail',
@@ -17,7 +47,7 @@ mcp = FastMCP(
 
 
 @mcp.tool()
-def send_email(to: str, subject: str, message_text: str, files: list[str] = None) -> dict:
+async def send_email(to: str, subject: str, message_text: str, files: list[str] = None, account: Optional[str] = None) -> dict:
     """Sends an email to the specified recipient.
 
     Args:
@@ -25,57 +55,72 @@ def send_email(to: str, subject: str, message_text: str, files: list[str] = None
         subject: The subject of the email.
         message_text: The body of the email.
         files: A list of file paths to attach to the email.
+        account: Which connected Gmail account to use (default account if omitted).
 
     Returns:
         A dictionary containing the sent message's ID and thread ID.
     """
-    return gmail_tool.send_email(to, subject, message_text, files)
+    return await run_blocking('send_email', lambda: gmail_client(account).send_email(to, subject, message_text, files))
 
 @mcp.tool()
-def search_emails(query: str, max_results: int = 10) -> dict:
+async def search_emails(query: str, max_results: int = 10, page_size: Optional[int] = None, account: Optional[str] = None) -> dict:
     """Searches for emails matching the given query.
 
+    Results come a page at a time; pass `next_cursor` to `next_page` for more.
+
     Args:
         query: The query to search for.
-        max_results: The maximum number of results to return.
+        max_results: The maximum number of results to return in total.
+        page_size: Emails per page (server default if omitted).
+        account: Which connected Gmail account to use (default account if omitted).
 
     Returns:
-        A list of email messages matching the query.
+        A page of email messages: {"items", "count", "next_cursor"}.
     """
-    return gmail_tool.search_emails(query, max_results).model_dump()
+    return await paginate('search_emails', lambda: (
+        m.model_dump() for m in gmail_client(account).iter_emails(query, max_results)), page_size)
 
 @mcp.tool()
-def get_email(msg_id: str) -> dict:
+async def get_email(msg_id: str, account: Optional[str] = None) -> dict:
     """Gets the details of a specific email message.
 
     Args:
         msg_id: The ID of the email message to retrieve.
+        account: Which connected Gmail account to use (default account if omitted).
 
     Returns:
         An EmailMessage object containing the email's details.
     """
-    return gmail_tool.get_email(msg_id).model_dump()
+    return await run_blocking('get_email', lambda: gmail_client(account).get_email(msg_id).model_dump())
 
 @mcp.tool()
-def delete_email(msg_id: str) -> None:
+async def delete_email(msg_id: str, account: Optional[str] = None) -> None:
     """Deletes an email message by moving it to the trash.
 
     Args:
         msg_id: The ID of the email message to delete.
+        account: Which connected Gmail account to use (default account if omitted).
     """
-    return gmail_tool.delete_email(msg_id)
+    return await run_blocking('delete_email', lambda: gmail_client(account).delete_email(msg_id))
 
 @mcp.tool()
-def list_labels() -> dict:
+async def list_labels(account: Optional[str] = None) -> dict:
     """Lists all the labels in the user's mailbox.
 
+    Args:
+        account: Which connected Gmail account to use (default account if omitted).
+
     Returns:
         A list of labels.
     """
-    return gmail_tool.list_labels().model_dump()
+    return await run_blocking('list_labels', lambda: gmail_client(account).list_labels().model_dump())
+
+
+
+
+instrument_server(mcp)
 
 
-    
 if __name__ == "__main__":
     # default transport == "stdio"
     mcp.run(transport="stdio")          # or mcp.run(transport="stdio")
\ No newline at end of file
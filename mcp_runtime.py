@@ -0,0 +1,357 @@
+"""
+Async plumbing shared by the MCP servers.
+
+The backend clients (googleapiclient, spotipy) are blocking, so every tool
+handler is an `async def` that hands its backend call to `run_blocking`:
+
+- calls run in worker threads, bounded overall by MCP_MAX_WORKERS;
+- each tool also has its own limit (MCP_TOOL_CONCURRENCY, or `set_tool_limit`),
+  so one slow tool can't take every worker;
+- if the client abandons a request the handler is cancelled at once; the
+  worker thread runs to completion in the background and its result is
+  dropped.  Until it does it still counts against both limits: a call that
+  hangs upstream ties up a worker (and a slot of its tool) even after the
+  client has timed out, so MCP_MAX_WORKERS must leave room for those;
+- the pooled backend clients a call uses are leased until it returns (a
+  cursor's until it is closed), so a pool evicting one never closes it mid-call.
+
+Tools with potentially large results return them through `paginate`: the
+result is produced by a generator that is held server-side behind an opaque
+cursor and drained one page per `next_page(cursor)` call.
+
+`instrument_server` wraps every tool of a server with latency / payload
+metrics and adds the `server_stats` and `next_page` tools and a Prometheus
+`/metrics` route.
+"""
+import functools
+import json
+import math
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+import anyio
+import anyio.from_thread
+import anyio.to_thread
+from Tools.client_pool import Leases, leasing
+from Tools.metrics import metrics, tool_call
+
+T = TypeVar("T")
+
+MAX_WORKERS = int(os.environ.get("MCP_MAX_WORKERS", 64))
+DEFAULT_TOOL_CONCURRENCY = int(os.environ.get("MCP_TOOL_CONCURRENCY", 8))
+# measuring payload bytes costs one extra JSON encode per call
+PAYLOAD_METRICS = os.environ.get("MCP_PAYLOAD_METRICS", "1") == "1"
+PAGE_SIZE = int(os.environ.get("MCP_PAGE_SIZE", 50))
+MAX_PAGE_SIZE = 500
+CURSOR_TTL = float(os.environ.get("MCP_CURSOR_TTL", 600))
+MAX_CURSORS = int(os.environ.get("MCP_MAX_CURSORS", 256))
+# off when several worker processes serve requests (see main.serve_http)
+CURSORS = os.environ.get("MCP_CURSORS", "1") == "1"
+
+_workers = anyio.CapacityLimiter(MAX_WORKERS)
+# anyio's own thread limit; the real cap is _workers, held by the threads
+_threads = anyio.CapacityLimiter(math.inf)
+_tool_limits: dict[str, int] = {}
+_tool_limiters: dict[str, anyio.CapacityLimiter] = {}
+
+
+def set_tool_limit(tool: str, limit: int) -> None:
+    """Allow at most `limit` concurrent calls of `tool`."""
+    _tool_limits[tool] = limit
+    if tool in _tool_limiters:
+        _tool_limiters[tool].total_tokens = limit
+
+
+def _limiter(tool: str) -> anyio.CapacityLimiter:
+    limiter = _tool_limiters.get(tool)
+    if limiter is None:
+        limiter = _tool_limiters[tool] = anyio.CapacityLimiter(
+            _tool_limits.get(tool, DEFAULT_TOOL_CONCURRENCY))
+    return limiter
+
+
+def _leased(fn: Callable[[], T]) -> T:
+    # pool clients fn uses stay open until it returns, evicted or not
+    with leasing() as leases:
+        try:
+            return fn()
+        finally:
+            leases.release()
+
+
+class _Slot:
+    """
+    The tool and worker tokens of one `run_blocking` call.  The worker
+    thread gives them back when it finishes – not the handler when it is
+    cancelled – so an abandoned call counts against the limits for as long
+    as its thread really runs.
+    """
+
+    def __init__(self, limiters: list[anyio.CapacityLimiter]):
+        self.limiters = limiters
+        self.lock = threading.Lock()
+        self.state = "waiting"      # then "running" (thread) or "dropped"
+
+    async def acquire(self) -> None:
+        for i, limiter in enumerate(self.limiters):
+            try:
+                await limiter.acquire_on_behalf_of(self)
+            except BaseException:
+                for held in reversed(self.limiters[:i]):
+                    held.release_on_behalf_of(self)
+                raise
+
+    def release(self) -> None:
+        # event loop thread only; CapacityLimiter isn't thread-safe
+        for limiter in reversed(self.limiters):
+            limiter.release_on_behalf_of(self)
+
+    def start(self) -> bool:
+        """Called by the worker thread; False if the call was dropped first."""
+        with self.lock:
+            if self.state == "dropped":
+                return False
+            self.state = "running"
+            return True
+
+    def drop(self) -> bool:
+        """Called on cancellation; True if no thread will release the tokens."""
+        with self.lock:
+            if self.state == "waiting":
+                self.state = "dropped"
+                return True
+            return False
+
+
+async def run_blocking(tool: str, fn: Callable[[], T]) -> T:
+    """Run the blocking `fn()` for `tool` in a worker thread and await it."""
+    slot = _Slot([_limiter(tool), _workers])
+    await slot.acquire()
+
+    def work():
+        if not slot.start():
+            return None         # cancelled before a thread picked it up
+        try:
+            return _leased(fn)
+        finally:
+            try:
+                anyio.from_thread.run_sync(slot.release)
+            except RuntimeError:
+                pass            # event loop already gone
+
+    try:
+        return await anyio.to_thread.run_sync(work, abandon_on_cancel=True,
+                                              limiter=_threads)
+    except BaseException:
+        if slot.drop():
+            slot.release()
+        raise
+
+
+# ──────────────── RESULT CURSORS ─────────────────────────────────
+class _Cursor:
+    __slots__ = ("tool", "items", "ahead", "page_size", "expires", "lock")
+
+    def __init__(self, tool: str, items: Iterator, ahead: list, page_size: int):
+        self.tool = tool
+        self.items = items
+        # items already taken from `items` for the next page
+        self.ahead = ahead
+        self.page_size = page_size
+        self.expires = time.monotonic() + CURSOR_TTL
+        # a generator can't be advanced by two worker threads at once
+        self.lock = threading.Lock()
+
+    def take(self) -> tuple[list, bool]:
+        """The next page, and whether more items follow it."""
+        with self.lock:
+            page = self.ahead + _take(self.items, self.page_size + 1 - len(self.ahead))
+            self.ahead = page[self.page_size:]
+            return page[:self.page_size], bool(self.ahead)
+
+
+# open cursors, least recently used first
+_cursors: "OrderedDict[str, _Cursor]" = OrderedDict()
+_cursors_lock = threading.Lock()
+
+
+def _close(items: Iterator) -> None:
+    try:
+        getattr(items, "close", lambda: None)()
+    except ValueError:
+        pass            # still running in a worker; it is dropped with the cursor
+
+
+def _drop_expired(now: float) -> list[_Cursor]:
+    # caller holds _cursors_lock and closes the returned cursors' items
+    return [_cursors.pop(k) for k in [k for k, c in _cursors.items() if c.expires < now]]
+
+
+def _open_cursor(tool: str, items: Iterator, ahead: list, page_size: int) -> str:
+    cursor_id = secrets.token_urlsafe(16)
+    with _cursors_lock:
+        dropped = _drop_expired(time.monotonic())
+        while len(_cursors) >= MAX_CURSORS:
+            dropped.append(_cursors.popitem(last=False)[1])
+        _cursors[cursor_id] = _Cursor(tool, items, ahead, page_size)
+    for c in dropped:
+        _close(c.items)
+    return cursor_id
+
+
+def _holding(items: Iterator, leases: Leases) -> Iterator:
+    # the cursor's pool clients stay open until it is drained or closed
+    try:
+        yield from items
+    finally:
+        leases.release()
+
+
+def _take(items: Iterator, n: Optional[int]) -> list:
+    return list(islice(items, n))
+
+
+def _page(items: list, cursor: Optional[str]) -> dict:
+    return {"items": items, "count": len(items), "next_cursor": cursor}
+
+
+async def paginate(tool: str, produce: Callable[[], Iterable[T]],
+                   page_size: Optional[int] = None) -> dict:
+    """
+    Return the first page of `produce()` as {"items", "count", "next_cursor"}.
+
+    `produce` is called in a worker thread and should return a lazy iterable
+    (a generator that fetches upstream pages as it goes), so memory and time
+    to the first page don't depend on the size of the whole result.  If more
+    items follow, the iterator is parked behind `next_cursor` for
+    `next_page`; unused cursors expire after MCP_CURSOR_TTL seconds.
+
+    Cursors live in one process, so with several server workers (MCP_CURSORS
+    off) the whole result is returned as a single page.
+    """
+    size = max(1, min(page_size or PAGE_SIZE, MAX_PAGE_SIZE))
+
+    def first():
+        with leasing() as leases:
+            try:
+                items = _holding(iter(produce()), leases)
+                # one item past the page tells whether a cursor is needed
+                return items, _take(items, size + 1 if CURSORS else None)
+            except BaseException:
+                leases.release()
+                raise
+
+    items, page = await run_blocking(tool, first)
+    if len(page) <= size or not CURSORS:
+        _close(items)
+        return _page(page, None)
+    return _page(page[:size], _open_cursor(tool, items, page[size:], size))
+
+
+async def next_page(cursor: str) -> dict:
+    """
+    Fetch the next page of a paged tool result.
+
+    Args:
+        cursor: The `next_cursor` of the previous page.
+
+    Returns:
+        {"items", "count", "next_cursor"}; `next_cursor` is null on the last page.
+    """
+    now = time.monotonic()
+    with _cursors_lock:
+        dropped = _drop_expired(now)
+        c = _cursors.get(cursor)
+        if c is not None:
+            _cursors.move_to_end(cursor)
+            c.expires = now + CURSOR_TTL
+    for old in dropped:
+        _close(old.items)
+    if c is None:
+        metrics.incr("mcp_tool_calls_total", tool="next_page", status="error")
+        raise ValueError("Unknown or expired cursor; call the original tool again")
+
+    # measured as a call of the tool that opened the cursor
+    if PAYLOAD_METRICS:
+        metrics.incr("mcp_tool_bytes_in_total", _size({"cursor": cursor}), tool=c.tool)
+    try:
+        with tool_call(c.tool):
+            page, more = await run_blocking(c.tool, c.take)
+    except BaseException:
+        with _cursors_lock:
+            _cursors.pop(cursor, None)
+        _close(c.items)
+        raise
+    if not more:
+        with _cursors_lock:
+            _cursors.pop(cursor, None)
+        _close(c.items)
+        cursor = None
+    result = _page(page, cursor)
+    if PAYLOAD_METRICS:
+        metrics.incr("mcp_tool_bytes_out_total", _size(result), tool=c.tool)
+    return result
+
+
+next_page.instrumented = True
+
+
+# ──────────────── INSTRUMENTATION ────────────────────────────────
+def _size(value) -> int:
+    return len(json.dumps(value, default=str, separators=(",", ":")))
+
+
+def _instrumented(tool: str, fn):
+    @functools.wraps(fn)
+    async def wrapper(**kwargs):
+        if PAYLOAD_METRICS:
+            metrics.incr("mcp_tool_bytes_in_total", _size(kwargs), tool=tool)
+        with tool_call(tool):
+            result = await fn(**kwargs)
+        if PAYLOAD_METRICS:
+            metrics.incr("mcp_tool_bytes_out_total", _size(result), tool=tool)
+        return result
+
+    wrapper.instrumented = True
+    return wrapper
+
+
+async def server_stats() -> dict:
+    """
+    Server performance counters since start-up.
+
+    Per tool: calls, errors, latency (mean/p50/p95/p99 ms), upstream API
+    requests per call and bytes in/out. Per upstream service and endpoint:
+    calls, errors, retries and latency. Per local cache: hits, misses and
+    hit rate.
+    """
+    return metrics.snapshot()
+
+
+def instrument_server(mcp) -> None:
+    """
+    Record metrics for every tool registered on `mcp` so far, and add the
+    `server_stats` and `next_page` tools and the `/metrics` route.  Call after
+    the last @mcp.tool().
+    """
+    from starlette.responses import PlainTextResponse
+
+    for tool in (server_stats, next_page):
+        if mcp._tool_manager.get_tool(tool.__name__) is None:
+            mcp.tool()(tool)
+
+    if not any(getattr(r, "path", None) == "/metrics"
+               for r in mcp._custom_starlette_routes):
+        @mcp.custom_route("/metrics", methods=["GET"])
+        async def prometheus_metrics(request):
+            return PlainTextResponse(metrics.prometheus(),
+                                     media_type="text/plain; version=0.0.4")
+
+    for tool in mcp._tool_manager.list_tools():
+        if tool.is_async and not getattr(tool.fn, "instrumented", False):
+            tool.fn = _instrumented(tool.name, tool.fn)
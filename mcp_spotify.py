@@ -2,8 +2,48 @@ import os
 from typing import List, Optional, Sequence
 from mcp.server.fastmcp import FastMCP
 from Tools.Spotify.spotify_tools import SpotifyTools
+from Tools.client_pool import ClientPool, DEFAULT_ACCOUNT
+from mcp_runtime import instrument_server, paginate, run_blocking, set_tool_limit
+
+
+def _create_client(account: str) -> SpotifyTools:
+    # the OAuth consent flow needs a browser, so only the default account may
+    # run it from here; other accounts must already have a token cache
+    if account != DEFAULT_ACCOUNT and not os.path.exists(f".cache-{account}"):
+        raise ValueError(f"no credentials for account {account!r}; authorize it once outside the server")
+    sp = SpotifyTools.for_account(account)
+    sp.start_history_collector()
+    return sp
+
+
+# One SpotifyTools per account (own token cache, history archive and local
+# indexes); created on first use, least recently used evicted past
+# MCP_MAX_CLIENTS, idle ones released after MCP_CLIENT_IDLE_TIMEOUT seconds.
+# Every tool takes an optional `account` naming whose client to use.
+_pool = ClientPool(
+    _create_client,
+    max_clients=int(os.environ.get("MCP_MAX_CLIENTS", 8)),
+    idle_timeout=float(os.environ.get("MCP_CLIENT_IDLE_TIMEOUT", 1800)),
+    name="spotify_clients",
+)
+
+
+def _client(account: Optional[str] = None) -> SpotifyTools:
+    """SpotifyTools for `account` (the default account if omitted)."""
+    return _pool.get(account)
+
+
+# Tool handlers are async and run the blocking Spotipy calls in worker threads
+# (see mcp_runtime). Long-polling and library-wide jobs get tighter limits so
+# they can't tie up the shared workers. Tools that can return thousands of
+# items are paged: they return {"items", "count", "next_cursor"} and the rest
+# is fetched lazily through `next_page(cursor)`.
+set_tool_limit("wait_for_state_change", 4)
+# each wait holds a worker and one of those 4 slots for its whole timeout
+MAX_WAIT_SECONDS = 60.0
+set_tool_limit("refresh_library", 1)
+set_tool_limit("sync_history", 1)
 
-_sp = SpotifyTools()
 
 mcp = FastMCP(
     "Spotify",                          # display-name for the service
@@ -23,139 +63,284 @@ mcp = FastMCP(
 # PLAYLISTS
 # ────────────────────────────────────────────────────────────────────
 @mcp.tool()
-def list_playlists(
+async def list_playlists(
     limit: int = 50,
     include_public: bool = True,
     include_private: bool = True,
     include_collab: bool = True,
-) -> List[dict]:
-    """Return the user’s playlists."""
-    return _sp.list_playlists(limit, include_public, include_private, include_collab)
+    page_size: Optional[int] = None,
+    account: Optional[str] = None,
+) -> dict:
+    """Return the user’s playlists (up to `limit`), a page at a time."""
+    return await paginate("list_playlists", lambda: _client(account).iter_playlists(limit, include_public, include_private, include_collab), page_size)
 
 
 @mcp.tool()
-def get_playlist(playlist_id: str) -> dict:
+async def get_playlist(playlist_id: str, account: Optional[str] = None) -> dict:
     """Fetch a single playlist (including tracks)."""
-    return _sp.get_playlist(playlist_id)
+    return await run_blocking("get_playlist", lambda: _client(account).get_playlist(playlist_id))
 
 
 @mcp.tool()
-def create_playlist(
+async def create_playlist(
     name: str,
     public: bool = False,
     description: str = "",
     collaborative: bool = False,
+    account: Optional[str] = None,
 ) -> dict:
     """Create a new playlist for the current user and return it."""
-    return _sp.create_playlist(name, public, description, collaborative)
+    return await run_blocking("create_playlist", lambda: _client(account).create_playlist(name, public, description, collaborative))
 
 
 @mcp.tool()
-def add_tracks(playlist_id: str, track_uris: Sequence[str]) -> None:
+async def add_tracks(playlist_id: str, track_uris: Sequence[str], account: Optional[str] = None) -> None:
     """Append one or more track URIs to a playlist."""
-    _sp.add_tracks(playlist_id, track_uris)
+    await run_blocking("add_tracks", lambda: _client(account).add_tracks(playlist_id, track_uris))
 
 
 @mcp.tool()
-def replace_tracks(playlist_id: str, track_uris: Sequence[str]) -> None:
+async def replace_tracks(playlist_id: str, track_uris: Sequence[str], account: Optional[str] = None) -> None:
     """Replace the entire playlist with the given track URIs."""
-    _sp.replace_tracks(playlist_id, track_uris)
+    await run_blocking("replace_tracks", lambda: _client(account).replace_tracks(playlist_id, track_uris))
 
 
 @mcp.tool()
-def remove_tracks(playlist_id: str, track_uris: Sequence[str]) -> None:
+async def remove_tracks(playlist_id: str, track_uris: Sequence[str], account: Optional[str] = None) -> None:
     """Remove all occurrences of the given tracks from a playlist."""
-    _sp.remove_tracks(playlist_id, track_uris)
+    await run_blocking("remove_tracks", lambda: _client(account).remove_tracks(playlist_id, track_uris))
 
 
 # ────────────────────────────────────────────────────────────────────
 # LIBRARY / USER COLLECTION
 # ────────────────────────────────────────────────────────────────────
 @mcp.tool()
-def liked_tracks(limit: int = 50) -> List[dict]:
-    """Return up to `limit` liked (saved) tracks."""
-    return _sp.liked_tracks(limit)
+async def liked_tracks(limit: int = 50, page_size: Optional[int] = None, account: Optional[str] = None) -> dict:
+    """Return up to `limit` liked (saved) tracks, a page at a time."""
+    return await paginate("liked_tracks", lambda: _client(account).iter_liked_tracks(limit), page_size)
 
 
 @mcp.tool()
-def save_tracks(track_uris: Sequence[str]) -> None:
+async def save_tracks(track_uris: Sequence[str], account: Optional[str] = None) -> None:
     """Save the given track URIs to ‘Liked Songs’."""
-    _sp.save_tracks(track_uris)
+    await run_blocking("save_tracks", lambda: _client(account).save_tracks(track_uris))
 
 
 @mcp.tool()
-def top_tracks(limit: int = 20, time_range: str = "medium_term") -> List[dict]:
+async def top_tracks(limit: int = 20, time_range: str = "medium_term", account: Optional[str] = None) -> List[dict]:
     """
     Return the user’s top tracks.
 
     `time_range` can be "short_term" (4 weeks), "medium_term" (6 months),
     or "long_term" (several years).
     """
-    return _sp.top_tracks(limit, time_range)
+    return await run_blocking("top_tracks", lambda: _client(account).top_tracks(limit, time_range))
 
 
 @mcp.tool()
-def recently_played(limit: int = 50) -> List[dict]:
+async def recently_played(limit: int = 50, account: Optional[str] = None) -> List[dict]:
     """Return the user’s play history (max 50 most recent plays)."""
-    return _sp.recently_played(limit)
+    return await run_blocking("recently_played", lambda: _client(account).recently_played(limit))
+
+
+# ────────────────────────────────────────────────────────────────────
+# METADATA ENRICHMENT (bulk, de-duplicated, cached)
+# ────────────────────────────────────────────────────────────────────
+@mcp.tool()
+async def enrich_tracks(track_uris: Sequence[str], account: Optional[str] = None) -> List[dict]:
+    """
+    Return tracks with artist genres/popularity and album release date/label.
+
+    Shared artists and albums are fetched once via the bulk endpoints, so
+    large lists cost a few requests rather than one per track.
+    """
+    return await run_blocking("enrich_tracks", lambda: _client(account).enrich_tracks(track_uris))
+
+
+@mcp.tool()
+async def enrich_liked_tracks(limit: int = 50, page_size: Optional[int] = None, account: Optional[str] = None) -> dict:
+    """Return up to `limit` liked tracks with artist genres and album details, a page at a time."""
+    def produce():
+        sp = _client(account)
+        return sp.iter_enriched(sp.iter_liked_tracks(limit))
+    return await paginate("enrich_liked_tracks", produce, page_size)
+
+
+@mcp.tool()
+async def enrich_playlist(playlist_id: str, page_size: Optional[int] = None, account: Optional[str] = None) -> dict:
+    """Return a playlist’s tracks with artist genres and album details, a page at a time."""
+    def produce():
+        sp = _client(account)
+        return sp.iter_enriched(sp.iter_playlist_tracks(playlist_id))
+    return await paginate("enrich_playlist", produce, page_size)
+
+
+# ────────────────────────────────────────────────────────────────────
+# LISTENING HISTORY ARCHIVE (local, collected in the background)
+# Dates are ISO strings; naive values are UTC, `end` is exclusive.
+# ────────────────────────────────────────────────────────────────────
+@mcp.tool()
+async def sync_history(account: Optional[str] = None) -> int:
+    """Archive any plays since the last sync now; returns how many were added."""
+    return await run_blocking("sync_history", lambda: _client(account).sync_history())
+
+
+@mcp.tool()
+async def history_top_tracks(start: Optional[str] = None, end: Optional[str] = None, limit: int = 20, account: Optional[str] = None) -> List[dict]:
+    """Most played tracks between `start` and `end` from the local archive."""
+    return await run_blocking("history_top_tracks", lambda: _client(account).history_top_tracks(start, end, limit))
+
+
+@mcp.tool()
+async def history_top_artists(start: Optional[str] = None, end: Optional[str] = None, limit: int = 20, account: Optional[str] = None) -> List[dict]:
+    """Most played artists between `start` and `end` from the local archive."""
+    return await run_blocking("history_top_artists", lambda: _client(account).history_top_artists(start, end, limit))
+
+
+@mcp.tool()
+async def history_play_count(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    track_id: Optional[str] = None,
+    artist_id: Optional[str] = None,
+    account: Optional[str] = None,
+) -> int:
+    """Count archived plays in a date range, optionally of one track or artist."""
+    return await run_blocking("history_play_count", lambda: _client(account).history_play_count(start, end, track_id, artist_id))
+
+
+@mcp.tool()
+async def history_heatmap(start: Optional[str] = None, end: Optional[str] = None, tz: str = "UTC", account: Optional[str] = None) -> dict:
+    """
+    Plays by weekday × hour from the local archive.
+
+    Returns {"weekday": [7], "hour": [24], "grid": [7][24]}, Monday first,
+    in the IANA time zone `tz` (e.g. "America/New_York").
+    """
+    return await run_blocking("history_heatmap", lambda: _client(account).history_heatmap(start, end, tz))
 
 
 # ────────────────────────────────────────────────────────────────────
 # PLAYBACK CONTROL
 # ────────────────────────────────────────────────────────────────────
 @mcp.tool()
-def devices() -> List[dict]:
-    """Return the user’s available Spotify Connect devices."""
-    return _sp.devices()
+async def devices(refresh: bool = False, account: Optional[str] = None) -> List[dict]:
+    """Return the user’s available Spotify Connect devices (cached; `refresh` forces a refetch)."""
+    return await run_blocking("devices", lambda: _client(account).devices(refresh))
+
+
+@mcp.tool()
+async def current_playback(max_age: Optional[float] = None, account: Optional[str] = None) -> dict:
+    """
+    Return the cached playback state: {"version", "age_ms", "playback"}.
+
+    `playback` is Spotify’s currently-playing object (or null when nothing is
+    playing). Pass `max_age` in seconds to refetch state older than that.
+    """
+    return await run_blocking("current_playback", lambda: _client(account).current_playback(max_age))
+
+
+@mcp.tool()
+async def wait_for_state_change(since_version: Optional[int] = None, timeout: float = 10.0, account: Optional[str] = None) -> dict:
+    """
+    Wait until playback or device state changes, e.g. to confirm a command.
+
+    Pass the `version` from `current_playback` as `since_version`; returns
+    {"changed", "version", "playback"} once it moves or `timeout` seconds pass.
+    `timeout` is capped at 60 seconds; call again to keep waiting.
+    """
+    timeout = min(max(timeout, 0.0), MAX_WAIT_SECONDS)
+    return await run_blocking("wait_for_state_change", lambda: _client(account).wait_for_state_change(since_version, timeout))
 
 
 @mcp.tool()
-def play(
+async def play(
     uris: Optional[Sequence[str]] = None,
     device_id: Optional[str] = None,
     position_ms: Optional[int] = None,
+    account: Optional[str] = None,
 ) -> None:
-    """Start playback on the active or specified device."""
-    _sp.play(uris, device_id, position_ms)
+    """Start playback on the active or specified device (id or name)."""
+    await run_blocking("play", lambda: _client(account).play(uris, device_id, position_ms))
 
 
 @mcp.tool()
-def pause(device_id: Optional[str] = None) -> None:
+async def pause(device_id: Optional[str] = None, account: Optional[str] = None) -> None:
     """Pause playback."""
-    _sp.pause(device_id)
+    await run_blocking("pause", lambda: _client(account).pause(device_id))
 
 
 @mcp.tool(name="next_track")
-def next_track(device_id: Optional[str] = None) -> None:
+async def next_track(device_id: Optional[str] = None, account: Optional[str] = None) -> None:
     """Skip to the next track."""
-    _sp.next(device_id)
+    await run_blocking("next_track", lambda: _client(account).next(device_id))
 
 
 @mcp.tool(name="previous_track")
-def previous_track(device_id: Optional[str] = None) -> None:
+async def previous_track(device_id: Optional[str] = None, account: Optional[str] = None) -> None:
     """Go back to the previous track."""
-    _sp.previous(device_id)
+    await run_blocking("previous_track", lambda: _client(account).previous(device_id))
 
 
 @mcp.tool()
-def seek(position_ms: int, device_id: Optional[str] = None) -> None:
+async def seek(position_ms: int, device_id: Optional[str] = None, account: Optional[str] = None) -> None:
     """Seek to `position_ms` within the current track."""
-    _sp.seek(position_ms, device_id)
+    await run_blocking("seek", lambda: _client(account).seek(position_ms, device_id))
 
 
 @mcp.tool()
-def set_volume(volume_percent: int, device_id: Optional[str] = None) -> None:
+async def set_volume(volume_percent: int, device_id: Optional[str] = None, account: Optional[str] = None) -> None:
     """Set volume on the target device (0–100 %)."""
-    _sp.set_volume(volume_percent, device_id)
+    await run_blocking("set_volume", lambda: _client(account).set_volume(volume_percent, device_id))
 
 
 # ────────────────────────────────────────────────────────────────────
 # DISCOVERY / SEARCH
 # ────────────────────────────────────────────────────────────────────
 @mcp.tool()
-def search_track(query: str, limit: int = 10) -> List[dict]:
+async def search_track(query: str, limit: int = 10, account: Optional[str] = None) -> List[dict]:
     """Search for tracks by free-text query."""
-    return _sp.search_track(query, limit)
+    return await run_blocking("search_track", lambda: _client(account).search_track(query, limit))
+
+
+@mcp.tool()
+async def search_library(query: str, limit: int = 10, account: Optional[str] = None) -> List[dict]:
+    """
+    Fuzzy-search the user’s own library (liked songs and playlists) by track,
+    artist or album name. Typo tolerant and answered locally – prefer this
+    over `search_track` for “play that song from my library” requests.
+    Each result lists the `sources` ("saved", "playlist:<id>") containing it.
+    """
+    return await run_blocking("search_library", lambda: _client(account).search_library(query, limit))
+
+
+@mcp.tool()
+async def recommendations(
+    seed_tracks: Optional[Sequence[str]] = None,
+    seed_artists: Optional[Sequence[str]] = None,
+    limit: int = 20,
+    local: Optional[bool] = None,
+    account: Optional[str] = None,
+) -> List[dict]:
+    """
+    Recommend tracks similar to the given track/artist ids or URIs.
+
+    With `local=True` results come from a co-occurrence model of the user’s
+    own playlists, saved tracks and play history – any number of seeds, no
+    network round trip. `local=False` asks only Spotify’s endpoint (max 5
+    seeds). By default the endpoint is tried when it can take the seeds,
+    falling back to the local model.
+    """
+    return await run_blocking("recommendations", lambda: _client(account).recommendations(seed_tracks, seed_artists, limit, local=local))
+
+
+@mcp.tool()
+async def refresh_library(account: Optional[str] = None) -> dict:
+    """Resync the local library model (only changed playlists are refetched)."""
+    return await run_blocking("refresh_library", lambda: _client(account).refresh_library())
+
+
+instrument_server(mcp)
 
 
 if __name__ == "__main__":
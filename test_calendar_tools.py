@@ -0,0 +1,223 @@
+import itertools
+import time
+import unittest
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from benchmarks.fake_api import FakeAPIServer, calendar_service
+from Tools.Google.calendar_tools import CalendarTool
+from Tools.Google.recurrence import Recurrence
+
+ME = 'me@example.com'
+TEAM = 'team@group.calendar.google.com'
+# the fake's holiday calendar is all-day and free, so test series there
+# don't show up in the other tests' free/busy answers
+SPARE = 'holidays@group.v.calendar.google.com'
+
+
+class TestCalendarTool(unittest.TestCase):
+    """CalendarTool against the fake Calendar API.  Each test gets its own
+    Saturday, which the fake leaves free of generated meetings."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.api = FakeAPIServer(emails=10, tracks=10, playlists=1).start()
+        today = date.today()
+        first = today + timedelta(days=7 + (5 - today.weekday()) % 7)
+        cls.saturdays = (first + timedelta(weeks=w) for w in itertools.count())
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.api.stop()
+
+    def setUp(self):
+        self.calendar = CalendarTool('unused', service=calendar_service(self.api.url))
+        self.saturday = next(self.saturdays)
+        self.day = self.saturday.isoformat()
+        self.api.reset_counts()
+
+    def at(self, hhmm, days=0):
+        """ISO time on the test day in the primary calendar's time zone."""
+        naive = datetime.combine(self.saturday + timedelta(days=days), datetime.strptime(hhmm, '%H:%M').time())
+        return naive.replace(tzinfo=ZoneInfo('Europe/Berlin')).isoformat()
+
+    def add(self, calendar_id, start, end, **extra):
+        return self.api.calendar.add_event(calendar_id, 'Test', self.at(start), self.at(end), **extra)
+
+    def test_queries_after_the_first_sync_are_local(self):
+        self.calendar.free_busy(self.day, None, [ME, TEAM])
+        self.api.reset_counts()
+
+        for _ in range(5):
+            self.calendar.conflicts(self.at('10:00'), self.at('11:00'), [ME, TEAM])
+            self.calendar.free_slots(30, self.day, calendar_ids=[ME, TEAM], include_weekends=True)
+
+        self.assertEqual(sum(self.api.requests.values()), 0)
+
+    def test_incremental_sync_fetches_only_changes(self):
+        self.calendar.sync([ME])
+        event = self.add(ME, '10:00', '11:00')
+        self.api.reset_counts()
+
+        result = self.calendar.sync([ME])
+        self.assertEqual(result[ME]['changed'], 1)
+        self.assertFalse(result[ME]['full'])
+        self.assertEqual([e.id for e in self.calendar.conflicts(self.at('10:30'), self.at('10:45'), [ME])],
+                         [event['id']])
+
+        self.api.calendar.cancel_event(ME, event['id'])
+        self.calendar.sync([ME])
+        self.assertEqual(self.calendar.conflicts(self.at('10:30'), self.at('10:45'), [ME]), [])
+        self.assertEqual(self.api.requests['calendar GET events.list'], 2)
+
+    def test_expired_sync_token_triggers_full_sync(self):
+        self.calendar.sync([ME])
+        events = len(self.api.calendar.events[ME])
+        self.api.calendar.expire_tokens(ME)
+
+        result = self.calendar.sync([ME])
+        self.assertTrue(result[ME]['full'])
+        self.assertEqual(result[ME]['events'], events)
+
+    def test_failed_background_syncs_back_off(self):
+        self.calendar.sync([ME])
+        mirror = self.calendar._mirror(ME)
+        calls = []
+
+        def fail(*args):
+            calls.append(args)
+            raise ConnectionError('offline')
+
+        with patch.object(self.calendar, '_fetch_changes', fail), \
+                self.assertLogs('Tools.Google.calendar_tools', 'WARNING'):
+            self.calendar._ensure_synced([ME], max_age=0)
+            for _ in range(100):
+                if mirror.sync_failures:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(mirror.sync_failures, 1)
+            # still answered from the stale mirror, without another attempt
+            for _ in range(5):
+                self.calendar._ensure_synced([ME], max_age=0)
+            time.sleep(0.05)
+        self.assertEqual(len(calls), 1)
+
+        self.calendar.sync([ME])
+        self.assertEqual(mirror.sync_failures, 0)
+
+    def test_free_busy_merges_calendars_and_skips_free_events(self):
+        self.add(ME, '09:00', '10:00')
+        self.add(TEAM, '09:30', '11:00')
+        self.add(ME, '12:00', '13:00', transparency='transparent')
+        self.add(ME, '14:00', '15:00', attendees=[{'email': ME, 'self': True, 'responseStatus': 'declined'}])
+
+        result = self.calendar.free_busy(self.at('08:00'), self.at('18:00'), [ME, TEAM])
+
+        self.assertEqual(result['busy'], [{'start': self.at('09:00'), 'end': self.at('11:00')}])
+        self.assertEqual(result['free'], [{'start': self.at('08:00'), 'end': self.at('09:00')},
+                                          {'start': self.at('11:00'), 'end': self.at('18:00')}])
+        self.assertEqual(len(result['calendars'][TEAM]), 1)
+
+    def test_free_slots_skip_busy_time_and_respect_working_hours(self):
+        self.add(ME, '09:00', '10:15')
+        self.add(TEAM, '11:00', '12:00')
+
+        slots = self.calendar.free_slots(45, self.day, count=3, calendar_ids=[ME, TEAM],
+                                         include_weekends=True, day_start='09:00', day_end='13:00')
+
+        self.assertEqual([(s.start, s.end) for s in slots],
+                         [(self.at('10:15'), self.at('11:00')),
+                          (self.at('12:00'), self.at('12:45')),
+                          (self.at('09:00', days=1), self.at('09:45', days=1))])
+
+    def test_free_slots_start_on_the_granularity_grid(self):
+        self.add(ME, '09:10', '09:20')
+
+        slots = self.calendar.free_slots(50, self.day, count=3, calendar_ids=[ME], include_weekends=True,
+                                         day_start='09:00', day_end='12:00', granularity_minutes=15)
+
+        self.assertEqual([(s.start, s.end) for s in slots],
+                         [(self.at('09:30'), self.at('10:20')),
+                          (self.at('10:30'), self.at('11:20')),
+                          (self.at('09:00', days=1), self.at('09:50', days=1))])
+
+    def test_created_event_is_visible_without_a_sync(self):
+        self.calendar.sync([ME])
+        event = self.calendar.create_event('Planning', f'{self.day}T16:00', f'{self.day}T17:00')
+
+        self.assertEqual(event.start, self.at('16:00'))
+        self.assertEqual([e.id for e in self.calendar.conflicts(self.at('16:30'), self.at('18:00'))],
+                         [event.id])
+        self.assertEqual(self.api.requests['calendar GET events.list'], 1)
+
+    def add_series(self, summary, start, end, rrule):
+        return self.api.calendar.add_event(SPARE, summary, self.at(start), self.at(end),
+                                           time_zone='Europe/Berlin', recurrence=[rrule])
+
+    def occurrences(self, series_id, days):
+        return [e for e in self.calendar.events(self.day, self.at('00:00', days=days), [SPARE])
+                if e.recurring_event_id == series_id]
+
+    def test_series_are_expanded_locally_with_their_exceptions(self):
+        series = self.add_series('Chess club', '07:00', '08:00', 'RRULE:FREQ=WEEKLY;BYDAY=SA')
+        moved = self.api.calendar.override_instance(
+            SPARE, series['id'], self.at('07:00', days=7), summary='Chess club (late)',
+            start={'dateTime': self.at('09:00', days=7), 'timeZone': 'Europe/Berlin'},
+            end={'dateTime': self.at('10:00', days=7), 'timeZone': 'Europe/Berlin'})
+        self.api.calendar.override_instance(SPARE, series['id'], self.at('07:00', days=14), status='cancelled')
+
+        found = self.occurrences(series['id'], 22)
+
+        self.assertEqual([(e.start, e.summary) for e in found],
+                         [(self.at('07:00'), 'Chess club'),
+                          (self.at('09:00', days=7), 'Chess club (late)'),
+                          (self.at('07:00', days=21), 'Chess club')])
+        self.assertEqual(found[1].id, moved['id'])
+        self.assertEqual(self.api.requests['calendar GET events.list'], 1)
+
+    def test_exceptions_are_matched_in_the_series_time_zone(self):
+        # an all-day series kept in Auckland time on a Berlin calendar; its
+        # cancelled instance names only the date, which means Auckland's day
+        days = [(self.saturday + timedelta(days=d)).isoformat() for d in (0, 1, 7)]
+        series = self.api.calendar.add_event(SPARE, 'Market', days[0], days[1],
+                                             time_zone='Pacific/Auckland',
+                                             recurrence=['RRULE:FREQ=WEEKLY;BYDAY=SA'])
+        self.api.calendar.override_instance(SPARE, series['id'], days[2], status='cancelled',
+                                            originalStartTime={'date': days[2]})
+
+        found = self.occurrences(series['id'], 22)
+        self.assertEqual([e.id for e in found],
+                         [f"{series['id']}_{self.saturday + timedelta(days=d):%Y%m%d}" for d in (0, 14, 21)])
+
+    def test_long_windows_are_expanded_once(self):
+        series = self.add_series('Standup', '06:00', '06:15', 'RRULE:FREQ=DAILY')
+        self.calendar.sync([SPARE])
+
+        with patch.object(Recurrence, 'occurrences', autospec=True, side_effect=Recurrence.occurrences) as expand:
+            first = self.occurrences(series['id'], 730)
+            windows = expand.call_count
+            again = self.occurrences(series['id'], 730)
+
+        self.assertEqual(len(first), 730)
+        self.assertEqual(again, first)
+        self.assertGreater(windows, 0)
+        self.assertEqual(expand.call_count, windows)
+
+    def test_recurring_event_is_validated_before_sending(self):
+        with self.assertRaisesRegex(ValueError, 'not an occurrence'):
+            self.calendar.create_recurring_event('Yoga', self.at('18:00'), self.at('19:00'),
+                                                 'FREQ=WEEKLY;BYDAY=SU', calendar_id=SPARE)
+        self.assertEqual(self.api.requests['calendar POST events.insert'], 0)
+
+        created = self.calendar.create_recurring_event(
+            'Yoga', f'{self.day}T18:00', f'{self.day}T19:00', 'FREQ=WEEKLY;BYDAY=SA;COUNT=3',
+            exdates=[f'{self.saturday + timedelta(weeks=1)}T18:00'], calendar_id=SPARE)
+
+        self.assertEqual(created.recurrence[0], 'RRULE:FREQ=WEEKLY;BYDAY=SA;COUNT=3')
+        self.assertEqual([e.start for e in self.occurrences(created.id, 30)],
+                         [self.at('18:00'), self.at('18:00', days=14)])
+
+
+if __name__ == '__main__':
+    unittest.main()
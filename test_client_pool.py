@@ -0,0 +1,88 @@
+
+import unittest
+from unittest.mock import MagicMock
+from Tools.client_pool import ClientPool, account_key, leasing
+
+
+class TestClientPool(unittest.TestCase):
+
+    def setUp(self):
+        self.created = []
+        self.pool = ClientPool(self.factory, max_clients=2, idle_timeout=0)
+
+    def factory(self, account):
+        client = MagicMock(name=account)
+        self.created.append(account)
+        return client
+
+    def test_clients_are_created_lazily_and_reused(self):
+        self.assertEqual(self.created, [])
+        a = self.pool.get('alice')
+        self.assertIs(self.pool.get('alice'), a)
+        self.assertIs(self.pool.get(None), self.pool.get('default'))
+        self.assertEqual(self.created, ['alice', 'default'])
+
+    def test_lru_cap_closes_least_recently_used(self):
+        a = self.pool.get('alice')
+        self.pool.get('bob')
+        self.pool.get('alice')
+        self.pool.get('carol')
+        self.assertEqual(self.pool.accounts(), ['alice', 'carol'])
+        a.close.assert_not_called()
+
+        self.pool.get('dave')
+        self.assertEqual(self.pool.accounts(), ['carol', 'dave'])
+        a.close.assert_called_once()
+
+    def test_release_idle(self):
+        c = self.pool.get('alice')
+        self.assertEqual(self.pool.release_idle(), 1)
+        c.close.assert_called_once()
+        self.assertEqual(self.pool.accounts(), [])
+
+    def test_evicted_client_is_closed_after_its_last_lease(self):
+        with leasing() as call_1:
+            a = self.pool.get('alice')
+        with leasing() as call_2:
+            self.assertIs(self.pool.get('alice'), a)
+        self.pool.get('bob')
+        self.pool.get('carol')
+        self.assertEqual(self.pool.accounts(), ['bob', 'carol'])
+        a.close.assert_not_called()
+
+        call_1.release()
+        a.close.assert_not_called()
+        call_2.release()
+        a.close.assert_called_once()
+        self.assertEqual(self.pool.in_use(), 0)
+
+        # a new client replaces it; the old one is never handed out again
+        self.assertIsNot(self.pool.get('alice'), a)
+
+    def test_leased_clients_are_not_idle(self):
+        with leasing() as call:
+            a = self.pool.get('alice')
+        self.assertEqual(self.pool.release_idle(), 0)
+        call.release()
+        self.assertEqual(self.pool.release_idle(), 1)
+        a.close.assert_called_once()
+
+    def test_close_all_waits_for_leases(self):
+        with leasing() as call:
+            a = self.pool.get('alice')
+        b = self.pool.get('bob')
+        self.pool.close_all()
+        b.close.assert_called_once()
+        a.close.assert_not_called()
+        call.release()
+        call.release()
+        a.close.assert_called_once()
+
+    def test_account_names_are_validated(self):
+        self.assertEqual(account_key('me@example.com'), 'me@example.com')
+        with self.assertRaises(ValueError):
+            account_key('../../etc')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+from collections import Counter
+from unittest.mock import patch
+from Tools.Spotify.enrichment import MetadataEnricher, TTLCache
+
+
+class StubSpotify:
+    """Bulk endpoints that count calls and record the size of every batch."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.batches = {'artists': [], 'albums': [], 'tracks': []}
+
+    def fetcher(self, kind):
+        def fetch(ids):
+            self.calls[kind] += 1
+            self.batches[kind].append(len(ids))
+            return [None if i.startswith('gone') else self.object(kind, i) for i in ids]
+        return fetch
+
+    @staticmethod
+    def object(kind, i):
+        if kind == 'tracks':
+            n = int(i[1:])
+            return {'id': i, 'name': f'Track {n}', 'album': {'id': f'al{n % 3}'},
+                    'artists': [{'id': f'ar{n % 4}', 'name': f'Artist {n % 4}'}]}
+        if kind == 'artists':
+            return {'id': i, 'name': f'Artist {i}', 'genres': [f'genre-{i}'], 'popularity': 50,
+                    'followers': {'total': 10}}
+        return {'id': i, 'name': f'Album {i}', 'release_date': '2020-01-01', 'label': 'Label'}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TestMetadataEnricher(unittest.TestCase):
+
+    def setUp(self):
+        self.api = StubSpotify()
+        self.clock = Clock()
+        patcher = patch('Tools.Spotify.enrichment.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.enricher = MetadataEnricher({kind: self.api.fetcher(kind)
+                                          for kind in ('artists', 'albums', 'tracks')}, ttl=60.0)
+
+    def test_batches_at_each_endpoint_maximum(self):
+        for kind in ('artists', 'albums', 'tracks'):
+            found = self.enricher.lookup(kind, [f'x{n}' for n in range(120)])
+            self.assertEqual(len(found), 120)
+        self.assertEqual(self.api.batches, {'artists': [50, 50, 20],
+                                            'albums': [20] * 6,
+                                            'tracks': [50, 50, 20]})
+
+    def test_duplicate_and_overlapping_ids_are_fetched_once(self):
+        first = self.enricher.lookup('artists', ['a1', 'a2', 'a1', '', None, 'a2', 'a3'])
+        self.assertEqual(list(first), ['a1', 'a2', 'a3'])
+        self.assertEqual(self.api.batches['artists'], [3])
+
+        second = self.enricher.lookup('artists', ['a2', 'a3', 'a4', 'a4', 'a5'])
+        self.assertEqual(set(second), {'a2', 'a3', 'a4', 'a5'})
+        # only the ids not seen before go upstream
+        self.assertEqual(self.api.batches['artists'], [3, 2])
+
+    def test_partial_cache_hits(self):
+        self.enricher.lookup('tracks', [f't{n}' for n in range(30)])
+        self.enricher.lookup('tracks', [f't{n}' for n in range(10, 90)])
+        self.assertEqual(self.api.batches['tracks'], [30, 50, 10])
+
+        self.enricher.lookup('tracks', [f't{n}' for n in range(90)])
+        self.assertEqual(self.api.calls['tracks'], 3)
+
+    def test_unknown_ids_are_cached_as_none(self):
+        found = self.enricher.lookup('albums', ['al1', 'gone1'])
+        self.assertIsNone(found['gone1'])
+        self.enricher.lookup('albums', ['gone1'])
+        self.assertEqual(self.api.calls['albums'], 1)
+
+    def test_entries_are_refetched_after_ttl(self):
+        self.enricher.lookup('artists', ['a1', 'a2'])
+        self.clock.now += 30
+        self.enricher.lookup('artists', ['a1', 'a3'])
+        self.assertEqual(self.api.batches['artists'], [2, 1])
+
+        # a1 and a2 expire; a3 was cached 30 s later and is still fresh
+        self.clock.now += 31
+        self.enricher.lookup('artists', ['a1', 'a2', 'a3'])
+        self.assertEqual(self.api.batches['artists'], [2, 1, 2])
+
+    def test_enrich_reuses_cached_artists_and_albums(self):
+        tracks = self.enricher.enrich([f'spotify:track:t{n}' for n in range(8)] + ['gone0'])
+        self.assertEqual([t['id'] for t in tracks], [f't{n}' for n in range(8)])
+        self.assertEqual(tracks[1]['genres'], ['genre-ar1'])
+        self.assertEqual(tracks[1]['album']['label'], 'Label')
+        self.assertEqual(self.api.batches, {'tracks': [9], 'artists': [4], 'albums': [3]})
+
+        self.enricher.enrich([{'track': StubSpotify.object('tracks', 't9')}])
+        self.assertEqual(self.api.calls, Counter(tracks=1, artists=1, albums=1))
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertEqual(len(cache), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from benchmarks.fake_api import FakeAPIServer, gmail_service, spotify_client
+from Tools.Google.gmail_tools import GmailTool
+from Tools.Spotify.spotify_tools import SpotifyTools
+
+
+class TestFakeAPI(unittest.TestCase):
+    """GmailTool / SpotifyTools end to end against the local fake APIs."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.api = FakeAPIServer(emails=2000, tracks=1000, playlists=10).start()
+        cls.gmail = GmailTool('unused', service=gmail_service(cls.api.url))
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.spotify = SpotifyTools(history_dir=f'{cls.tmp.name}/history',
+                                   cache_path=f'{cls.tmp.name}/.cache',
+                                   connect=lambda: spotify_client(cls.api.url))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.spotify.close()
+        cls.api.stop()
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.api.rate_429 = 0.0
+        self.api.reset_counts()
+
+    def test_search_emails_fetches_each_message(self):
+        result = self.gmail.search_emails('is:starred', 5)
+
+        self.assertEqual(result.count, 5)
+        self.assertTrue(result.next_page_token)
+        self.assertTrue(all(m.star for m in result.messages))
+        self.assertTrue(result.messages[0].subject)
+        self.assertEqual(self.api.requests['gmail GET messages.list'], 1)
+        self.assertEqual(self.api.requests['gmail GET messages.get'], 5)
+
+    def test_send_then_trash(self):
+        sent = self.gmail.send_email('someone@example.com', 'Fake API test', 'Hello')
+        email = self.gmail.get_email(sent['id'])
+        self.assertEqual(email.subject, 'Fake API test')
+        self.assertIn('Hello', email.body)
+
+        self.gmail.delete_email(sent['id'])
+        self.assertIn('TRASH', self.gmail.get_email(sent['id']).label)
+
+    def test_liked_tracks_paginates_at_fifty(self):
+        tracks = self.spotify.liked_tracks(limit=120)
+
+        self.assertEqual(len(tracks), 120)
+        self.assertEqual(len({t['track']['id'] for t in tracks}), 120)
+        self.assertEqual(self.api.requests['spotify GET me/tracks'], 3)
+
+    def test_enrichment_batches_lookups(self):
+        ids = [t['id'] for t in self.api.spotify.tracks[:100]]
+        enriched = self.spotify.enrich_tracks(ids)
+
+        self.assertEqual(len(enriched), 100)
+        self.assertIn('genres', enriched[0])
+        self.assertEqual(self.api.requests['spotify GET tracks'], 2)
+
+    def test_throttled_spotify_calls_are_retried(self):
+        self.api.rate_429 = 0.3
+        self.api._rng.seed(1)
+        tracks = self.spotify.liked_tracks(limit=200)
+
+        self.assertEqual(len(tracks), 200)
+        self.assertGreater(sum(self.api.throttled.values()), 0)
+
+    def test_playback_commands_change_state(self):
+        before = self.spotify.current_playback(max_age=0)
+        self.spotify.play(['spotify:track:tr00000000000000000007'], device_id='phone')
+        after = self.spotify.current_playback(max_age=0)
+
+        self.assertGreater(after['version'], before['version'])
+        self.assertEqual(after['playback']['item']['id'], 'tr00000000000000000007')
+        self.assertEqual(after['playback']['device']['name'], 'Phone')
+
+    def test_history_baskets_refresh_incrementally(self):
+        self.spotify.sync_history()
+        self.spotify.refresh_library()
+        sessions = self.spotify.history.sessions()
+        baskets = sorted(b for b in self.spotify.recommender.basket_ids() if b.startswith('history:'))
+        self.assertEqual(baskets, sorted(f'history:{start}' for start, _ in sessions))
+
+        # a play right after the last one extends the last session
+        last = datetime.fromtimestamp(self.spotify.history.last_played_ms / 1000, timezone.utc)
+        self.spotify.history.append([{
+            'played_at': (last + timedelta(minutes=4)).isoformat(),
+            'track': self.api.spotify.track(1),
+        }])
+        self.spotify.refresh_library()
+        start, tracks = sessions[-1]
+        self.assertEqual(self.spotify.recommender.basket_version(f'history:{start}'),
+                         str(len(tracks) + 1))
+        self.assertEqual(len([b for b in self.spotify.recommender.basket_ids() if b.startswith('history:')]),
+                         len(sessions))
+
+    def test_remote_recommendations_never_fall_back(self):
+        seeds = [t['id'] for t in self.api.spotify.tracks[:6]]
+        remote = self.spotify.recommendations(seeds[:2], limit=5, local=False)
+        self.assertEqual(len(remote), 5)
+        self.assertEqual(self.api.requests['spotify GET recommendations'], 1)
+        with self.assertRaises(ValueError):
+            self.spotify.recommendations(seeds, local=False)
+
+    def test_failed_reindex_does_not_fail_the_write(self):
+        self.spotify.refresh_library()
+        with patch.object(self.spotify.enricher, 'lookup', side_effect=ConnectionError('down')), \
+                self.assertLogs('Tools.Spotify.spotify_tools', 'WARNING'):
+            self.spotify.save_tracks([self.api.spotify.tracks[-1]['id']])
+        self.assertEqual(self.api.requests['spotify PUT me/tracks'], 1)
+        # left for the next search to rebuild
+        self.assertEqual(self.spotify._library_synced_at, 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,16 @@
 import os
 import time
 
-# Import the gmail_tool instance from your main server file
-# Make sure your server file is named 'gmail_mcp_server.py' or update the import
-from mcp_gmail import gmail_tool
+# Import the client accessor from your main server file
+# Make sure your server file is named 'mcp_gmail.py' or update the import
+from mcp_gmail import gmail_client
 
 def run_all_tests():
     """
     Executes a series of tests for all Gmail tool methods.
     """
+    gmail_tool = gmail_client()
+
     # --- Configuration ---
     # IMPORTANT: Replace with an email address you can send to and check
     recipient_email = 'recipient@example.com' 
@@ -82,7 +84,7 @@ def run_all_tests():
     print(f"\n--- 5. Testing delete_email() with ID: {test_msg_id} ---")
     try:
         gmail_tool.delete_email(msg_id=test_msg_id)
-        # The delete_email function prints its own success message
+        # The delete_email function logs its own success message
         print(f"✅ Success: delete_email() executed for message {test_msg_id}.")
     except Exception as e:
         print(f"❌ Failure: An error occurred during delete_email(): {e}")
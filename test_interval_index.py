@@ -0,0 +1,45 @@
+import random
+import unittest
+from Tools.Google.interval_index import IntervalIndex, gaps, merge
+
+
+class TestIntervalIndex(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        index, intervals = IntervalIndex(), {}
+        for i in range(2000):
+            start = rng.randrange(0, 100_000)
+            intervals[i] = (start, start + rng.choice((1, 30, 60, 500, 5000)))
+            index.set(i, *intervals[i])
+        for i in rng.sample(range(2000), 300):
+            index.discard(i)
+            del intervals[i]
+
+        for _ in range(200):
+            lo = rng.randrange(0, 100_000)
+            hi = lo + rng.randrange(1, 3000)
+            expected = sorted((s, e, k) for k, (s, e) in intervals.items() if s < hi and e > lo)
+            self.assertEqual(index.overlapping(lo, hi), [k for _, _, k in expected])
+
+    def test_updates_are_seen_by_the_next_query(self):
+        index = IntervalIndex()
+        index.set('a', 10, 20)
+        self.assertEqual(index.overlapping(0, 100), ['a'])
+        index.set('a', 200, 300)
+        index.set('b', 5, 15)
+        self.assertEqual(index.overlapping(0, 100), ['b'])
+        self.assertEqual(index.overlapping(20, 200), [])
+        self.assertEqual(len(index), 2)
+
+    def test_merge_and_gaps(self):
+        busy = merge([(30, 40), (0, 10), (5, 15), (15, 20)])
+
+        self.assertEqual(busy, [(0, 20), (30, 40)])
+        self.assertEqual(gaps(busy, 0, 50), [(20, 30), (40, 50)])
+        self.assertEqual(gaps(busy, 12, 35), [(20, 30)])
+        self.assertEqual(gaps([], 5, 9), [(5, 9)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+
+import unittest
+from Tools.Spotify.library_index import LibraryIndex, normalize
+
+
+def track(track_id, name, artist, album=''):
+    return {'id': track_id, 'name': name,
+            'artists': [{'id': artist.lower(), 'name': artist}],
+            'album': {'id': album.lower(), 'name': album}}
+
+
+class TestLibraryIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = LibraryIndex()
+        self.index.set_source('saved', 'v1', [
+            track('t1', 'Bohemian Rhapsody', 'Queen', 'A Night at the Opera'),
+            track('t2', 'Café del Mar', 'Energy 52'),
+        ])
+        self.index.set_source('playlist:p1', 'v1', [
+            track('t1', 'Bohemian Rhapsody', 'Queen', 'A Night at the Opera'),
+            track('t3', 'Under Pressure', 'Queen'),
+        ])
+
+    def test_typo_tolerant_search(self):
+        results = self.index.search('bohemain rapsody')
+        self.assertEqual(results[0]['id'], 't1')
+        self.assertEqual(results[0]['sources'], ['playlist:p1', 'saved'])
+
+    def test_accents_and_artist_match(self):
+        self.assertEqual(self.index.search('cafe del mar')[0]['id'], 't2')
+        self.assertEqual({r['id'] for r in self.index.search('queen')}, {'t1', 't3'})
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search('zzzz qqqq'), [])
+        self.assertEqual(self.index.search('   '), [])
+
+    def test_incremental_updates(self):
+        self.index.remove_source('playlist:p1')
+        self.assertEqual(self.index.search('under pressure'), [])
+        self.assertEqual(self.index.search('bohemian')[0]['sources'], ['saved'])
+
+        self.index.add('saved', [track('t4', 'Killer Queen', 'Queen')])
+        self.assertEqual(self.index.search('killer queen')[0]['id'], 't4')
+        self.index.discard('saved', ['t4'])
+        self.assertNotIn('t4', {r['id'] for r in self.index.search('killer queen')})
+
+    def test_unchanged_source_is_skipped(self):
+        self.assertFalse(self.index.set_source('saved', 'v1', []))
+        self.assertEqual(len(self.index), 3)
+
+    def test_normalize(self):
+        self.assertEqual(normalize("  Don't   Stop—Me Nöw "), 'don t stop me now')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+
+import threading
+import unittest
+import tempfile
+from datetime import datetime, timedelta, timezone
+from Tools.Spotify.listening_history import ListeningHistory
+
+
+def play(track_id, artist_id, when):
+    return {
+        'played_at': when.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        'track': {'id': track_id, 'name': f'Track {track_id}',
+                  'artists': [{'id': artist_id, 'name': f'Artist {artist_id}'}]},
+    }
+
+
+class TestListeningHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.history = ListeningHistory(self.tmp.name)
+        # Monday 2024-01-01 09:00 UTC, one play per hour
+        self.t0 = datetime(2024, 1, 1, 9, tzinfo=timezone.utc)
+        self.history.append([
+            play('t1', 'a1', self.t0),
+            play('t2', 'a1', self.t0 + timedelta(hours=1)),
+            play('t1', 'a1', self.t0 + timedelta(hours=2)),
+            play('t3', 'a2', self.t0 + timedelta(days=1)),
+        ])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_skips_already_archived_plays(self):
+        added = self.history.append([
+            play('t1', 'a1', self.t0),
+            play('t4', 'a2', self.t0 + timedelta(days=2)),
+        ])
+        self.assertEqual(added, 1)
+        self.assertEqual(len(self.history), 5)
+
+    def test_top_tracks_and_artists_over_range(self):
+        top = self.history.top_tracks('2024-01-01', '2024-01-02')
+        self.assertEqual([(t['id'], t['plays']) for t in top], [('t1', 2), ('t2', 1)])
+        self.assertEqual(top[0]['artist'], 'Artist a1')
+
+        artists = self.history.top_artists()
+        self.assertEqual([(a['id'], a['plays']) for a in artists], [('a1', 3), ('a2', 1)])
+
+    def test_play_count(self):
+        self.assertEqual(self.history.play_count(), 4)
+        self.assertEqual(self.history.play_count(track_id='t1'), 2)
+        self.assertEqual(self.history.play_count(start='2024-01-02', artist_id='a2'), 1)
+        self.assertEqual(self.history.play_count(track_id='missing'), 0)
+
+    def test_heatmap(self):
+        heat = self.history.heatmap()
+        self.assertEqual(heat['weekday'][:2], [3, 1])
+        self.assertEqual(heat['grid'][0][9:12], [1, 1, 1])
+
+        shifted = self.history.heatmap(tz='Pacific/Honolulu')     # UTC-10
+        self.assertEqual(shifted['grid'][6][23], 1)
+
+    def test_heatmap_follows_dst_and_half_hour_offsets(self):
+        # 17:00 UTC is 18:00 in Berlin in winter, 19:00 in summer
+        summer = datetime(2024, 7, 1, 17, tzinfo=timezone.utc)
+        self.history.append([play('t4', 'a2', summer)])
+        berlin = self.history.heatmap('2024-01-01', tz='Europe/Berlin')
+        self.assertEqual(berlin['grid'][0][19], 1)
+        self.assertEqual(berlin['grid'][0][10:13], [1, 1, 1])
+
+        # 09:00, 10:00, 11:00 UTC on Monday are 14:30, 15:30, 16:30 in Kolkata
+        kolkata = self.history.heatmap(end='2024-01-02', tz='Asia/Kolkata')
+        self.assertEqual(kolkata['grid'][0][14:17], [1, 1, 1])
+
+    def test_reload_from_disk(self):
+        reloaded = ListeningHistory(self.tmp.name)
+        self.assertEqual(len(reloaded), 4)
+        self.assertEqual(reloaded.top_tracks(limit=1)[0]['id'], 't1')
+
+    def test_collect_pages_forward_from_last_play(self):
+        calls = []
+
+        def fetch(limit, after=None):
+            calls.append(after)
+            if after == self.history.last_played_ms and len(calls) == 1:
+                return {'items': [play('t5', 'a3', self.t0 + timedelta(days=3))]}
+            return {'items': []}
+
+        self.assertEqual(self.history.collect(fetch), 1)
+        self.assertEqual(calls[0], int((self.t0 + timedelta(days=1)).timestamp() * 1000))
+
+    def test_sessions_since(self):
+        sessions = self.history.sessions(gap_minutes=90)
+        self.assertEqual([len(tracks) for _, tracks in sessions], [3, 1])
+
+        # a play inside the first session returns that whole session onwards
+        since = int((self.t0 + timedelta(hours=1)).timestamp() * 1000)
+        self.assertEqual(self.history.sessions(gap_minutes=90, since=since), sessions)
+        since = self.history.last_played_ms
+        self.assertEqual(self.history.sessions(gap_minutes=90, since=since), sessions[1:])
+        self.assertEqual(self.history.sessions(since=since + 1), [])
+
+    def test_two_writers_share_one_archive(self):
+        # two server workers, each with its own in-memory view
+        other = ListeningHistory(self.tmp.name)
+        batch = [play(f't{n % 7}', f'a{n % 3}', self.t0 + timedelta(days=2, minutes=5 * n))
+                 for n in range(40)]
+        self.assertEqual(other.append(batch[:25]), 25)
+        # overlaps what `other` archived; only the newer plays are added
+        self.assertEqual(self.history.append(batch[20:]), 15)
+        self.assertEqual(other.append(batch), 0)
+
+        for h in (self.history, other, ListeningHistory(self.tmp.name)):
+            self.assertEqual(len(h), 44)
+            self.assertEqual(h.play_count(), 44)
+            self.assertEqual(h.play_count(track_id='t6'), 5)
+            played = list(h._cols['played_at'])
+            self.assertEqual(played, sorted(set(played)))
+
+    def test_concurrent_writers_never_duplicate(self):
+        writers = [ListeningHistory(self.tmp.name) for _ in range(4)]
+        batches = [[play(f't{n}', 'a9', self.t0 + timedelta(days=3, minutes=n))
+                    for n in range(k, 200, 4)] + [play('t0', 'a9', self.t0 + timedelta(days=3))]
+                   for k in range(4)]
+
+        def write(history, batch):
+            for n in range(0, len(batch), 10):
+                history.append(sorted(batch[n:n + 10], key=lambda it: it['played_at']))
+
+        threads = [threading.Thread(target=write, args=pair) for pair in zip(writers, batches)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        reloaded = ListeningHistory(self.tmp.name)
+        played = list(reloaded._cols['played_at'])
+        self.assertEqual(played, sorted(set(played)))
+        self.assertEqual(len({t['id'] for t in reloaded._tracks}), len(reloaded._tracks))
+        self.assertEqual(len(reloaded._artists), 3)
+        self.assertEqual([len(c) for c in reloaded._cols.values()], [len(played)] * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
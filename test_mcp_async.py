@@ -0,0 +1,119 @@
+
+import asyncio
+import time
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+import mcp_gmail
+import mcp_spotify
+import mcp_runtime
+
+DELAY = 0.2
+
+
+class SlowBackend:
+    """Stub client whose every call blocks like a network round trip."""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            with self.lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            try:
+                time.sleep(DELAY)
+                result = MagicMock()
+                result.model_dump.return_value = {'tool': name}
+                return result
+            finally:
+                with self.lock:
+                    self.active -= 1
+        return call
+
+
+class TestAsyncTools(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.backend = SlowBackend()
+        patch('mcp_gmail.gmail_client', return_value=self.backend).start()
+        patch('mcp_spotify._client', return_value=self.backend).start()
+        self.addCleanup(patch.stopall)
+
+    async def test_twenty_concurrent_calls_run_in_parallel(self):
+        calls = []
+        for i in range(20):
+            if i % 2:
+                calls.append(mcp_gmail.mcp.call_tool('get_email', {'msg_id': str(i)}))
+            else:
+                calls.append(mcp_spotify.mcp.call_tool('search_track', {'query': str(i)}))
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*calls)
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(len(results), 20)
+        # serial execution would take 20 * DELAY
+        self.assertLess(elapsed, 20 * DELAY / 4)
+        self.assertGreater(self.backend.peak, 8)
+
+    async def test_per_tool_concurrency_limit(self):
+        mcp_runtime.set_tool_limit('get_email', 2)
+        self.addCleanup(mcp_runtime.set_tool_limit, 'get_email',
+                        mcp_runtime.DEFAULT_TOOL_CONCURRENCY)
+
+        await asyncio.gather(*(mcp_gmail.get_email(str(i)) for i in range(6)))
+
+        self.assertEqual(self.backend.peak, 2)
+
+    async def test_abandoned_call_is_cancelled_promptly(self):
+        task = asyncio.create_task(mcp_gmail.search_emails('slow query'))
+        await asyncio.sleep(DELAY / 4)
+
+        start = time.perf_counter()
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertLess(time.perf_counter() - start, DELAY / 2)
+
+    async def test_abandoned_call_holds_its_slot_until_the_thread_ends(self):
+        mcp_runtime.set_tool_limit('get_email', 1)
+        self.addCleanup(mcp_runtime.set_tool_limit, 'get_email',
+                        mcp_runtime.DEFAULT_TOOL_CONCURRENCY)
+
+        task = asyncio.create_task(mcp_gmail.get_email('1'))
+        while not self.backend.active:
+            await asyncio.sleep(0.005)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        # the thread is still running, and still counts as a worker
+        self.assertEqual(mcp_runtime._workers.borrowed_tokens, 1)
+
+        start = time.perf_counter()
+        await mcp_gmail.get_email('2')
+        # the second call only started once the abandoned one finished
+        self.assertGreater(time.perf_counter() - start, DELAY * 1.5)
+        self.assertEqual(self.backend.peak, 1)
+        self.assertEqual(mcp_runtime._workers.borrowed_tokens, 0)
+
+    async def test_state_change_wait_is_capped(self):
+        waits = []
+        self.backend.wait_for_state_change = lambda since, timeout: waits.append(timeout) or {}
+        await mcp_spotify.wait_for_state_change(timeout=3600)
+        await mcp_spotify.wait_for_state_change(timeout=-5)
+        self.assertEqual(waits, [mcp_spotify.MAX_WAIT_SECONDS, 0.0])
+
+    def test_unseen_spotify_accounts_are_not_authorized_in_the_server(self):
+        with patch('mcp_spotify.SpotifyTools') as tools, \
+                self.assertRaisesRegex(ValueError, 'no credentials for account'):
+            mcp_spotify._create_client('nobody')
+        tools.for_account.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
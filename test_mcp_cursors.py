@@ -0,0 +1,132 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import mcp_runtime
+from mcp_runtime import next_page, paginate
+from Tools.client_pool import ClientPool
+from Tools.metrics import metrics
+
+
+class TestResultCursors(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.produced = 0
+        self.addCleanup(mcp_runtime._cursors.clear)
+
+    def produce(self, n):
+        def gen():
+            for i in range(n):
+                self.produced += 1
+                yield i
+        return gen
+
+    async def test_pages_are_produced_lazily(self):
+        page = await paginate('t', self.produce(100_000), page_size=10)
+
+        self.assertEqual(page['items'], list(range(10)))
+        self.assertIsNotNone(page['next_cursor'])
+        # one item past the page, to know whether another follows
+        self.assertEqual(self.produced, 11)
+
+        page = await next_page(page['next_cursor'])
+        self.assertEqual(page['items'], list(range(10, 20)))
+        self.assertEqual(self.produced, 21)
+
+    async def test_last_page_closes_the_cursor(self):
+        page = await paginate('t', self.produce(25), page_size=10)
+        pages = [page]
+        while page['next_cursor']:
+            page = await next_page(page['next_cursor'])
+            pages.append(page)
+
+        self.assertEqual([p['count'] for p in pages], [10, 10, 5])
+        self.assertEqual(sum((p['items'] for p in pages), []), list(range(25)))
+        self.assertEqual(len(mcp_runtime._cursors), 0)
+
+    async def test_exactly_full_last_page_has_no_cursor(self):
+        page = await paginate('t', self.produce(10), page_size=10)
+        self.assertEqual(page['count'], 10)
+        self.assertIsNone(page['next_cursor'])
+
+        page = await paginate('t', self.produce(20), page_size=10)
+        page = await next_page(page['next_cursor'])
+        self.assertEqual(page['items'], list(range(10, 20)))
+        self.assertIsNone(page['next_cursor'])
+        self.assertEqual(len(mcp_runtime._cursors), 0)
+
+    async def test_without_cursors_the_whole_result_is_one_page(self):
+        with patch.object(mcp_runtime, 'CURSORS', False):
+            page = await paginate('t', self.produce(120), page_size=10)
+
+        self.assertEqual(page['items'], list(range(120)))
+        self.assertIsNone(page['next_cursor'])
+        self.assertEqual(len(mcp_runtime._cursors), 0)
+
+    async def test_pages_are_measured_as_calls_of_the_opening_tool(self):
+        metrics.reset()
+        page = await paginate('list_things', self.produce(30), page_size=10)
+        await next_page(page['next_cursor'])
+
+        snap = metrics.snapshot()
+        self.assertEqual(snap['tools']['list_things']['calls'], 1)
+        self.assertNotIn('next_page', snap['tools'])
+        with self.assertRaises(ValueError):
+            await next_page('not-a-cursor')
+        self.assertEqual(metrics.snapshot()['tools']['next_page']['errors'], 1)
+
+    async def test_small_results_get_no_cursor(self):
+        page = await paginate('t', lambda: [1, 2, 3], page_size=10)
+
+        self.assertEqual(page, {'items': [1, 2, 3], 'count': 3, 'next_cursor': None})
+
+    async def test_cursor_keeps_its_client_open(self):
+        pool = ClientPool(lambda account: MagicMock(name=account), max_clients=1, idle_timeout=0)
+
+        def produce():
+            client = pool.get('alice')
+            return (client.page(i) for i in range(25))
+
+        page = await paginate('t', produce, page_size=10)
+        client = pool.get('alice')
+        pool.get('bob')                     # evicts alice's client
+        await mcp_runtime.run_blocking('t', lambda: pool.get('carol'))
+        client.close.assert_not_called()
+
+        page = await next_page(page['next_cursor'])
+        client.close.assert_not_called()
+        page = await next_page(page['next_cursor'])
+        self.assertIsNone(page['next_cursor'])
+        client.close.assert_called_once()
+        self.assertEqual(pool.in_use(), 0)
+
+    async def test_expired_cursor_is_rejected(self):
+        page = await paginate('t', self.produce(100), page_size=10)
+
+        mcp_runtime._cursors[page['next_cursor']].expires = 0
+        with self.assertRaises(ValueError):
+            await next_page(page['next_cursor'])
+        with self.assertRaises(ValueError):
+            await next_page('not-a-cursor')
+
+    async def test_expired_cursors_are_reaped_on_next_page(self):
+        stale = await paginate('t', self.produce(100), page_size=10)
+        live = await paginate('t', self.produce(100), page_size=10)
+        mcp_runtime._cursors[stale['next_cursor']].expires = 0
+
+        await next_page(live['next_cursor'])
+        self.assertEqual(list(mcp_runtime._cursors), [live['next_cursor']])
+
+    async def test_least_recently_used_cursor_is_evicted(self):
+        with patch.object(mcp_runtime, 'MAX_CURSORS', 2):
+            first = await paginate('t', self.produce(100), page_size=5)
+            second = await paginate('t', self.produce(100), page_size=5)
+            await next_page(first['next_cursor'])
+            await paginate('t', self.produce(100), page_size=5)
+
+        self.assertIn(first['next_cursor'], mcp_runtime._cursors)
+        with self.assertRaises(ValueError):
+            await next_page(second['next_cursor'])
+
+
+if __name__ == '__main__':
+    unittest.main()
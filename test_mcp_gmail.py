@@ -4,63 +4,98 @@ import os
 from unittest.mock import patch, MagicMock
 from Tools.Google.gmail_tools import GmailTool, EmailMessage, EmailMessages, Labels
 
-class TestMCPGmail(unittest.TestCase):
+def make_email(msg_id='123'):
+    return EmailMessage(msg_id=msg_id, subject='Test Subject', sender='a@example.com',
+                        recipients='b@example.com', body='Test Body', snippet='Test Snippet',
+                        has_attachments=False, date='Mon, 1 Jan 2024 09:00:00 +0000',
+                        star=False, label=['INBOX'])
 
-    @patch('Tools.Google.gmail_tools.GmailTool')
-    def test_send_email(self, MockGmailTool):
-        mock_gmail_tool = MockGmailTool.return_value
+class TestMCPGmail(unittest.IsolatedAsyncioTestCase):
+
+    @patch('mcp_gmail.gmail_client')
+    async def test_send_email(self, mock_client):
+        mock_gmail_tool = mock_client.return_value
         mock_gmail_tool.send_email.return_value = {'id': '123', 'threadId': '456'}
 
         from mcp_gmail import send_email
-        result = send_email('test@example.com', 'Test Subject', 'Test Body')
+        result = await send_email('test@example.com', 'Test Subject', 'Test Body')
 
         self.assertEqual(result, {'id': '123', 'threadId': '456'})
+        mock_client.assert_called_once_with(None)
         mock_gmail_tool.send_email.assert_called_once_with('test@example.com', 'Test Subject', 'Test Body', None)
 
-    @patch('Tools.Google.gmail_tools.GmailTool')
-    def test_search_emails(self, MockGmailTool):
-        mock_gmail_tool = MockGmailTool.return_value
-        mock_gmail_tool.search_emails.return_value = EmailMessages(messages=[EmailMessage(id='123', threadId='456', labelIds=['INBOX'], snippet='Test Snippet', payload=None)], resultSizeEstimate=1)
+    @patch('mcp_gmail.gmail_client')
+    async def test_search_emails(self, mock_client):
+        mock_gmail_tool = mock_client.return_value
+        mock_gmail_tool.iter_emails.return_value = iter([make_email()])
+
+        from mcp_gmail import search_emails
+        result = await search_emails('test query')
+
+        self.assertEqual(result['count'], 1)
+        self.assertEqual(result['items'][0]['msg_id'], '123')
+        self.assertIsNone(result['next_cursor'])
+        mock_gmail_tool.iter_emails.assert_called_once_with('test query', 10)
+
+    @patch('mcp_gmail.gmail_client')
+    async def test_search_emails_pages_through_cursor(self, mock_client):
+        mock_client.return_value.iter_emails.return_value = iter(
+            [make_email(str(i)) for i in range(5)])
 
         from mcp_gmail import search_emails
-        result = search_emails('test query')
+        from mcp_runtime import next_page
+        first = await search_emails('test query', max_results=5, page_size=2)
+        second = await next_page(first['next_cursor'])
+        last = await next_page(second['next_cursor'])
 
-        self.assertEqual(len(result.messages), 1)
-        self.assertEqual(result.messages[0].id, '123')
-        mock_gmail_tool.search_emails.assert_called_once_with('test query', 10)
+        self.assertEqual([e['msg_id'] for e in first['items'] + second['items'] + last['items']],
+                         ['0', '1', '2', '3', '4'])
+        self.assertIsNone(last['next_cursor'])
 
-    @patch('Tools.Google.gmail_tools.GmailTool')
-    def test_get_email(self, MockGmailTool):
-        mock_gmail_tool = MockGmailTool.return_value
-        mock_gmail_tool.get_email.return_value = EmailMessage(id='123', threadId='456', labelIds=['INBOX'], snippet='Test Snippet', payload=None)
+    @patch('mcp_gmail.gmail_client')
+    async def test_get_email(self, mock_client):
+        mock_gmail_tool = mock_client.return_value
+        mock_gmail_tool.get_email.return_value = make_email()
 
         from mcp_gmail import get_email
-        result = get_email('123')
+        result = await get_email('123', account='work')
 
-        self.assertEqual(result.id, '123')
+        self.assertEqual(result['msg_id'], '123')
+        mock_client.assert_called_once_with('work')
         mock_gmail_tool.get_email.assert_called_once_with('123')
 
-    @patch('Tools.Google.gmail_tools.GmailTool')
-    def test_delete_email(self, MockGmailTool):
-        mock_gmail_tool = MockGmailTool.return_value
+    @patch('mcp_gmail.gmail_client')
+    async def test_delete_email(self, mock_client):
+        mock_gmail_tool = mock_client.return_value
         mock_gmail_tool.delete_email.return_value = None
 
         from mcp_gmail import delete_email
-        delete_email('123')
+        await delete_email('123')
 
         mock_gmail_tool.delete_email.assert_called_once_with('123')
 
-    @patch('Tools.Google.gmail_tools.GmailTool')
-    def test_list_labels(self, MockGmailTool):
-        mock_gmail_tool = MockGmailTool.return_value
-        mock_gmail_tool.list_labels.return_value = Labels(labels=[{'id': 'INBOX', 'name': 'INBOX', 'messageListVisibility': 'show', 'labelListVisibility': 'labelShow', 'type': 'system'}])
+    @patch('mcp_gmail.gmail_client')
+    async def test_list_labels(self, mock_client):
+        mock_gmail_tool = mock_client.return_value
+        mock_gmail_tool.list_labels.return_value = Labels(labels=[{'id': 'INBOX', 'name': 'INBOX', 'message_list_visibility': 'show', 'label_list_visibility': 'labelShow', 'type': 'system'}])
 
         from mcp_gmail import list_labels
-        result = list_labels()
+        result = await list_labels()
 
-        self.assertEqual(len(result.labels), 1)
-        self.assertEqual(result.labels[0]['id'], 'INBOX')
+        self.assertEqual(len(result['labels']), 1)
+        self.assertEqual(result['labels'][0]['id'], 'INBOX')
         mock_gmail_tool.list_labels.assert_called_once()
+    @patch('mcp_gmail.GmailTool')
+    def test_unseen_accounts_are_not_authorized_in_the_server(self, mock_tool):
+        from mcp_gmail import _create_client
+        with self.assertRaisesRegex(ValueError, 'no credentials for account'):
+            _create_client('nobody')
+        mock_tool.assert_not_called()
+
+        with patch('mcp_gmail.os.path.exists', return_value=True):
+            _create_client('work')
+        _create_client('default')
+        self.assertEqual([c.kwargs['account'] for c in mock_tool.call_args_list], ['work', None])
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,63 @@
+import json
+import unittest
+from unittest.mock import patch
+
+import mcp_gmail
+from Tools.metrics import Metrics, metrics, record_cache, record_upstream, tool_call
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_snapshot_groups_tools_upstream_and_caches(self):
+        m = Metrics()
+        m.incr('mcp_tool_calls_total', tool='t', status='ok')
+        m.incr('mcp_tool_calls_total', tool='t', status='error')
+        for ms in (1, 2, 3, 400):
+            m.observe('mcp_tool_latency_seconds', ms / 1000, tool='t')
+        m.incr('cache_hits_total', 3, cache='c')
+        m.incr('cache_misses_total', cache='c')
+
+        snap = m.snapshot()
+        self.assertEqual(snap['tools']['t']['calls'], 2)
+        self.assertEqual(snap['tools']['t']['errors'], 1)
+        self.assertEqual(snap['tools']['t']['p50_ms'], 2.5)
+        self.assertEqual(snap['tools']['t']['p99_ms'], 500.0)
+        self.assertEqual(snap['caches']['c']['hit_rate'], 0.75)
+
+    def test_upstream_calls_are_attributed_to_the_running_tool(self):
+        metrics.reset()
+        with tool_call('probe'):
+            record_upstream('gmail', 'messages.get', 0.01)
+            record_upstream('gmail', 'messages.get', 0.02, retries=1)
+        record_cache('probe_cache', True)
+
+        snap = metrics.snapshot()
+        self.assertEqual(snap['tools']['probe']['upstream_calls_per_call'], 3)
+        self.assertEqual(snap['upstream']['gmail']['endpoints']['messages.get']['retries'], 1)
+
+        text = metrics.prometheus()
+        self.assertIn('# TYPE mcp_tool_latency_seconds histogram', text)
+        self.assertIn('mcp_tool_calls_total{status="ok",tool="probe"} 1', text)
+        self.assertIn('cache_hits_total{cache="probe_cache"} 1', text)
+
+
+class TestServerInstrumentation(unittest.IsolatedAsyncioTestCase):
+
+    async def test_tool_calls_are_measured_and_reported(self):
+        metrics.reset()
+        with patch('mcp_gmail.gmail_client') as client:
+            client.return_value.list_labels.return_value.model_dump.return_value = {
+                'labels': [{'id': 'INBOX', 'name': 'INBOX'}]}
+            await mcp_gmail.mcp.call_tool('list_labels', {})
+
+        content = await mcp_gmail.mcp.call_tool('server_stats', {})
+        if isinstance(content, tuple):
+            content = content[0]
+        tool = json.loads(content[0].text)['tools']['list_labels']
+        self.assertEqual(tool['calls'], 1)
+        self.assertGreater(tool['bytes_out'], 0)
+        self.assertIn('p95_ms', tool)
+
+
+if __name__ == '__main__':
+    unittest.main()
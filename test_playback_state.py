@@ -0,0 +1,127 @@
+import threading
+import time
+import unittest
+from Tools.Spotify.playback_state import PlaybackState
+
+
+class FakeSpotify:
+    """Stands in for the devices / current_playback endpoints."""
+
+    def __init__(self):
+        self.device_list = [
+            {'id': 'aaa111', 'name': 'Kitchen Speaker', 'is_active': True, 'volume_percent': 50},
+            {'id': 'bbb222', 'name': 'Living Room Speaker', 'is_active': False, 'volume_percent': 30},
+            {'id': 'ccc333', 'name': 'MacBook', 'is_active': False, 'volume_percent': 100},
+        ]
+        self.playback = {'item': {'id': 't1'}, 'is_playing': False, 'progress_ms': 0,
+                         'device': {'id': 'aaa111', 'volume_percent': 50}}
+        self.device_calls = 0
+        self.playback_calls = 0
+
+    def devices(self):
+        self.device_calls += 1
+        return list(self.device_list)
+
+    def current_playback(self):
+        self.playback_calls += 1
+        return dict(self.playback)
+
+
+class TestPlaybackState(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeSpotify()
+        self.state = PlaybackState(self.api.devices, self.api.current_playback,
+                                   fast_interval=0.02, idle_interval=60.0,
+                                   fast_window=0.5)
+
+    def tearDown(self):
+        self.state.stop()
+
+    def test_interval_is_fast_only_after_a_command(self):
+        self.assertEqual(self.state._interval(), 60.0)
+        self.state.notify_command()
+        self.assertEqual(self.state._interval(), 0.02)
+        self.state._boost_until = time.monotonic() - 1
+        self.assertEqual(self.state._interval(), 60.0)
+
+    def test_current_is_served_from_cache(self):
+        first = self.state.current()
+        second = self.state.current()
+        self.assertEqual(self.api.playback_calls, 1)
+        self.assertEqual(first['playback'], second['playback'])
+        self.state.current(max_age=0)
+        self.assertEqual(self.api.playback_calls, 2)
+
+    def test_wait_for_change_wakes_on_change(self):
+        version = self.state.current()['version']
+
+        def skip():
+            time.sleep(0.1)
+            self.api.playback = {**self.api.playback, 'item': {'id': 't2'}}
+        threading.Thread(target=skip).start()
+
+        started = time.monotonic()
+        result = self.state.wait_for_change(version, timeout=5.0)
+        self.assertTrue(result['changed'])
+        self.assertEqual(result['playback']['item']['id'], 't2')
+        self.assertGreater(result['version'], version)
+        # woken by the fast poller, not the idle interval or the timeout
+        self.assertLess(time.monotonic() - started, 2.0)
+
+    def test_wait_for_change_times_out(self):
+        version = self.state.current()['version']
+        started = time.monotonic()
+        result = self.state.wait_for_change(version, timeout=0.2)
+        self.assertFalse(result['changed'])
+        self.assertEqual(result['version'], version)
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual(self.state._waiters, 0)
+
+    def test_first_fetch_is_not_a_change(self):
+        result = self.state.wait_for_change(timeout=0.2)
+        self.assertFalse(result['changed'])
+        self.assertEqual(result['version'], 0)
+        self.assertGreater(self.api.playback_calls, 0)
+
+    def test_poller_stops_when_nobody_reads(self):
+        state = PlaybackState(self.api.devices, self.api.current_playback,
+                              fast_interval=0.01, idle_interval=0.02, idle_timeout=0.1)
+        self.addCleanup(state.stop)
+        state.current()
+        time.sleep(0.4)
+        self.assertIsNone(state._thread)
+        calls = self.api.playback_calls
+        time.sleep(0.1)
+        self.assertEqual(self.api.playback_calls, calls)
+
+        # the next read restarts it, and doesn't trust the old cache
+        self.api.playback = {**self.api.playback, 'item': {'id': 't2'}}
+        self.assertEqual(state.current()['playback']['item']['id'], 't2')
+        self.assertTrue(state._thread.is_alive())
+
+    def test_resolve_device_by_id_and_name(self):
+        self.assertEqual(self.state.resolve_device('bbb222'), 'bbb222')
+        self.assertEqual(self.state.resolve_device('kitchen speaker'), 'aaa111')
+        self.assertEqual(self.state.resolve_device('mac'), 'ccc333')
+        self.assertIsNone(self.state.resolve_device(None))
+        self.assertEqual(self.api.device_calls, 1)
+
+    def test_resolve_device_rejects_ambiguous_names(self):
+        with self.assertRaises(ValueError):
+            self.state.resolve_device('speaker')
+
+    def test_resolve_device_passes_unknown_ids_through(self):
+        self.assertEqual(self.state.resolve_device('ddd444'), 'ddd444')
+        # refetched once in case the device has just appeared
+        self.assertEqual(self.api.device_calls, 2)
+
+    def test_resolve_device_finds_new_devices_after_refetch(self):
+        self.state.devices()
+        self.api.device_list.append({'id': 'ddd444', 'name': 'Car', 'is_active': False,
+                                     'volume_percent': 70})
+        self.assertEqual(self.state.resolve_device('car'), 'ddd444')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+
+import unittest
+from Tools.Spotify.recommender import CoOccurrenceRecommender, spotify_id
+
+
+def track(track_id, artist_id='a0'):
+    return {'id': track_id, 'name': f'Track {track_id}',
+            'artists': [{'id': artist_id, 'name': f'Artist {artist_id}'}]}
+
+
+class TestCoOccurrenceRecommender(unittest.TestCase):
+
+    def setUp(self):
+        self.rec = CoOccurrenceRecommender(window=2)
+        self.rec.update_basket('playlist:1', 'v1', [track('t1'), track('t2'), track('t3')])
+        self.rec.update_basket('playlist:2', 'v1', [track('t1'), track('t2'), track('t4', 'a1')])
+        self.rec.update_basket('playlist:3', 'v1', [track('t5', 'a2'), track('t6', 'a2')])
+
+    def test_recommend_ranks_by_cooccurrence(self):
+        ids = [t['id'] for t in self.rec.recommend(['spotify:track:t1'])]
+        self.assertEqual(ids[0], 't2')
+        self.assertNotIn('t1', ids)
+        self.assertNotIn('t5', ids)
+
+    def test_scores_are_cosine_similarities(self):
+        # C[t1][t2] = 2, deg(t1) = deg(t2) = 2; t3 and t4 co-occur once with t1
+        scores = [(t['id'], t['score']) for t in self.rec.recommend(['t1'])]
+        self.assertEqual(scores, [('t2', 1.0), ('t4', 0.707107), ('t3', 0.707107)])
+
+    def test_scores_sum_over_seeds(self):
+        # t2 is close to both seeds, t4 only to t1
+        scores = [(t['id'], t['score']) for t in self.rec.recommend(['t1', 't3'])]
+        self.assertEqual(scores, [('t2', 1.707107), ('t4', 0.707107)])
+        top = self.rec.recommend(['t1', 't3'], limit=1)
+        self.assertEqual([t['id'] for t in top], ['t2'])
+        self.assertEqual(top[0]['artists'], [{'id': 'a0', 'name': 'Artist a0'}])
+
+    def test_exclude(self):
+        ids = [t['id'] for t in self.rec.recommend(['t1'], exclude=['spotify:track:t2'])]
+        self.assertEqual(ids, ['t4', 't3'])
+
+    def test_many_seeds_and_artist_seeds(self):
+        ids = [t['id'] for t in self.rec.recommend(['t1', 't2', 't3', 't4', 't5', 't6'])]
+        self.assertEqual(ids, [])
+        ids = [t['id'] for t in self.rec.recommend(seed_artists=['a2'])]
+        self.assertEqual(ids, [])
+        scores = {t['id']: t['score'] for t in self.rec.recommend(seed_artists=['a1'])}
+        self.assertEqual(scores, {'t1': 0.707107, 't2': 0.707107})
+        scores = {t['id']: t['score'] for t in self.rec.recommend(['t6'])}
+        self.assertEqual(scores, {'t5': 1.0})
+
+    def test_unchanged_basket_is_skipped(self):
+        self.assertFalse(self.rec.update_basket('playlist:1', 'v1', []))
+
+    def test_updating_basket_replaces_its_counts(self):
+        self.rec.update_basket('playlist:2', 'v2', [track('t3'), track('t4', 'a1')])
+        scores = {t['id']: t['score'] for t in self.rec.recommend(['t4'])}
+        self.assertEqual(set(scores), {'t3'})
+
+        self.rec.remove_basket('playlist:1')
+        self.rec.remove_basket('playlist:2')
+        self.assertEqual(self.rec.recommend(['t1']), [])
+
+    def test_spotify_id(self):
+        self.assertEqual(spotify_id('spotify:track:abc'), 'abc')
+        self.assertEqual(spotify_id('https://open.spotify.com/track/abc?si=x'), 'abc')
+        self.assertEqual(spotify_id('abc'), 'abc')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from Tools.Google.recurrence import Recurrence, Rule, validate
+
+BERLIN = ZoneInfo('Europe/Berlin')
+
+
+def local(ms):
+    return datetime.fromtimestamp(ms / 1000, BERLIN)
+
+
+def starts(lines, start, n=10, after=None):
+    out = []
+    for ms in Recurrence(lines, start, BERLIN).occurrences(after):
+        if after is None or ms >= after:
+            out.append(local(ms))
+        if len(out) == n:
+            break
+    return out
+
+
+class TestRecurrence(unittest.TestCase):
+
+    def test_weekly_rule_keeps_wall_clock_time_across_dst(self):
+        # clocks go back on 2026-10-25
+        got = starts(['RRULE:FREQ=WEEKLY;BYDAY=MO,TH'], datetime(2026, 10, 19, 9, 0, tzinfo=BERLIN), 4)
+
+        self.assertEqual([d.date() for d in got],
+                         [date(2026, 10, 19), date(2026, 10, 22), date(2026, 10, 26), date(2026, 10, 29)])
+        self.assertTrue(all((d.hour, d.minute) == (9, 0) for d in got))
+        self.assertEqual(got[2].timestamp() - got[1].timestamp(), (4 * 24 + 1) * 3600)
+
+    def test_monthly_ordinals_and_set_positions(self):
+        last_friday = starts(['RRULE:FREQ=MONTHLY;BYDAY=-1FR'], datetime(2026, 1, 30, 12, tzinfo=BERLIN), 3)
+        last_workday = starts(['RRULE:FREQ=MONTHLY;BYDAY=MO,TU,WE,TH,FR;BYSETPOS=-1'],
+                              datetime(2026, 1, 30, 12, tzinfo=BERLIN), 3)
+        thirty_first = starts(['RRULE:FREQ=MONTHLY;BYMONTHDAY=31;COUNT=3'], date(2026, 1, 31))
+
+        self.assertEqual([d.day for d in last_friday], [30, 27, 27])
+        self.assertEqual([d.date() for d in last_workday],
+                         [date(2026, 1, 30), date(2026, 2, 27), date(2026, 3, 31)])
+        self.assertEqual([d.date() for d in thirty_first],
+                         [date(2026, 1, 31), date(2026, 3, 31), date(2026, 5, 31)])
+
+    def test_count_until_and_exdates(self):
+        start = datetime(2026, 10, 19, 9, 0, tzinfo=BERLIN)
+        counted = starts(['RRULE:FREQ=DAILY;INTERVAL=2;COUNT=3', 'EXDATE;TZID=Europe/Berlin:20261021T090000'],
+                         start)
+        until = starts(['RRULE:FREQ=DAILY;UNTIL=20261021T070000Z'], start)
+
+        self.assertEqual([d.day for d in counted], [19, 23])
+        self.assertEqual([d.day for d in until], [19, 20, 21])
+        self.assertIsNotNone(Recurrence(['RRULE:FREQ=DAILY;COUNT=3'], start, BERLIN).last())
+        self.assertIsNone(Recurrence(['RRULE:FREQ=DAILY'], start, BERLIN).last())
+
+    def test_expansion_can_start_late_in_an_unbounded_series(self):
+        lines = ['RRULE:FREQ=WEEKLY;INTERVAL=3;BYDAY=TU,SA']
+        start = datetime(2020, 1, 4, 18, 30, tzinfo=BERLIN)
+        after = int(datetime(2031, 6, 1, tzinfo=BERLIN).timestamp() * 1000)
+        from_start = [d for d in starts(lines, start, 700) if d.timestamp() * 1000 >= after][:8]
+
+        self.assertEqual(starts(lines, start, 8, after=after), from_start)
+
+    def test_validation(self):
+        start = datetime(2026, 10, 19, 9, 0, tzinfo=BERLIN)       # a Monday
+        validate(['RRULE:FREQ=WEEKLY;BYDAY=MO,WE;UNTIL=20261231T230000Z',
+                  'EXDATE;TZID=Europe/Berlin:20261021T090000'], start, BERLIN)
+
+        for lines, message in [
+            (['RRULE:FREQ=WEEKLY;BYDAY=TU'], 'not an occurrence'),
+            (['RRULE:FREQ=HOURLY'], 'FREQ'),
+            (['RRULE:FREQ=DAILY;BYHOUR=9'], 'Unsupported'),
+            (['RRULE:FREQ=DAILY;COUNT=2;UNTIL=20261231T000000Z'], 'COUNT and UNTIL'),
+            (['RRULE:FREQ=DAILY;UNTIL=20261231'], 'UTC'),
+            (['RRULE:FREQ=WEEKLY;BYDAY=2MO'], 'ordinals'),
+            (['RRULE:FREQ=YEARLY;BYMONTH=2;BYMONTHDAY=30'], 'no occurrence'),
+            (['RRULE:FREQ=DAILY', 'EXDATE;TZID=Europe/Berlin:20261021T100000'], 'EXDATE'),
+            (['EXRULE:FREQ=DAILY'], 'Unsupported'),
+            ([], 'RRULE'),
+        ]:
+            with self.subTest(lines=lines), self.assertRaisesRegex(ValueError, message):
+                validate(lines, start, BERLIN)
+
+    def test_rule_parsing(self):
+        rule = Rule('FREQ=MONTHLY;INTERVAL=2;BYDAY=1MO,-1FR;WKST=SU')
+
+        self.assertEqual((rule.freq, rule.interval, rule.byday, rule.wkst),
+                         ('MONTHLY', 2, [(1, 0), (-1, 4)], 6))
+
+
+if __name__ == '__main__':
+    unittest.main()